@@ -0,0 +1,65 @@
+"""
+Compares running the CPU-bound stages of `PRSummarizer` on the event loop with
+offloading them to a `BatchedProcessPool`.
+
+    python -m benchmarks.bench_cpu_offload --prs 1000
+
+The speedup grows with the number of cores; on a single core the offloaded run is
+expected to be slower because of the pickling overhead.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.synthetic import CannedClient, FakeGitProvider, NullStorage
+from perfeed.tools.pr_summarizer import PRSummarizer
+from perfeed.utils.offload import BatchedProcessPool
+
+
+async def summarize_all(summarizer: PRSummarizer, n_prs: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def summarize(pr_number: int) -> None:
+        async with semaphore:
+            await summarizer.run("perfeed", pr_number)
+
+    now = time.perf_counter()
+    await asyncio.gather(*(summarize(pr_number) for pr_number in range(1, n_prs + 1)))
+    return time.perf_counter() - now
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--prs", type=int, default=1000)
+    parser.add_argument("--comments", type=int, default=30)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.01, help="simulated I/O latency in seconds")
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    git = FakeGitProvider(n_comments=args.comments, latency=args.latency)
+    llm = CannedClient(n_threads=args.comments // 3)
+
+    from perfeed.log import get_logger
+
+    get_logger().remove()
+
+    inline = PRSummarizer(git, llm, NullStorage())
+    inline_elapsed = asyncio.run(summarize_all(inline, args.prs, args.concurrency))
+
+    pool = BatchedProcessPool(max_workers=args.workers, batch_size=args.batch_size)
+    offloaded = PRSummarizer(git, llm, NullStorage(), offload=pool)
+    offload_elapsed = asyncio.run(summarize_all(offloaded, args.prs, args.concurrency))
+    pool.shutdown()
+
+    print(f"PRs: {args.prs}, comments per PR: {args.comments}, workers: {args.workers}")
+    print(f"inline:    {inline_elapsed:8.3f}s ({args.prs / inline_elapsed:8.1f} PRs/s)")
+    print(f"offloaded: {offload_elapsed:8.3f}s ({args.prs / offload_elapsed:8.1f} PRs/s)")
+    print(f"speedup:   {inline_elapsed / offload_elapsed:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Compares decoding GitHub review comments the way `GithubProvider` used to, through
+ghapi's `AttrDict`s into dict-backed dataclasses, with `decode_comments` from the raw
+response body into slotted `PRComment`s with interned logins.
+
+    python -m benchmarks.bench_decode --comments 10000
+
+Time is the best of `--repeat` runs. Memory is what the decoded comments keep alive once
+the payload is released, measured with `tracemalloc`.
+"""
+
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from fastcore.xtras import dict2obj
+
+from benchmarks.synthetic import SyntheticRepo
+from perfeed.git_providers.github import decode_comments, parse_timestamp
+from perfeed.models.git_provider import CommentType
+
+
+@dataclass
+class DictComment:
+    """`PRComment` before it was slotted."""
+
+    id: int
+    type: CommentType
+    user: str
+    user_type: str
+    diff_hunk: Optional[str]
+    body: Optional[str]
+    created_at: str
+    code_change: bool
+    in_reply_to_id: Optional[int] = None
+    html_url: Optional[str] = None
+
+
+def decode_attrdicts(payload: bytes) -> list[DictComment]:
+    return [
+        DictComment(
+            id=comment["id"],
+            type=CommentType.REVIEW_COMMENT,
+            user=comment["user"]["login"],
+            user_type=comment["user"]["type"],
+            diff_hunk=comment.get("diff_hunk"),
+            body=comment.get("body"),
+            created_at=comment["created_at"],
+            code_change=not comment.get("position"),
+            in_reply_to_id=comment.get("in_reply_to_id"),
+            html_url=comment["html_url"],
+        )
+        for comment in dict2obj(json.loads(payload))
+    ]
+
+
+def decode_raw(payload: bytes) -> list:
+    return decode_comments(payload, CommentType.REVIEW_COMMENT)
+
+
+def review_payload(n_comments: int) -> bytes:
+    """The review comments of a synthetic repo as one response body."""
+    repo = SyntheticRepo(n_prs=max(1, n_comments // 100), n_comments=100)
+    comments = [
+        comment
+        for pr_number in range(1, repo.n_prs + 1)
+        for comment in repo.review_comments(pr_number)
+    ]
+    return json.dumps(comments[:n_comments]).encode()
+
+
+def best_time(fn, payload: bytes, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        now = time.perf_counter()
+        fn(payload)
+        samples.append(time.perf_counter() - now)
+    return min(samples)
+
+
+def retained_bytes(fn, payload: bytes) -> int:
+    gc.collect()
+    tracemalloc.start()
+    comments = fn(payload)
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del comments
+    return retained
+
+
+def parse_times(payload: bytes, repeat: int) -> tuple[float, float]:
+    created = [comment["created_at"] for comment in json.loads(payload)]
+    strptime = best_time(
+        lambda _: [datetime.strptime(value, "%Y-%m-%dT%H:%M:%S%z") for value in created],
+        payload,
+        repeat,
+    )
+    fromisoformat = best_time(
+        lambda _: [parse_timestamp(value) for value in created], payload, repeat
+    )
+    return strptime, fromisoformat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--comments", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    payload = review_payload(args.comments)
+    per_10k = 10_000 / args.comments
+    print(f"comments: {args.comments}, payload: {len(payload) / 2**20:.1f} MiB")
+    print(f"{'per 10k comments':24} {'time':>10} {'memory':>12}")
+    for name, fn in [("attrdict + dataclass", decode_attrdicts), ("raw + slotted", decode_raw)]:
+        elapsed = best_time(fn, payload, args.repeat) * per_10k
+        memory = retained_bytes(fn, payload) * per_10k
+        print(f"{name:24} {elapsed * 1000:8.1f}ms {memory / 2**20:9.2f} MiB")
+
+    strptime, fromisoformat = parse_times(payload, args.repeat)
+    print(f"{'timestamps strptime':24} {strptime * per_10k * 1000:8.1f}ms")
+    print(f"{'timestamps fromisoformat':24} {fromisoformat * per_10k * 1000:8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Compares two benchmark result files and flags regressions.
+
+    python -m benchmarks.compare baseline.json candidate.json --threshold 0.1
+
+Exits with status 1 if the mean of any benchmark regressed by more than the threshold.
+"""
+
+import argparse
+import json
+import sys
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)["results"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument(
+        "--threshold", type=float, default=0.1, help="relative slowdown that counts as a regression"
+    )
+    args = parser.parse_args()
+
+    baseline, candidate = load(args.baseline), load(args.candidate)
+    regressions = []
+    print(f"{'benchmark':32} {'baseline':>12} {'candidate':>12} {'change':>8}")
+    for name in sorted(baseline.keys() & candidate.keys()):
+        before, after = baseline[name], candidate[name]
+        if not (isinstance(before, dict) and "mean" in before and "mean" in after):
+            continue
+        change = after["mean"] / before["mean"] - 1 if before["mean"] else 0.0
+        flag = ""
+        if change > args.threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(
+            f"{name:32} {before['mean'] * 1000:10.2f}ms {after['mean'] * 1000:10.2f}ms "
+            f"{change:+8.1%}{flag}"
+        )
+
+    for name in sorted(baseline.keys() ^ candidate.keys()):
+        print(f"{name:32} only in {'baseline' if name in baseline else 'candidate'}")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.synthetic import SyntheticRepo
+
+
+class FakeGithubServer:
+    """
+    A local GitHub REST server serving the payloads of `SyntheticRepo`s.
+
+    It implements the endpoints `GithubProvider` uses, with GitHub's pagination, plus the
+    `.diff` URLs of the pull requests. Every request sleeps `latency` seconds. Point a
+    provider at it with `GithubProvider(owner, token, gh_host=server.url)`.
+    """
+
+    def __init__(self, repos: list[SyntheticRepo], latency: float = 0.0):
+        self.repos = {(repo.owner, repo.name): repo for repo in repos}
+        self.latency = latency
+        self.requests = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+        for repo in repos:
+            repo.base_url = self.url
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self) -> "FakeGithubServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def route(self, path: str, query: dict[str, str]) -> tuple[int, str, str]:
+        """Return the status, content type and body of a request."""
+        match = re.fullmatch(r"/([^/]+)/([^/]+)/pull/(\d+)\.diff", path)
+        if match:
+            repo = self.repos.get((match[1], match[2]))
+            if repo is None:
+                return 404, "text/plain", "Not Found"
+            return 200, "text/plain; charset=utf-8", repo.diff(int(match[3]))
+
+        match = re.fullmatch(r"/(?:orgs|users)/([^/]+)/repos", path)
+        if match:
+            repos = [
+                {"name": name, "full_name": f"{owner}/{name}"}
+                for owner, name in sorted(self.repos)
+                if owner == match[1]
+            ]
+            if not repos:
+                return 404, "application/json", json.dumps({"message": "Not Found"})
+            return self._json(self._paginate(repos, query))
+
+        match = re.fullmatch(r"/repos/([^/]+)/([^/]+)(/.*)", path)
+        repo = self.repos.get((match[1], match[2])) if match else None
+        if repo is None:
+            return 404, "application/json", json.dumps({"message": "Not Found"})
+        resource = match[3]
+
+        if resource == "/pulls":
+            return self._json(self._paginate(self._list_pulls(repo, query), query))
+
+        match = re.fullmatch(r"/pulls/(\d+)(/commits|/reviews|/comments)?", resource)
+        if match and int(match[1]) <= repo.n_prs:
+            pr_number = int(match[1])
+            if match[2] is None:
+                return self._json(repo.pull(pr_number))
+            payloads = {
+                "/commits": repo.commits,
+                "/reviews": repo.reviews,
+                "/comments": repo.review_comments,
+            }
+            return self._json(self._paginate(payloads[match[2]](pr_number), query))
+
+        match = re.fullmatch(r"/issues/(\d+)/comments", resource)
+        if match and int(match[1]) <= repo.n_prs:
+            return self._json(
+                self._paginate(repo.issue_comments(int(match[1])), query)
+            )
+
+        return 404, "application/json", json.dumps({"message": "Not Found"})
+
+    @staticmethod
+    def _json(payload) -> tuple[int, str, str]:
+        return 200, "application/json; charset=utf-8", json.dumps(payload)
+
+    @staticmethod
+    def _list_pulls(repo: SyntheticRepo, query: dict[str, str]) -> list[dict]:
+        pulls = repo.pulls()
+        state = query.get("state", "open")
+        if state != "all":
+            pulls = [pr for pr in pulls if pr["state"] == state]
+        key = "updated_at" if query.get("sort") == "updated" else "created_at"
+        return sorted(
+            pulls, key=lambda pr: pr[key], reverse=query.get("direction", "desc") == "desc"
+        )
+
+    @staticmethod
+    def _paginate(items: list, query: dict[str, str]) -> list:
+        per_page = int(query.get("per_page", 30))
+        page = int(query.get("page", 1))
+        return items[(page - 1) * per_page : page * per_page]
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                url = urlparse(self.path)
+                query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                status, content_type, body = server.route(url.path, query)
+                encoded = body.encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(encoded)))
+                self.end_headers()
+                self.wfile.write(encoded)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
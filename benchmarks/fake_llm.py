@@ -0,0 +1,55 @@
+import random
+import time
+
+from benchmarks.synthetic import synthetic_llm_output
+from perfeed.llms.base_client import BaseClient
+from perfeed.models.llm_usage import LLMUsage
+from perfeed.utils import approx_tokens
+
+
+class SimulatedClient(BaseClient):
+    """
+    An LLM client that simulates the latency of a real model.
+
+    A call blocks for `latency` seconds, plus the prompt at `prefill_tps` tokens per second,
+    plus the output at `generation_tps` tokens per second, like the synchronous clients do.
+    The output is a synthetic PR summary, or `output` if given.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        prefill_tps: float = 5000,
+        generation_tps: float = 500,
+        output: str | None = None,
+        n_files: int = 10,
+        n_threads: int = 5,
+        seed: int = 0,
+        model: str = "simulated",
+    ):
+        self.model = model
+        self.latency = latency
+        self.prefill_tps = prefill_tps
+        self.generation_tps = generation_tps
+        self.output = output or synthetic_llm_output(random.Random(seed), n_files, n_threads)
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def chat_completion(self, system: str, user: str, **kwargs) -> str:
+        return self.chat_completion_with_usage(system, user, **kwargs)[0]
+
+    def chat_completion_with_usage(
+        self, system: str, user: str, **kwargs
+    ) -> tuple[str, LLMUsage]:
+        prompt_tokens = approx_tokens(system) + approx_tokens(user)
+        completion_tokens = approx_tokens(self.output)
+        time.sleep(
+            self.latency
+            + prompt_tokens / self.prefill_tps
+            + completion_tokens / self.generation_tps
+        )
+        self.calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        return self.output, self._usage(prompt_tokens, completion_tokens)
@@ -0,0 +1,254 @@
+"""
+Runs the Perfeed benchmark suite against a local fake GitHub server and a simulated LLM.
+
+    python -m benchmarks.run --prs 200 --comments 20 --output benchmarks/results/baseline.json
+    python -m benchmarks.compare benchmarks/results/baseline.json benchmarks/results/<new>.json
+
+Nothing leaves the machine: GitHub is served by `FakeGithubServer` and the LLM is a
+`SimulatedClient`. Storage benchmarks run in a temporary directory.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.fake_github import FakeGithubServer
+from benchmarks.fake_llm import SimulatedClient
+from benchmarks.synthetic import SyntheticRepo
+from perfeed.data_stores import FeatherStorage, SQLStorage
+from perfeed.git_providers.github import GithubProvider
+from perfeed.log import get_logger
+from perfeed.models.git_provider import PullRequest
+from perfeed.models.pr_summary import PRSummaryMetadata
+from perfeed.telemetry import get_tracer
+from perfeed.tools.pr_summarizer import PRSummarizer, parse_pr_summary
+from perfeed.tools.weekly_summarizer import WeeklySummarizer
+
+
+def stats(samples: list[float]) -> dict:
+    samples = sorted(samples)
+    return {
+        "n": len(samples),
+        "total": sum(samples),
+        "mean": statistics.fmean(samples),
+        "p50": samples[len(samples) // 2],
+        "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "min": samples[0],
+        "max": samples[-1],
+    }
+
+
+async def timed(fn, repeat: int) -> list[float]:
+    samples = []
+    for i in range(repeat):
+        now = time.perf_counter()
+        result = fn(i)
+        if asyncio.iscoroutine(result):
+            await result
+        samples.append(time.perf_counter() - now)
+    return samples
+
+
+@contextmanager
+def data_dir():
+    """Run in a temporary working directory so the stores write under it."""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.makedirs(os.path.join(tmp, "work"))
+        os.chdir(os.path.join(tmp, "work"))
+        try:
+            yield tmp
+        finally:
+            os.chdir(cwd)
+
+
+async def run_suite(args: argparse.Namespace) -> dict:
+    repo = SyntheticRepo(
+        n_prs=args.prs,
+        n_comments=args.comments,
+        n_files=args.files,
+        spacing_hours=args.spacing_hours,
+    )
+    start = SyntheticRepo.START
+    end = start + timedelta(days=6)
+    authors = set(repo.authors())
+    sample_prs = list(range(1, min(args.samples, args.prs) + 1))
+    results = {}
+
+    # the PR index opens under ../_data on the first search, so keep it out of the
+    # real index
+    with FakeGithubServer([repo], latency=args.github_latency) as server, data_dir():
+        git = GithubProvider(repo.owner, token="benchmark", gh_host=server.url)
+        llm = SimulatedClient(
+            latency=args.llm_latency,
+            prefill_tps=args.llm_prefill_tps,
+            generation_tps=args.llm_generation_tps,
+            n_files=args.files,
+            n_threads=args.comments // 3,
+        )
+
+        results["github.search_prs"] = stats(
+            await timed(
+                lambda i: git.search_prs(repo.name, start, end, authors), args.repeat
+            )
+        )
+        results["github.get_pr"] = stats(
+            await timed(lambda i: git.get_pr(repo.name, sample_prs[i]), len(sample_prs))
+        )
+        results["github.get_pr_diff"] = stats(
+            await timed(
+                lambda i: git.get_pr_diff(repo.name, repo_pr(repo, sample_prs[i])),
+                len(sample_prs),
+            )
+        )
+
+        with data_dir():
+            store = FeatherStorage(data_type="pr_summary", overwrite=False, append=True)
+            summarizer = PRSummarizer(git, llm, store)
+            results["pr_summarizer.run"] = stats(
+                await timed(
+                    lambda i: summarizer.run(repo.name, sample_prs[i]), len(sample_prs)
+                )
+            )
+            results["pr_summarizer.run.stored"] = stats(
+                await timed(
+                    lambda i: summarizer.run(repo.name, sample_prs[i]), len(sample_prs)
+                )
+            )
+
+        summary = parse_pr_summary(llm.output)
+        for name, storage_cls in [("feather", FeatherStorage), ("sql", SQLStorage)]:
+            with data_dir():
+                store = storage_cls(data_type="pr_summary", overwrite=False, append=True)
+                metadata = [
+                    synthetic_metadata(repo, pr_number)
+                    for pr_number in range(1, args.store_rows + 1)
+                ]
+                results[f"storage.{name}.save"] = stats(
+                    await timed(lambda i: store.save(summary, metadata[i]), args.store_rows)
+                )
+                results[f"storage.{name}.load"] = stats(
+                    await timed(lambda i: store.load(), args.repeat)
+                )
+
+        with data_dir():
+            store = FeatherStorage(data_type="pr_summary", overwrite=False, append=True)
+            summarizer = PRSummarizer(git, llm, store)
+            weekly = WeeklySummarizer(git, summarizer, llm)
+            week = start.strftime("%Y-%m-%d")
+            calls = llm.calls
+            results["weekly_summarizer.run"] = stats(
+                await timed(lambda i: weekly.run(sorted(authors), repo.name, week), 1)
+            )
+            results["weekly_summarizer.run"]["llm_calls"] = llm.calls - calls
+
+        results["github.requests"] = server.requests
+        results["stages"] = get_tracer().summary()
+        results["llm"] = {
+            "calls": llm.calls,
+            "prompt_tokens": llm.prompt_tokens,
+            "completion_tokens": llm.completion_tokens,
+        }
+    return results
+
+
+def synthetic_metadata(repo: SyntheticRepo, pr_number: int) -> PRSummaryMetadata:
+    pull = repo.pull(pr_number)
+    return PRSummaryMetadata(
+        repo=repo.name,
+        author=pull["user"]["login"],
+        pr_number=pr_number,
+        llm_provider=SimulatedClient.__name__,
+        model="simulated",
+        pr_created_at=pull["created_at"],
+        pr_merged_at=pull["merged_at"],
+        created_at=pull["updated_at"],
+    )
+
+
+def repo_pr(repo: SyntheticRepo, pr_number: int) -> PullRequest:
+    pull = repo.pull(pr_number)
+    return PullRequest(
+        number=pr_number,
+        title=pull["title"],
+        state=pull["state"],
+        author=pull["user"]["login"],
+        reviewers=[],
+        created_at=pull["created_at"],
+        first_committed_at=pull["created_at"],
+        description=pull["body"],
+        html_url=pull["html_url"],
+        diff_url=pull["diff_url"],
+        comments=[],
+        diff_lines="",
+    )
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--prs", type=int, default=200, help="PRs in the synthetic repo")
+    parser.add_argument("--comments", type=int, default=20, help="review comments per PR")
+    parser.add_argument("--files", type=int, default=10, help="files changed per PR")
+    parser.add_argument("--spacing-hours", type=float, default=12, help="hours between PRs")
+    parser.add_argument("--samples", type=int, default=10, help="PRs sampled per benchmark")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--store-rows", type=int, default=100)
+    parser.add_argument("--github-latency", type=float, default=0.02)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--llm-prefill-tps", type=float, default=20000)
+    parser.add_argument("--llm-generation-tps", type=float, default=5000)
+    parser.add_argument("--output", help="defaults to benchmarks/results/<timestamp>.json")
+    args = parser.parse_args()
+
+    get_logger().remove()
+    started_at = datetime.now(timezone.utc)
+    results = asyncio.run(run_suite(args))
+
+    report = {
+        "meta": {
+            "started_at": started_at.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "params": vars(args),
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        os.path.dirname(__file__),
+        "results",
+        f"{started_at.strftime('%Y%m%dT%H%M%SZ')}.json",
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for name, result in results.items():
+        if isinstance(result, dict) and "mean" in result:
+            print(
+                f"{name:32} n={result['n']:<5} mean={result['mean'] * 1000:10.2f}ms "
+                f"p95={result['p95'] * 1000:10.2f}ms"
+            )
+    print(f"Saved results to {output}")
+
+
+if __name__ == "__main__":
+    main()
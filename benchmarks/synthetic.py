@@ -0,0 +1,317 @@
+import asyncio
+import json
+import random
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+from pydantic import BaseModel
+
+from perfeed.data_stores.base import BaseStorage
+from perfeed.git_providers.base import BaseGitProvider
+from perfeed.llms.base_client import BaseClient
+from perfeed.models.git_provider import CommentType, PRComment, PullRequest
+from perfeed.models.llm_usage import LLMUsage
+from perfeed.utils import approx_tokens
+
+WORDS = (
+    "refactor cache provider summary thread review async storage prompt token diff "
+    "commit merge branch fix test docs config model client pipeline queue"
+).split()
+
+
+def sentence(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+def synthetic_diff(rng: random.Random, n_files: int, lines_per_file: int) -> str:
+    chunks = []
+    for i in range(n_files):
+        filename = f"perfeed/module_{i}.py"
+        chunks.append(
+            f"diff --git a/{filename} b/{filename}\n"
+            f"index 1234567..89abcde 100644\n--- a/{filename}\n+++ b/{filename}\n"
+            f"@@ -1,{lines_per_file} +1,{lines_per_file} @@\n"
+        )
+        for _ in range(lines_per_file):
+            prefix = rng.choice("+- ")
+            chunks.append(f"{prefix}    {sentence(rng, 8)}\n")
+    return "".join(chunks)
+
+
+def synthetic_comments(rng: random.Random, pr_number: int, n: int) -> list[PRComment]:
+    created = datetime(2024, 10, 21, tzinfo=timezone.utc)
+    comments = []
+    parent_id = None
+    for i in range(n):
+        comment_id = pr_number * 10_000 + i
+        # every third comment starts a new thread
+        in_reply_to_id = parent_id if i % 3 else None
+        if in_reply_to_id is None:
+            parent_id = comment_id
+        comments.append(
+            PRComment(
+                id=comment_id,
+                type=CommentType.REVIEW_COMMENT,
+                user=f"user{rng.randrange(8)}",
+                user_type="User",
+                diff_hunk="@@ -1,4 +1,4 @@\n" + "\n".join(sentence(rng, 8) for _ in range(4)),
+                body=sentence(rng, 30),
+                created_at=(created + timedelta(minutes=i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                code_change=bool(i % 2),
+                in_reply_to_id=in_reply_to_id,
+                html_url=f"https://github.com/Perfeed/perfeed/pull/{pr_number}#discussion_r{comment_id}",
+            )
+        )
+    return comments
+
+
+def synthetic_pr(rng: random.Random, pr_number: int, n_comments: int) -> PullRequest:
+    created = datetime(2024, 10, 21, tzinfo=timezone.utc) + timedelta(hours=pr_number % 100)
+    return PullRequest(
+        number=pr_number,
+        title=sentence(rng, 6),
+        state="closed",
+        author=f"user{pr_number % 4}",
+        reviewers=[f"user{(pr_number + 1) % 4}"],
+        created_at=created.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        first_committed_at=created.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        description=sentence(rng, 40),
+        html_url=f"https://github.com/Perfeed/perfeed/pull/{pr_number}",
+        diff_url=f"https://github.com/Perfeed/perfeed/pull/{pr_number}.diff",
+        comments=synthetic_comments(rng, pr_number, n_comments),
+        diff_lines="+120 -40",
+        merged_at=(created + timedelta(days=1)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+    )
+
+
+def synthetic_llm_output(rng: random.Random, n_files: int, n_threads: int) -> str:
+    """A PR summary as an LLM would return it, wrapped in a markdown fence."""
+    summary = {
+        "type": ["Enhancement"],
+        "title": sentence(rng, 8),
+        "description": sentence(rng, 60),
+        "pr_files": [
+            {
+                "filename": f"perfeed/module_{i}.py",
+                "language": "Python",
+                "changes_summary": sentence(rng, 30),
+                "changes_title": sentence(rng, 6),
+                "label": "enhancement",
+            }
+            for i in range(n_files)
+        ],
+        "comments": [
+            {
+                "parent_thread_id": i,
+                "child_thread_ids": [i + 1, i + 2],
+                "users": ["user1", "user2"],
+                "html_url": f"https://github.com/Perfeed/perfeed/pull/1#discussion_r{i}",
+                "summary": sentence(rng, 25),
+                "details": sentence(rng, 50),
+                "eval_aspect": ["code quality"],
+                "lead_to_action": "code change",
+                "lead_to_action_desc": sentence(rng, 20),
+            }
+            for i in range(n_threads)
+        ],
+    }
+    return "```json\n" + json.dumps(summary, indent=2) + "\n```"
+
+
+class FakeGitProvider(BaseGitProvider):
+    """An in-memory git provider that simulates network latency with `asyncio.sleep`."""
+
+    def __init__(
+        self,
+        owner: str = "Perfeed",
+        token: str | None = None,
+        n_comments: int = 20,
+        n_files: int = 10,
+        lines_per_file: int = 40,
+        latency: float = 0.0,
+        seed: int = 0,
+    ):
+        self.owner = owner
+        self.n_comments = n_comments
+        self.n_files = n_files
+        self.lines_per_file = lines_per_file
+        self.latency = latency
+        self.seed = seed
+
+    async def list_pr_comments(self, repo_name: str, pr_number: int) -> list[PRComment]:
+        await asyncio.sleep(self.latency)
+        return synthetic_comments(
+            random.Random(self.seed + pr_number), pr_number, self.n_comments
+        )
+
+    async def get_pr(self, repo: str, pr_number: int) -> PullRequest:
+        await asyncio.sleep(self.latency)
+        return synthetic_pr(random.Random(self.seed + pr_number), pr_number, self.n_comments)
+
+    async def get_pr_diff(self, repo_name: str, pr: PullRequest) -> str:
+        await asyncio.sleep(self.latency)
+        return synthetic_diff(
+            random.Random(self.seed + pr.number), self.n_files, self.lines_per_file
+        )
+
+    async def search_prs(self, repo_name, start_date, end_date, authors, closed_only=True):
+        await asyncio.sleep(self.latency)
+        return []
+
+    async def list_repos(self) -> list[str]:
+        await asyncio.sleep(self.latency)
+        return ["perfeed"]
+
+
+class CannedClient(BaseClient):
+    """An LLM client that instantly returns a synthetic PR summary."""
+
+    def __init__(
+        self, n_files: int = 10, n_threads: int = 7, seed: int = 0, model: str = "canned"
+    ):
+        self.model = model
+        self.output = synthetic_llm_output(random.Random(seed), n_files, n_threads)
+
+    def chat_completion(self, system: str, user: str, **kwargs) -> str:
+        return self.output
+
+    def chat_completion_with_usage(
+        self, system: str, user: str, **kwargs
+    ) -> tuple[str, LLMUsage]:
+        return self.output, self._usage(
+            approx_tokens(system) + approx_tokens(user), approx_tokens(self.output)
+        )
+
+
+class NullStorage(BaseStorage):
+    """A store that never hits and discards what is saved."""
+
+    def __init__(self, data_type: str = "pr_summary"):
+        super().__init__(data_type, append=True, overwrite=False)
+
+    def save(self, data: BaseModel, metadata: BaseModel) -> None:
+        pass
+
+    def load(self) -> pd.DataFrame:
+        return pd.DataFrame()
+
+    def validate_and_convert(self, data: BaseModel, metadata: BaseModel) -> pd.DataFrame:
+        return pd.DataFrame()
+
+
+def github_timestamp(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class SyntheticRepo:
+    """
+    Raw GitHub REST payloads for a repository with `n_prs` PRs of `n_comments` comments.
+
+    PRs are created every `spacing_hours` starting on Monday 2024-10-21, by `n_authors`
+    authors taking turns, so a weekly report of one author covers a predictable subset.
+    """
+
+    START = datetime(2024, 10, 21, tzinfo=timezone.utc)
+
+    def __init__(
+        self,
+        owner: str = "Perfeed",
+        name: str = "perfeed",
+        n_prs: int = 100,
+        n_comments: int = 10,
+        n_files: int = 10,
+        lines_per_file: int = 40,
+        n_authors: int = 4,
+        spacing_hours: float = 2,
+        seed: int = 0,
+    ):
+        self.owner = owner
+        self.name = name
+        self.n_prs = n_prs
+        self.n_comments = n_comments
+        self.n_files = n_files
+        self.lines_per_file = lines_per_file
+        self.n_authors = n_authors
+        self.spacing_hours = spacing_hours
+        self.seed = seed
+        self.base_url = ""
+
+    def authors(self) -> list[str]:
+        return [f"user{i}" for i in range(self.n_authors)]
+
+    def created_at(self, pr_number: int) -> datetime:
+        return self.START + timedelta(hours=(pr_number - 1) * self.spacing_hours)
+
+    def pull(self, pr_number: int) -> dict:
+        rng = random.Random(self.seed + pr_number)
+        created_at = self.created_at(pr_number)
+        return {
+            "number": pr_number,
+            "title": sentence(rng, 6),
+            "user": {"login": f"user{pr_number % self.n_authors}", "type": "User"},
+            "state": "closed",
+            "body": sentence(rng, 40),
+            "created_at": github_timestamp(created_at),
+            "updated_at": github_timestamp(created_at + timedelta(hours=20)),
+            "merged_at": github_timestamp(created_at + timedelta(hours=20)),
+            "html_url": f"https://github.com/{self.owner}/{self.name}/pull/{pr_number}",
+            "diff_url": f"{self.base_url}/{self.owner}/{self.name}/pull/{pr_number}.diff",
+            "additions": self.lines_per_file * self.n_files // 2,
+            "deletions": self.lines_per_file * self.n_files // 4,
+            "base": {"sha": f"{pr_number:040x}", "repo": {"name": self.name}},
+            "head": {"sha": f"{pr_number + 1:040x}"},
+        }
+
+    def pulls(self) -> list[dict]:
+        return [self.pull(pr_number) for pr_number in range(1, self.n_prs + 1)]
+
+    def commits(self, pr_number: int) -> list[dict]:
+        first_committed_at = self.created_at(pr_number) - timedelta(hours=3)
+        return [{"commit": {"author": {"date": github_timestamp(first_committed_at)}}}]
+
+    def reviews(self, pr_number: int) -> list[dict]:
+        return [
+            {
+                "user": {
+                    "login": f"user{(pr_number + 1) % self.n_authors}",
+                    "type": "User",
+                }
+            }
+        ]
+
+    def review_comments(self, pr_number: int) -> list[dict]:
+        comments = synthetic_comments(
+            random.Random(self.seed + pr_number), pr_number, self.n_comments
+        )
+        return [
+            {
+                "id": comment.id,
+                "user": {"login": comment.user, "type": comment.user_type},
+                "body": comment.body,
+                "created_at": comment.created_at,
+                "html_url": comment.html_url,
+                "diff_hunk": comment.diff_hunk,
+                "position": None if comment.code_change else 1,
+                "in_reply_to_id": comment.in_reply_to_id,
+            }
+            for comment in comments
+        ]
+
+    def issue_comments(self, pr_number: int) -> list[dict]:
+        rng = random.Random(self.seed - pr_number)
+        created_at = self.created_at(pr_number)
+        return [
+            {
+                "id": pr_number * 10_000 + 5_000 + i,
+                "user": {"login": f"user{rng.randrange(self.n_authors)}", "type": "User"},
+                "body": sentence(rng, 20),
+                "created_at": github_timestamp(created_at + timedelta(hours=1, minutes=i)),
+                "html_url": f"https://github.com/{self.owner}/{self.name}/pull/{pr_number}#issuecomment-{i}",
+            }
+            for i in range(max(1, self.n_comments // 5))
+        ]
+
+    def diff(self, pr_number: int) -> str:
+        return synthetic_diff(
+            random.Random(self.seed + pr_number), self.n_files, self.lines_per_file
+        )
@@ -0,0 +1,3 @@
+from perfeed.cli import main
+
+main()
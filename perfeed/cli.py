@@ -0,0 +1,224 @@
+"""
+The `perfeed` command line.
+
+    perfeed summarize-pr Perfeed perfeed 13
+    perfeed weekly Perfeed perfeed --users jzxcd --week 2024-10-21
+    perfeed weekly Perfeed '*' --users jzxcd --week 2024-10-21
+    perfeed backfill Perfeed perfeed --since 2024-09-01 --max-usd 5
+    perfeed weekly Perfeed perfeed --users jzxcd --week 2024-10-21 --record week.jsonl.gz
+    perfeed weekly Perfeed perfeed --users jzxcd --week 2024-10-21 --replay week.jsonl.gz
+
+Only the standard library is imported at startup. Each command imports the backends it
+uses when it runs, so a one-PR run does not pay for IPython, sqlalchemy or an unused
+LLM client.
+"""
+
+import argparse
+import asyncio
+import json
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from perfeed.resources import Resources
+
+LLM_PROVIDERS = ["ollama", "openai", "cascade"]
+STORE_BACKENDS = ["feather", "sql", "duckdb"]
+
+
+def make_summarizer(resources: "Resources", args: argparse.Namespace, offload=None):
+    return resources.summarizer(
+        args.owner,
+        args.llm,
+        args.model,
+        args.store,
+        offload=offload,
+        budget=resources.budget(args.max_tokens, args.max_usd),
+    )
+
+
+async def summarize_pr(resources: "Resources", args: argparse.Namespace) -> None:
+    summarizer = make_summarizer(resources, args)
+    pr_summary, pr_metadata = await summarizer.run(
+        args.repo, args.pr_number, refresh=args.refresh
+    )
+    print(
+        json.dumps(
+            {"summary": pr_summary.model_dump(), "metadata": pr_metadata.model_dump()},
+            indent=2,
+        )
+    )
+
+
+async def weekly(resources: "Resources", args: argparse.Namespace) -> None:
+    from perfeed.tools.weekly_summarizer import WeeklySummarizer
+
+    queue = None
+    if args.queue:
+        from perfeed.data_stores.job_queue import JobQueue
+
+        queue = JobQueue()
+    summarizer = make_summarizer(resources, args)
+    # the roll-up is not a PR summary, so a cascade rolls up with its large model
+    llm = getattr(summarizer.llm, "large", summarizer.llm)
+    weekly_summarizer = WeeklySummarizer(summarizer.git, summarizer, llm, queue=queue)
+    # several comma-separated repos, or '*' for all the repos of the owner
+    repos = args.repo.split(",")
+    repo_name = None if args.repo == "*" else repos[0] if len(repos) == 1 else repos
+    print(
+        await weekly_summarizer.run(
+            args.users, repo_name, args.week, retry_failed=args.retry_failed
+        )
+    )
+
+
+async def backfill(resources: "Resources", args: argparse.Namespace) -> None:
+    from perfeed.data_stores.job_queue import JobQueue, JobStatus
+    from perfeed.log import get_logger
+    from perfeed.tools.webhook_service import WebhookService
+    from perfeed.utils.offload import BatchedProcessPool
+
+    offload = BatchedProcessPool() if args.offload else None
+    summarizer = make_summarizer(resources, args, offload=offload)
+    queue = JobQueue()
+    since = datetime.strptime(args.since, "%Y-%m-%d").astimezone()
+    until = (
+        datetime.strptime(args.until, "%Y-%m-%d").astimezone()
+        if args.until
+        else datetime.now().astimezone()
+    ) + timedelta(days=1)
+
+    pr_numbers = await summarizer.git.search_prs(
+        args.repo, since, until, set(args.users) if args.users else None
+    )
+    if args.retry_failed:
+        queue.retry_failed(args.repo, pr_numbers)
+    queued = sum(queue.enqueue(args.repo, pr_number) for pr_number in pr_numbers)
+    get_logger().info(
+        f"Backfilling {len(pr_numbers)} PRs of {args.repo}, {queued} newly queued"
+    )
+
+    # the webhook service's workers drain the queue with bounded concurrency
+    service = WebhookService(
+        summarizer, queue, owner=args.owner, num_workers=args.workers, merged_only=False
+    )
+    try:
+        # one run, so the budget limits the whole backfill
+        usage = await service.drain()
+    finally:
+        if offload is not None:
+            offload.shutdown()
+    get_logger().info(
+        f"Backfill done: {queue.counts().get(JobStatus.done, 0)} done, "
+        f"{queue.counts().get(JobStatus.failed, 0)} failed, "
+        f"{queue.counts().get(JobStatus.pending, 0)} left pending, "
+        f"{usage['total_tokens']} tokens, ${usage['cost_usd']:.2f}"
+    )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="perfeed", description="Summarize pull requests and weekly engineering work."
+    )
+    backends = argparse.ArgumentParser(add_help=False)
+    backends.add_argument("owner", help="the owner of the repository, e.g. Perfeed")
+    backends.add_argument("repo", help="the name of the repository, e.g. perfeed")
+    backends.add_argument(
+        "--llm", choices=LLM_PROVIDERS, help="defaults to llm_provider in configs.toml"
+    )
+    backends.add_argument("--model", help="defaults to the model in configs.toml")
+    backends.add_argument(
+        "--store", choices=STORE_BACKENDS, help="defaults to store_backend in configs.toml"
+    )
+    backends.add_argument(
+        "--max-usd",
+        type=float,
+        help="LLM cost limit of the run in USD, defaults to [budget] in configs.toml",
+    )
+    backends.add_argument(
+        "--max-tokens",
+        type=int,
+        help="LLM token limit of the run, defaults to [budget] in configs.toml",
+    )
+    cassette = backends.add_mutually_exclusive_group()
+    cassette.add_argument(
+        "--record", metavar="CASSETTE", help="record GitHub and LLM responses to a file"
+    )
+    cassette.add_argument(
+        "--replay", metavar="CASSETTE", help="replay recorded responses, offline"
+    )
+    backends.add_argument(
+        "--latency-scale",
+        type=float,
+        default=1.0,
+        help="factor of the recorded latency waited on replay, 0 for none",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser(
+        "summarize-pr", parents=[backends], help="summarize a pull request"
+    )
+    command.add_argument("pr_number", type=int)
+    command.add_argument(
+        "--refresh",
+        action="store_true",
+        help="summarize again the files and threads that changed since it was stored",
+    )
+    command.set_defaults(func=summarize_pr)
+
+    command = commands.add_parser(
+        "weekly", parents=[backends], help="summarize the pull requests of a week"
+    )
+    command.add_argument("--users", nargs="+", required=True, help="GitHub logins")
+    command.add_argument(
+        "--week", required=True, help="the Sunday or Monday the week starts, YYYY-MM-DD"
+    )
+    command.add_argument(
+        "--queue", action="store_true", help="track progress in the job queue"
+    )
+    command.add_argument(
+        "--retry-failed", action="store_true", help="retry PRs that failed before"
+    )
+    command.set_defaults(func=weekly)
+
+    command = commands.add_parser(
+        "backfill", parents=[backends], help="summarize the closed pull requests of a period"
+    )
+    command.add_argument("--since", required=True, help="YYYY-MM-DD")
+    command.add_argument("--until", help="YYYY-MM-DD, defaults to today")
+    command.add_argument("--users", nargs="+", help="GitHub logins, defaults to everyone")
+    command.add_argument("--workers", type=int, help="concurrent summaries")
+    command.add_argument(
+        "--offload", action="store_true", help="run CPU-bound stages in worker processes"
+    )
+    command.add_argument(
+        "--retry-failed", action="store_true", help="retry PRs that failed before"
+    )
+    command.set_defaults(func=backfill)
+    return parser
+
+
+async def run(args: argparse.Namespace) -> None:
+    from perfeed.resources import Resources
+    from perfeed.utils.cassette import Cassette
+
+    cassette = None
+    if args.record:
+        cassette = Cassette(args.record, "record")
+    elif args.replay:
+        cassette = Cassette(args.replay, "replay", latency_scale=args.latency_scale)
+    try:
+        async with Resources(cassette) as resources:
+            await args.func(resources, args)
+    finally:
+        if cassette is not None:
+            cassette.save()
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = build_parser().parse_args(argv)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,18 @@
-__all__ = ["FeatherStorage", "SQLStorage"]
-from perfeed.data_stores.storage_feather import FeatherStorage
-from perfeed.data_stores.storage_sqldb import SQLStorage
+import importlib
+
+__all__ = ["FeatherStorage", "SQLStorage", "DuckDBStorage", "JobQueue"]
+
+# backends are imported on first access, so using the job queue does not pull in
+# pandas or sqlalchemy
+_modules = {
+    "FeatherStorage": "perfeed.data_stores.storage_feather",
+    "SQLStorage": "perfeed.data_stores.storage_sqldb",
+    "DuckDBStorage": "perfeed.data_stores.storage_duckdb",
+    "JobQueue": "perfeed.data_stores.job_queue",
+}
+
+
+def __getattr__(name: str):
+    if name in _modules:
+        return getattr(importlib.import_module(_modules[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
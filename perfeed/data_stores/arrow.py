@@ -0,0 +1,134 @@
+import types
+import typing
+from enum import Enum
+from typing import Any, Iterable
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from pydantic import BaseModel
+
+from perfeed.models.pr_summary import PRSummary, PRSummaryMetadata
+
+# a conjunction of (column, op, value) predicates, as in `pyarrow.parquet` filters
+Filters = list[tuple[str, str, Any]]
+
+_PRIMITIVES = {
+    str: pa.string(),
+    int: pa.int64(),
+    float: pa.float64(),
+    bool: pa.bool_(),
+}
+
+_OPS = {
+    "==": pc.equal,
+    "=": pc.equal,
+    "!=": pc.not_equal,
+    "<": pc.less,
+    "<=": pc.less_equal,
+    ">": pc.greater,
+    ">=": pc.greater_equal,
+}
+
+
+def arrow_type(annotation: Any) -> pa.DataType:
+    """The Arrow type of a field annotation. Models become structs and lists become
+    list columns, so nested fields are stored natively instead of as Python objects."""
+    origin = typing.get_origin(annotation)
+    if origin in (typing.Union, types.UnionType):
+        # Optional[X] is a nullable X; Arrow fields are nullable by default
+        args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        return arrow_type(args[0])
+    if origin is list:
+        return pa.list_(arrow_type(typing.get_args(annotation)[0]))
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return pa.struct(model_fields(annotation))
+    if isinstance(annotation, type) and issubclass(annotation, Enum):
+        return pa.string()
+    if annotation in _PRIMITIVES:
+        return _PRIMITIVES[annotation]
+    raise TypeError(f"No Arrow type for {annotation!r}")
+
+
+def model_fields(model: type[BaseModel]) -> list[pa.Field]:
+    return [
+        pa.field(name, arrow_type(field.annotation))
+        for name, field in model.model_fields.items()
+    ]
+
+
+def model_schema(*models: type[BaseModel]) -> pa.Schema:
+    """The Arrow schema of a row made of the fields of `models`, in order."""
+    return pa.schema([field for model in models for field in model_fields(model)])
+
+
+PR_SUMMARY_SCHEMA = model_schema(PRSummary, PRSummaryMetadata)
+
+
+def to_table(rows: Iterable[dict], schema: pa.Schema = PR_SUMMARY_SCHEMA) -> pa.Table:
+    """Convert `model_dump()`-ed rows to a table of `schema`."""
+    return pa.Table.from_pylist(_plain(list(rows)), schema=schema)
+
+
+def to_pandas(table: pa.Table) -> pd.DataFrame:
+    """
+    Convert a table to a DataFrame whose list columns, e.g. `pr_files`, hold Python lists
+    of dicts as dumped from the models, rather than the numpy arrays `to_pandas` makes,
+    so cells compare to lists and serialize with `json.dumps`.
+    """
+    df = table.to_pandas()
+    for name, column in zip(table.column_names, table.columns):
+        if pa.types.is_list(column.type) or pa.types.is_large_list(column.type):
+            df[name] = pd.Series(column.to_pylist(), index=df.index, dtype=object)
+    return df
+
+
+def _plain(value: Any) -> Any:
+    """Replace enums, e.g. `PRType`, by their values, at any depth."""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, list):
+        return [_plain(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    return value
+
+
+def filter_expression(filters: Filters) -> pc.Expression:
+    """
+    Build the Arrow expression of a conjunction of predicates.
+
+    Args:
+        filters (Filters): `(column, op, value)` tuples, where op is one of `==`, `!=`,
+            `<`, `<=`, `>`, `>=`, `in` and `not in`.
+
+    Returns:
+        pc.Expression: The expression that holds when all predicates hold.
+    """
+    expression = None
+    for column, op, value in filters:
+        field = pc.field(column)
+        if op == "in":
+            predicate = field.isin(list(value))
+        elif op == "not in":
+            predicate = ~field.isin(list(value))
+        elif op in _OPS:
+            predicate = _OPS[op](field, value)
+        else:
+            raise ValueError(f"Unsupported filter operator {op!r}")
+        expression = predicate if expression is None else expression & predicate
+    return expression
+
+
+def project(
+    table: pa.Table, columns: list[str] | None = None, filters: Filters | None = None
+) -> pa.Table:
+    """Filter the rows of a table, then select its columns. Without filters the
+    columns are not copied."""
+    if table.num_columns == 0:
+        return table
+    if filters:
+        table = table.filter(filter_expression(filters))
+    if columns is not None:
+        table = table.select(columns)
+    return table
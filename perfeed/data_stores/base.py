@@ -1,8 +1,20 @@
+import asyncio
+import contextvars
+import os
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from pydantic import BaseModel
-from typing import Dict
+from typing import Any, AsyncIterator, Callable, Dict, Tuple
 import pandas as pd
-from perfeed.models.pr_summary import PRSummary
+import pyarrow as pa
+from perfeed.data_stores.arrow import Filters, project
+from perfeed.models.pr_summary import PRSummary, PRSummaryMetadata
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
 
 class UnsupportedFormatError(Exception):
@@ -19,6 +31,128 @@ class BaseStorage(ABC):
         self.overwrite = overwrite
         self.append = append
         self._validate_options()
+        # the thread of the async methods, started on first use
+        self._io: ThreadPoolExecutor | None = None
+
+    async def __aenter__(self) -> "BaseStorage":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Release the connections of the store. Stores that own a pool override it and
+        call this to stop the I/O thread."""
+        if self._io is not None:
+            self._io.shutdown(wait=True)
+            self._io = None
+
+    async def run_io(self, fn: Callable, *args) -> Any:
+        """
+        Run a blocking call on the store's I/O thread, e.g. of a cache kept next to
+        the store.
+
+        The thread is the only one to run the calls of the async methods, so they cannot
+        run into each other, and they run in the order they were made, e.g. a load after
+        a save sees the saved row. The event loop keeps serving other PRs meanwhile.
+        """
+        if self._io is None:
+            self._io = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix=f"{self.data_type}-io"
+            )
+        # the caller's span follows the call, as with asyncio.to_thread
+        context = contextvars.copy_context()
+        return await asyncio.wrap_future(self._io.submit(context.run, fn, *args))
+
+    async def aload(self) -> pd.DataFrame:
+        """`load` on the I/O thread."""
+        return await self.run_io(self.load)
+
+    async def aload_arrow(
+        self, columns: list[str] | None = None, filters: Filters | None = None
+    ) -> pa.Table:
+        """`load_arrow` on the I/O thread."""
+        return await self.run_io(self.load_arrow, columns, filters)
+
+    async def asave(self, data: BaseModel, metadata: BaseModel) -> None:
+        """`save` on the I/O thread."""
+        await self.run_io(self.save, data, metadata)
+
+    async def aget_latest(
+        self,
+        repo: str,
+        pr_number: int,
+        candidates: list[tuple[str, str]] | None = None,
+    ) -> Tuple[PRSummary, PRSummaryMetadata] | None:
+        """`get_latest` on the I/O thread."""
+        return await self.run_io(self.get_latest, repo, pr_number, candidates)
+
+    def get_latest(
+        self,
+        repo: str,
+        pr_number: int,
+        candidates: list[tuple[str, str]] | None = None,
+    ) -> Tuple[PRSummary, PRSummaryMetadata] | None:
+        """
+        The latest summary of a PR, the last saved one if several share a timestamp.
+
+        Only the rows of the PR are read, through `load_arrow`.
+
+        Args:
+            repo (str): The name of the repository.
+            pr_number (int): The pull request number.
+            candidates (list[tuple[str, str]] | None): If set, only summaries by one of
+                these (LLM provider, model) pairs are considered.
+
+        Returns:
+            Tuple[PRSummary, PRSummaryMetadata] | None: The summary and its metadata, or
+                None if the PR has no matching summary.
+        """
+        rows = self.load_arrow(
+            filters=[("repo", "==", repo), ("pr_number", "==", pr_number)]
+        ).to_pylist()
+        latest = None
+        for row in rows:
+            if candidates is not None and (row["llm_provider"], row["model"]) not in candidates:
+                continue
+            if latest is None or row["created_at"] >= latest["created_at"]:
+                latest = row
+        if latest is None:
+            return None
+        return PRSummary(**latest), PRSummaryMetadata(**latest)
+
+    @asynccontextmanager
+    async def pr_lock(
+        self, repo: str, pr_number: int, poll_interval: float = 0.05
+    ) -> AsyncIterator[None]:
+        """
+        Hold an exclusive lock on a PR across the processes sharing this store, e.g. while
+        it is summarized, so other workers wait for the first summary and load it instead
+        of summarizing the PR again.
+
+        The lock is an `flock` on a file in `<store_dict>/locks`, polled without blocking
+        so waiting can be cancelled. Stores without a directory, and platforms without
+        `fcntl`, do not lock.
+        """
+        store_dict = getattr(self, "store_dict", None)
+        if store_dict is None or fcntl is None:
+            yield
+            return
+
+        lock_dir = os.path.join(store_dict, "locks")
+        os.makedirs(lock_dir, exist_ok=True)
+        name = f"{repo}#{pr_number}.lock".replace(os.sep, "_")
+        with open(os.path.join(lock_dir, name), "a") as lock_file:
+            while True:
+                try:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    await asyncio.sleep(poll_interval)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
 
     def _validate_options(self):
         if self.overwrite and self.append:
@@ -34,6 +168,26 @@ class BaseStorage(ABC):
     def load(self) -> pd.DataFrame:
         pass
 
+    def load_arrow(
+        self, columns: list[str] | None = None, filters: Filters | None = None
+    ) -> pa.Table:
+        """
+        Load the rows matching `filters` as an Arrow table, with only `columns`.
+
+        Nested fields such as `pr_files` and `comments` are list and struct columns.
+        This default converts `load()`; stores override it to read only what is asked.
+
+        Args:
+            columns (list[str] | None): The columns to return, all if None.
+            filters (Filters | None): `(column, op, value)` predicates that must all
+                hold, e.g. `[("repo", "==", "perfeed"), ("created_at", ">=", "2024-10")]`.
+
+        Returns:
+            pa.Table: The matching rows.
+        """
+        table = pa.Table.from_pandas(self.load(), preserve_index=False)
+        return project(table, columns, filters)
+
     @abstractmethod
     def validate_and_convert(
         self, data: BaseModel, metadata: BaseModel
@@ -0,0 +1,324 @@
+import asyncio
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from enum import Enum
+from typing import AsyncIterator
+
+from perfeed.config_loader import settings
+
+
+class JobStatus(str, Enum):
+    pending = "pending"
+    running = "running"
+    done = "done"
+    failed = "failed"
+
+
+class JobQueue:
+    """
+    A durable, deduplicated queue of PR summarization jobs backed by SQLite.
+
+    A job is identified by (repo, pr_number), so enqueueing the same PR twice is a no-op,
+    unless it is requeued because the PR was closed again after its job finished. The
+    requeued job is marked stale, so its stored summary is refreshed.
+    Claiming a job grants a lease. A job whose lease expired, e.g. because its process was
+    killed, is claimable again until it has used up `max_attempts`, then it is failed.
+    Failed jobs stay failed until they are explicitly retried.
+    """
+
+    def __init__(
+        self,
+        path: str | None = None,
+        lease_seconds: float | None = None,
+        max_attempts: int | None = None,
+    ):
+        self.path = path or os.path.join("../_data/jobs", "job_queue.sqlite")
+        self.lease_seconds = lease_seconds or settings.job_queue.lease_seconds
+        self.max_attempts = max_attempts or settings.job_queue.max_attempts
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                repo TEXT NOT NULL,
+                pr_number INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                error TEXT,
+                enqueued_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (repo, pr_number)
+            )
+            """
+        )
+        # queues created before attempts and leases were tracked
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "attempts" not in columns:
+            self._conn.execute(
+                "ALTER TABLE jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0"
+            )
+        if "lease_expires_at" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN lease_expires_at REAL")
+        if "stale" not in columns:
+            self._conn.execute(
+                "ALTER TABLE jobs ADD COLUMN stale INTEGER NOT NULL DEFAULT 0"
+            )
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    def _execute(self, sql: str, params: tuple = ()) -> list[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _expire_leases(self) -> None:
+        """Fail the expired jobs that have no attempts left."""
+        self._execute(
+            """
+            UPDATE jobs SET status = ?, error = ?, lease_expires_at = NULL, updated_at = ?
+            WHERE status = ? AND lease_expires_at < ? AND attempts >= ?
+            """,
+            (
+                JobStatus.failed.value,
+                "lease expired on the last attempt",
+                self._now(),
+                JobStatus.running.value,
+                time.time(),
+                self.max_attempts,
+            ),
+        )
+
+    def enqueue(self, repo: str, pr_number: int, requeue: bool = False) -> bool:
+        """
+        Add a job to the queue.
+
+        Args:
+            repo (str): The name of the repository.
+            pr_number (int): The pull request number.
+            requeue (bool): Move a done or failed job back to `pending` with a fresh
+                attempt count, and mark it stale, e.g. when a PR is reopened and closed
+                again. Pending and running jobs are left as they are.
+
+        Returns:
+            bool: True if the job was added or requeued, False if it was already known.
+        """
+        now = self._now()
+        rows = self._execute(
+            """
+            INSERT INTO jobs (repo, pr_number, status, enqueued_at, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (repo, pr_number) DO UPDATE SET
+                status = excluded.status, error = NULL, attempts = 0, stale = 1,
+                lease_expires_at = NULL, enqueued_at = excluded.enqueued_at,
+                updated_at = excluded.updated_at
+            WHERE ? AND jobs.status IN (?, ?)
+            RETURNING pr_number
+            """,
+            (
+                repo,
+                pr_number,
+                JobStatus.pending.value,
+                now,
+                now,
+                requeue,
+                JobStatus.done.value,
+                JobStatus.failed.value,
+            ),
+        )
+        return len(rows) > 0
+
+    def claim(self) -> tuple[str, int] | None:
+        """
+        Atomically lease the oldest claimable job.
+
+        Returns:
+            tuple[str, int] | None: The (repo, pr_number) of the claimed job, or None if
+            no job is claimable.
+        """
+        self._expire_leases()
+        now = time.time()
+        rows = self._execute(
+            """
+            UPDATE jobs SET status = ?, attempts = attempts + 1, lease_expires_at = ?, updated_at = ?
+            WHERE rowid = (
+                SELECT rowid FROM jobs
+                WHERE status = ? OR (status = ? AND lease_expires_at < ?)
+                ORDER BY enqueued_at, rowid LIMIT 1
+            )
+            RETURNING repo, pr_number
+            """,
+            (
+                JobStatus.running.value,
+                now + self.lease_seconds,
+                self._now(),
+                JobStatus.pending.value,
+                JobStatus.running.value,
+                now,
+            ),
+        )
+        return (rows[0][0], rows[0][1]) if rows else None
+
+    def claim_job(self, repo: str, pr_number: int) -> bool:
+        """
+        Atomically lease a specific job if it is claimable.
+
+        Returns:
+            bool: True if the job was claimed, False if it is done, failed or leased by
+            another worker.
+        """
+        self._expire_leases()
+        now = time.time()
+        rows = self._execute(
+            """
+            UPDATE jobs SET status = ?, attempts = attempts + 1, lease_expires_at = ?, updated_at = ?
+            WHERE repo = ? AND pr_number = ?
+                AND (status = ? OR (status = ? AND lease_expires_at < ?))
+            RETURNING pr_number
+            """,
+            (
+                JobStatus.running.value,
+                now + self.lease_seconds,
+                self._now(),
+                repo,
+                pr_number,
+                JobStatus.pending.value,
+                JobStatus.running.value,
+                now,
+            ),
+        )
+        return len(rows) > 0
+
+    def renew(self, repo: str, pr_number: int) -> None:
+        """Extend the lease of a running job."""
+        self._execute(
+            "UPDATE jobs SET lease_expires_at = ? WHERE repo = ? AND pr_number = ? AND status = ?",
+            (
+                time.time() + self.lease_seconds,
+                repo,
+                pr_number,
+                JobStatus.running.value,
+            ),
+        )
+
+    @contextlib.asynccontextmanager
+    async def keep_leased(self, repo: str, pr_number: int) -> AsyncIterator[None]:
+        """
+        Renew the lease of a claimed job every third of `lease_seconds` while the block
+        runs, so a summary that takes longer than the lease is not reclaimed and run
+        again by another worker. A killed process stops renewing, and its job is
+        reclaimed once the lease expires.
+        """
+
+        async def renew() -> None:
+            while True:
+                await asyncio.sleep(self.lease_seconds / 3)
+                await asyncio.to_thread(self.renew, repo, pr_number)
+
+        renewal = asyncio.create_task(renew())
+        try:
+            yield
+        finally:
+            renewal.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await renewal
+
+    def complete(self, repo: str, pr_number: int) -> None:
+        self._execute(
+            """
+            UPDATE jobs SET status = ?, error = NULL, stale = 0, lease_expires_at = NULL,
+                updated_at = ?
+            WHERE repo = ? AND pr_number = ?
+            """,
+            (JobStatus.done.value, self._now(), repo, pr_number),
+        )
+
+    def fail(self, repo: str, pr_number: int, error: str) -> None:
+        self._set_status(repo, pr_number, JobStatus.failed, error)
+
+    def release(self, repo: str, pr_number: int) -> None:
+        """Give a running job back to `pending` without counting the attempt."""
+        self._execute(
+            """
+            UPDATE jobs SET status = ?, attempts = MAX(attempts - 1, 0),
+                lease_expires_at = NULL, updated_at = ?
+            WHERE repo = ? AND pr_number = ? AND status = ?
+            """,
+            (JobStatus.pending.value, self._now(), repo, pr_number, JobStatus.running.value),
+        )
+
+    def _set_status(
+        self, repo: str, pr_number: int, status: JobStatus, error: str | None = None
+    ) -> None:
+        self._execute(
+            """
+            UPDATE jobs SET status = ?, error = ?, lease_expires_at = NULL, updated_at = ?
+            WHERE repo = ? AND pr_number = ?
+            """,
+            (status.value, error, self._now(), repo, pr_number),
+        )
+
+    def retry_failed(
+        self, repo: str | None = None, pr_numbers: list[int] | None = None
+    ) -> int:
+        """
+        Move failed jobs back to `pending` with a fresh attempt count.
+
+        Args:
+            repo (str | None): Only retry the jobs of this repository.
+            pr_numbers (list[int] | None): Only retry the jobs of these pull requests.
+
+        Returns:
+            int: The number of jobs moved back to pending.
+        """
+        sql = "UPDATE jobs SET status = ?, error = NULL, attempts = 0, updated_at = ? WHERE status = ?"
+        params: list = [JobStatus.pending.value, self._now(), JobStatus.failed.value]
+        if repo is not None:
+            sql += " AND repo = ?"
+            params.append(repo)
+        if pr_numbers is not None:
+            sql += f" AND pr_number IN ({', '.join('?' * len(pr_numbers))})"
+            params.extend(pr_numbers)
+        return len(self._execute(sql + " RETURNING pr_number", tuple(params)))
+
+    def status(self, repo: str, pr_number: int) -> JobStatus | None:
+        rows = self._execute(
+            "SELECT status FROM jobs WHERE repo = ? AND pr_number = ?",
+            (repo, pr_number),
+        )
+        return JobStatus(rows[0][0]) if rows else None
+
+    def is_stale(self, repo: str, pr_number: int) -> bool:
+        """Whether the job was requeued, so its stored summary predates the PR's last
+        changes and must be refreshed."""
+        rows = self._execute(
+            "SELECT stale FROM jobs WHERE repo = ? AND pr_number = ?",
+            (repo, pr_number),
+        )
+        return bool(rows and rows[0][0])
+
+    def jobs(self, status: JobStatus | None = None) -> list[dict]:
+        """List the jobs, optionally filtered by status."""
+        sql = "SELECT repo, pr_number, status, attempts, error, updated_at FROM jobs"
+        params: tuple = ()
+        if status is not None:
+            sql += " WHERE status = ?"
+            params = (status.value,)
+        columns = ["repo", "pr_number", "status", "attempts", "error", "updated_at"]
+        return [dict(zip(columns, row)) for row in self._execute(sql, params)]
+
+    def counts(self) -> dict[JobStatus, int]:
+        rows = self._execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")
+        return {JobStatus(status): count for status, count in rows}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
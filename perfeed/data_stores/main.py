@@ -1,22 +1,26 @@
 import asyncio
 from perfeed.data_stores import FeatherStorage, SQLStorage
-from perfeed.tools.pr_summarizer import PRSummarizer
-from perfeed.git_providers.github import GithubProvider
-from perfeed.llms.ollama_client import OllamaClient
+from perfeed.resources import Resources
 
 
 # todo: once Henry's local test pipeline is merged, this will be moved
 
-if __name__ == "__main__":
-    summarizer = PRSummarizer(GithubProvider("Perfeed"), llm=OllamaClient("llama3.2"))
-    pr_summary, metadata = asyncio.run(summarizer.run("perfeed", 5))
+async def main() -> None:
+    async with Resources() as resources:
+        summarizer = resources.summarizer("Perfeed", provider="ollama", model="llama3.2")
+        pr_summary, metadata = await summarizer.run("perfeed", 5)
+
+        # test feather
+        fs = FeatherStorage(data_type="pr_summary", overwrite=True, append=False)
+        fs.save(data=pr_summary, metadata=metadata)
+        print(fs.load())
 
-    # test feather
-    fs = FeatherStorage(data_type="pr_summary", overwrite=True, append=False)
-    fs.save(data=pr_summary, metadata=metadata)
-    print(fs.load())
+        # test sql
+        ss = SQLStorage(data_type="pr_summary", overwrite=True, append=False)
+        ss.save(data=pr_summary, metadata=metadata)
+        print(ss.load())
+        await ss.aclose()
 
-    # test sql
-    ss = SQLStorage(data_type="pr_summary", overwrite=True, append=False)
-    ss.save(data=pr_summary, metadata=metadata)
-    print(ss.load())
+
+if __name__ == "__main__":
+    asyncio.run(main())
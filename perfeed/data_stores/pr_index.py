@@ -0,0 +1,182 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+from perfeed.config_loader import settings
+
+
+def utc_timestamp(value: str | datetime) -> str:
+    """
+    Normalize a GitHub timestamp or a timezone-aware datetime to UTC, e.g.
+    '2024-10-21T02:00:00Z', so that timestamps compare as strings.
+    """
+    if isinstance(value, str):
+        if value.endswith("Z"):
+            return value
+        value = datetime.fromisoformat(value)
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class PRIndex:
+    """
+    A local index of the pull request headers of repositories, backed by SQLite.
+
+    Each repository keeps its PRs (number, author, state, created_at, updated_at,
+    merged_at) and a watermark, the `updated_at` of the most recently updated PR when it
+    was last synced. A sync lists the PRs by `updated` in descending order and stops
+    at the watermark, so it only fetches the PRs changed since, and searches are
+    answered from the index.
+
+    The rows are keyed by the API host as well, so the same owner and repository on
+    github.com and on a GitHub Enterprise server do not share headers or watermarks.
+    """
+
+    def __init__(self, path: str | None = None, gh_host: str | None = None):
+        """
+        Args:
+            path (str | None): The SQLite file. Defaults to
+                '../_data/pr_index/pr_index.sqlite'.
+            gh_host (str | None): The API URL of the indexed repositories. Defaults to
+                `settings.config.github_api_url`.
+        """
+        self.path = path or os.path.join("../_data/pr_index", "pr_index.sqlite")
+        self.gh_host = gh_host or settings.config.github_api_url
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(prs)")]
+        if columns and "gh_host" not in columns:
+            # an index from before the host was keyed; it is a cache, so resync it
+            self._conn.execute("DROP TABLE prs")
+            self._conn.execute("DROP TABLE IF EXISTS syncs")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS prs (
+                gh_host TEXT NOT NULL,
+                owner TEXT NOT NULL,
+                repo TEXT NOT NULL,
+                number INTEGER NOT NULL,
+                author TEXT NOT NULL,
+                state TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                merged_at TEXT,
+                PRIMARY KEY (gh_host, owner, repo, number)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS prs_created_at"
+            " ON prs (gh_host, owner, repo, created_at)"
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS syncs (
+                gh_host TEXT NOT NULL,
+                owner TEXT NOT NULL,
+                repo TEXT NOT NULL,
+                watermark TEXT,
+                synced_at REAL NOT NULL,
+                PRIMARY KEY (gh_host, owner, repo)
+            )
+            """
+        )
+
+    def sync_state(self, owner: str, repo: str) -> tuple[str | None, float | None]:
+        """The watermark of a repository and when it was last synced, as a Unix time,
+        or `(None, None)` if it was never synced."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT watermark, synced_at FROM syncs"
+                " WHERE gh_host = ? AND owner = ? AND repo = ?",
+                (self.gh_host, owner, repo),
+            ).fetchone()
+        return (row[0], row[1]) if row else (None, None)
+
+    def update(self, owner: str, repo: str, prs: list[dict]) -> None:
+        """Insert or replace the headers of PRs, given as GitHub `pulls.list` items."""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO prs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        self.gh_host,
+                        owner,
+                        repo,
+                        pr["number"],
+                        pr["user"]["login"],
+                        pr["state"],
+                        utc_timestamp(pr["created_at"]),
+                        utc_timestamp(pr["updated_at"]),
+                        pr.get("merged_at") and utc_timestamp(pr["merged_at"]),
+                    )
+                    for pr in prs
+                ],
+            )
+
+    def set_watermark(self, owner: str, repo: str, watermark: str | None) -> None:
+        """Record a completed sync of a repository up to `watermark`."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO syncs VALUES (?, ?, ?, ?, ?)",
+                (
+                    self.gh_host,
+                    owner,
+                    repo,
+                    watermark and utc_timestamp(watermark),
+                    time.time(),
+                ),
+            )
+
+    def search(
+        self,
+        owner: str,
+        repo: str,
+        start_date: datetime,
+        end_date: datetime,
+        authors: set[str] | None,
+        closed_only: bool = True,
+    ) -> list[int]:
+        """
+        Find the PRs of a repository created within a date range.
+
+        Args:
+            owner (str): The owner of the repository.
+            repo (str): The name of the repository.
+            start_date (datetime): The start of the range, inclusive.
+            end_date (datetime): The end of the range, inclusive.
+            authors (set[str] | None): A set of author names to filter by, or None for
+                all authors.
+            closed_only (bool): Only includes the closed PRs if True.
+
+        Returns:
+            list[int]: The PR numbers, sorted by creation time in descending order.
+        """
+        sql = """
+            SELECT number FROM prs
+            WHERE gh_host = ? AND owner = ? AND repo = ? AND created_at BETWEEN ? AND ?
+        """
+        params: list = [
+            self.gh_host,
+            owner,
+            repo,
+            utc_timestamp(start_date),
+            utc_timestamp(end_date),
+        ]
+        if closed_only:
+            sql += " AND state = 'closed'"
+        if authors is not None:
+            sql += f" AND author IN ({', '.join('?' * len(authors))})"
+            params.extend(authors)
+        sql += " ORDER BY created_at DESC, number DESC"
+        with self._lock:
+            return [row[0] for row in self._conn.execute(sql, params).fetchall()]
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,248 @@
+import os
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+from pydantic import BaseModel, ValidationError
+
+from perfeed.data_stores.arrow import Filters, to_table
+from perfeed.data_stores.base import BaseStorage
+from perfeed.models.pr_summary import PRSummary, PRSummaryMetadata
+from perfeed.telemetry import get_tracer
+
+_OPS = {"==": "=", "=": "=", "!=": "!=", "<": "<", "<=": "<=", ">": ">", ">=": ">="}
+
+# aggregates of the latest summary of each PR, by name
+METRICS = {
+    "prs": "count(*)",
+    "merged_prs": "count(merged)",
+    "turnaround_hours": "median(date_diff('minute', created, merged)) / 60",
+    "comment_threads": "sum(len(comments))",
+    "files": "sum(len(pr_files))",
+    "tokens": "sum(prompt_tokens + completion_tokens)",
+    "cost_usd": "sum(cost_usd)",
+}
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+class DuckDBStorage(BaseStorage):
+    """
+    An analytical store on an embedded DuckDB database.
+
+    Rows keep the nested fields of a `PRSummary` as typed list and struct columns, so
+    `trend` and `comment_actions` aggregate over PRs and unnested comment threads in
+    DuckDB's vectorized engine, without loading the summaries into pandas.
+    """
+
+    table = "summaries"
+
+    def __init__(
+        self,
+        data_type: str,
+        append: bool = True,
+        overwrite: bool = False,
+        root: str = "../_data",
+    ):
+        super().__init__(data_type, append, overwrite)
+        self.store_dict = os.path.join(root, data_type)
+        os.makedirs(self.store_dict, exist_ok=True)
+        self.db_path = os.path.join(self.store_dict, "duckdb_store.duckdb")
+        self.connection = duckdb.connect(self.db_path)
+
+    async def aclose(self) -> None:
+        await super().aclose()
+        self.connection.close()
+
+    def _has_table(self) -> bool:
+        return bool(
+            self.connection.execute(
+                "SELECT count(*) FROM information_schema.tables WHERE table_name = ?",
+                [self.table],
+            ).fetchone()[0]
+        )
+
+    def save(self, data: BaseModel, metadata: BaseModel) -> None:
+        """Validate, convert, and insert the data along with metadata"""
+        row = self.validate_and_convert_arrow(data, metadata)
+        with get_tracer().span("storage.save", backend="duckdb", rows=row.num_rows):
+            self.connection.register("_row", row)
+            try:
+                if self.overwrite or not self._has_table():
+                    self.connection.execute(
+                        f"CREATE OR REPLACE TABLE {self.table} AS SELECT * FROM _row"
+                    )
+                elif self.append:
+                    self._add_missing_columns(row.schema)
+                    self.connection.execute(
+                        f"INSERT INTO {self.table} BY NAME SELECT * FROM _row"
+                    )
+                else:
+                    raise FileExistsError(
+                        f"{self.db_path} already exists. Set overwrite=True to overwrite."
+                    )
+            finally:
+                self.connection.unregister("_row")
+
+    def _add_missing_columns(self, schema: pa.Schema) -> None:
+        """Add the columns of newer metadata fields to a table created before them."""
+        existing = {
+            name
+            for (name,) in self.connection.execute(
+                "SELECT column_name FROM information_schema.columns WHERE table_name = ?",
+                [self.table],
+            ).fetchall()
+        }
+        for field in schema:
+            if field.name not in existing:
+                column_type = self.connection.from_arrow(
+                    pa.table({field.name: pa.nulls(0, field.type)})
+                ).types[0]
+                self.connection.execute(
+                    f"ALTER TABLE {self.table} ADD COLUMN {_quote(field.name)} {column_type}"
+                )
+
+    def load(self) -> pd.DataFrame:
+        """Load data from the DuckDB table"""
+        return self.load_arrow().to_pandas()
+
+    def load_arrow(
+        self, columns: list[str] | None = None, filters: Filters | None = None
+    ) -> pa.Table:
+        """Project and filter in DuckDB and return the result as Arrow."""
+        if not self._has_table():
+            raise FileNotFoundError(
+                f"Table '{self.table}' does not exist in {self.db_path}."
+            )
+        select = "*" if columns is None else ", ".join(map(_quote, columns))
+        where, params = self._where(filters)
+        with get_tracer().span("storage.load_arrow", backend="duckdb") as span:
+            table = pa.table(
+                self.connection.execute(
+                    f"SELECT {select} FROM {self.table} {where}", params
+                ).arrow()
+            )
+            span.set(rows=table.num_rows)
+            return table
+
+    @staticmethod
+    def _where(filters: Filters | None) -> tuple[str, list]:
+        clauses, params = [], []
+        for column, op, value in filters or []:
+            if op in ("in", "not in"):
+                value = list(value)
+                placeholders = ", ".join("?" * len(value))
+                clauses.append(f"{_quote(column)} {op.upper()} ({placeholders})")
+                params.extend(value)
+            elif op in _OPS:
+                clauses.append(f"{_quote(column)} {_OPS[op]} ?")
+                params.append(value)
+            else:
+                raise ValueError(f"Unsupported filter operator {op!r}")
+        return ("WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def _latest(self, filters: Filters | None) -> tuple[str, list]:
+        """A query of the latest summary of each PR, with its timestamps parsed."""
+        where, params = self._where(filters)
+        return (
+            f"""
+            SELECT *,
+                CAST(pr_created_at AS TIMESTAMPTZ) AS created,
+                TRY_CAST(pr_merged_at AS TIMESTAMPTZ) AS merged
+            FROM {self.table} {where}
+            QUALIFY row_number() OVER (
+                PARTITION BY repo, pr_number ORDER BY created_at DESC
+            ) = 1
+            """,
+            params,
+        )
+
+    def query(self, sql: str, params: list | None = None) -> pa.Table:
+        """Run a SQL query against the store, whose table is `summaries`."""
+        with get_tracer().span("storage.query", backend="duckdb") as span:
+            table = pa.table(self.connection.execute(sql, params or []).arrow())
+            span.set(rows=table.num_rows)
+            return table
+
+    def trend(
+        self,
+        metrics: tuple[str, ...] = ("prs", "turnaround_hours"),
+        by: tuple[str, ...] = ("author",),
+        period: str = "week",
+        filters: Filters | None = None,
+    ) -> pd.DataFrame:
+        """
+        Aggregate the latest summary of each PR per period, e.g. the review turnaround
+        of each author per quarter.
+
+        Args:
+            metrics (tuple[str, ...]): Names of `METRICS` to compute.
+            by (tuple[str, ...]): The columns to group by besides the period.
+            period (str): The `date_trunc` part the PR creation dates are grouped by,
+                e.g. 'week', 'month' or 'quarter'.
+            filters (Filters | None): Predicates on the stored columns.
+
+        Returns:
+            pd.DataFrame: One row per period and group, ordered by both.
+        """
+        unknown = set(metrics) - METRICS.keys()
+        if unknown:
+            raise ValueError(f"Unknown metrics: {sorted(unknown)}")
+        latest, params = self._latest(filters)
+        groups = "".join(f"{_quote(column)}, " for column in by)
+        aggregates = ", ".join(f"{METRICS[name]} AS {name}" for name in metrics)
+        return self.query(
+            f"""
+            SELECT date_trunc(?, created) AS period, {groups}{aggregates}
+            FROM ({latest})
+            GROUP BY ALL
+            ORDER BY ALL
+            """,
+            [period, *params],
+        ).to_pandas()
+
+    def comment_actions(
+        self, by: tuple[str, ...] = ("author",), filters: Filters | None = None
+    ) -> pd.DataFrame:
+        """
+        Count the comment threads of the latest summaries by what they led to, e.g. a
+        code change or a clarification, unnesting the threads in DuckDB.
+
+        Args:
+            by (tuple[str, ...]): The columns to group by besides `lead_to_action`.
+            filters (Filters | None): Predicates on the stored columns.
+
+        Returns:
+            pd.DataFrame: The number of threads and participants per group and action.
+        """
+        latest, params = self._latest(filters)
+        groups = "".join(f"{_quote(column)}, " for column in by)
+        return self.query(
+            f"""
+            SELECT {groups}thread.lead_to_action AS lead_to_action,
+                count(*) AS threads,
+                avg(len(thread.users)) AS users_per_thread
+            FROM (SELECT *, unnest(comments) AS thread FROM ({latest}))
+            GROUP BY ALL
+            ORDER BY ALL
+            """,
+            params,
+        ).to_pandas()
+
+    def validate_and_convert(
+        self, data: BaseModel, metadata: BaseModel
+    ) -> pd.DataFrame:
+        return self.validate_and_convert_arrow(data, metadata).to_pandas()
+
+    def validate_and_convert_arrow(
+        self, data: BaseModel, metadata: BaseModel
+    ) -> pa.Table:
+        try:
+            PRSummary.model_validate(data)
+            PRSummaryMetadata.model_validate(metadata)
+        except ValidationError as e:
+            raise RuntimeError(e)
+
+        return to_table([{**data.model_dump(), **metadata.model_dump()}])
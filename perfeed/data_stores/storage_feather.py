@@ -1,46 +1,134 @@
 import pandas as pd
 import os
+import zlib
+import pyarrow as pa
+from contextlib import contextmanager
+from pyarrow import feather
 from pydantic import BaseModel, ValidationError
+from perfeed.config_loader import settings
+from perfeed.data_stores.arrow import Filters, project, to_pandas, to_table
 from perfeed.data_stores.base import BaseStorage
+from perfeed.log import get_logger
 from perfeed.models.pr_summary import PRSummary, PRSummaryMetadata
-from typing import Dict
+from perfeed.telemetry import get_tracer
+from typing import Dict, Iterator
 import json
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# the generation of the last write-ahead log folded into the file, in its schema metadata
+_GENERATION = b"perfeed.wal_generation"
+
+
+def _generation(table: pa.Table) -> int:
+    return int((table.schema.metadata or {}).get(_GENERATION, 0))
+
+
+def _fsync(path: str) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
 
 class FeatherStorage(BaseStorage):
+    """
+    Stores rows in one uncompressed Feather file, `<store_dict>/feather_store`.
+
+    A save appends its row to a write-ahead log, `feather_store.wal`, and fsyncs it, so
+    saving is cheap and the row survives a crash of the process. Once the log reaches
+    `checkpoint_bytes` of `[feather_store]`, its rows are folded into a new file that
+    atomically replaces the old one, and a new log is started. Loads return the rows of
+    the file followed by the ones still in the log, and a log left behind by a crashed
+    process is folded in when the store is opened.
 
-    def __init__(self, data_type: str, append: bool = True, overwrite: bool = False):
+    Saves and checkpoints hold an exclusive `flock` on `feather_store.lock` and loads a
+    shared one, so processes sharing the directory do not lose each other's rows.
+    """
+
+    def __init__(
+        self,
+        data_type: str,
+        append: bool = True,
+        overwrite: bool = False,
+        root: str = "../_data",
+    ):
         super().__init__(data_type, append, overwrite)
 
         # initialize the storage path
-        self.store_dict = f"../_data/{data_type}"
+        self.store_dict = os.path.join(root, data_type)
         os.makedirs(self.store_dict, exist_ok=True)
         self.path = os.path.join(self.store_dict, f"feather_store")
-        if not os.path.exists(self.path):
-            pd.DataFrame().to_feather(self.path)
+        self.wal_path = f"{self.path}.wal"
+        self.lock_path = f"{self.path}.lock"
+        with self._lock():
+            if not os.path.exists(self.path):
+                self._write(pa.table({}), generation=0)
+            # replay the rows a crashed process left in the log
+            self._checkpoint()
 
     def save(self, data: BaseModel, metadata: BaseModel) -> None:
         """validate, convert, and save the data"""
 
-        data_df = self.validate_and_convert(data, metadata)
-        if os.path.exists(self.path):
-            if self.append:
-                existing_data_df = pd.read_feather(self.path)
-                data_df = pd.concat([existing_data_df, data_df], ignore_index=True)
-            elif not self.overwrite:
-                raise FileExistsError(
-                    f"{self.path} already exists. Set overwrite=True to overwrite."
-                )
-        data_df.to_feather(self.path)
+        with get_tracer().span("storage.save", backend="feather") as span:
+            table = self.validate_and_convert_arrow(data, metadata)
+            with self._lock():
+                if self.append:
+                    wal_bytes = self._append_wal(table)
+                    if wal_bytes >= settings.feather_store.checkpoint_bytes:
+                        self._checkpoint()
+                elif not self.overwrite:
+                    raise FileExistsError(
+                        f"{self.path} already exists. Set overwrite=True to overwrite."
+                    )
+                else:
+                    # the file's generation marks the rows of the current log as folded
+                    generation, _ = self._read_wal()
+                    self._write(table, generation)
+                    self._new_wal(generation + 1)
+            span.set(rows=table.num_rows, bytes=os.path.getsize(self.wal_path))
 
     def load(self) -> pd.DataFrame:
         if not os.path.exists(self.path):
             raise FileNotFoundError(f"{self.path} does not exist.")
-        return pd.read_feather(self.path)
+        with get_tracer().span("storage.load", backend="feather") as span:
+            with self._lock(exclusive=False):
+                df = to_pandas(self._with_pending(feather.read_table(self.path)))
+            span.set(rows=len(df), bytes=os.path.getsize(self.path))
+            return df
+
+    def load_arrow(
+        self, columns: list[str] | None = None, filters: Filters | None = None
+    ) -> pa.Table:
+        """Memory-map the store and return the matching rows. Without filters, the
+        selected columns are views of the file, so unused nested columns such as
+        `comments` are never read. Rows still in the write-ahead log are appended as
+        in-memory chunks."""
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"{self.path} does not exist.")
+        with get_tracer().span("storage.load_arrow", backend="feather") as span:
+            with self._lock(exclusive=False):
+                table = self._with_pending(
+                    feather.read_table(self.path, memory_map=True)
+                )
+            table = project(table, columns, filters)
+            span.set(rows=table.num_rows, bytes=table.nbytes)
+            return table
 
     def validate_and_convert(
         self, data: BaseModel, metadata: BaseModel
     ) -> pd.DataFrame:
+        return self.validate_and_convert_arrow(data, metadata).to_pandas()
+
+    def validate_and_convert_arrow(
+        self, data: BaseModel, metadata: BaseModel
+    ) -> pa.Table:
+        """Validate the models and convert them to a row with nested fields as Arrow
+        list and struct columns."""
 
         data_model = PRSummary
         metadat_model = PRSummaryMetadata
@@ -51,10 +139,110 @@ class FeatherStorage(BaseStorage):
         except ValidationError as e:
             raise RuntimeError(e)
 
-        # pydantic object to dictionary
-        data_dict = data.model_dump()
-        metadata_dict = metadata.model_dump()
+        return to_table([{**data.model_dump(), **metadata.model_dump()}])
+
+    @contextmanager
+    def _lock(self, exclusive: bool = True) -> Iterator[None]:
+        """Hold the store's `flock`, shared by readers. Platforms without `fcntl` do not
+        lock."""
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _read_wal(self) -> tuple[int, list[dict]]:
+        """
+        Read the write-ahead log.
+
+        Returns:
+            tuple[int, list[dict]]: The generation of the log, 0 if there is none, and
+                its rows. A row torn by a crash during its save, which never returned, is
+                left out, as is any row whose checksum does not match.
+        """
+        try:
+            with open(self.wal_path, "rb") as f:
+                header = f.readline()
+                lines = f.read().split(b"\n")
+        except FileNotFoundError:
+            return 0, []
+        rows = []
+        # the last element is empty, or the torn row of a crashed save
+        for line in lines[:-1]:
+            checksum, _, record = line.partition(b" ")
+            if checksum != b"%08x" % zlib.crc32(record):
+                get_logger().warning(f"Skipping a corrupt row of {self.wal_path}")
+                continue
+            rows.append(json.loads(record))
+        return int(header.split()[1]), rows
+
+    def _append_wal(self, table: pa.Table) -> int:
+        """Append the rows to the write-ahead log and fsync it. Returns the size of the
+        log."""
+        with open(self.wal_path, "r+b") as f:
+            end = f.seek(0, os.SEEK_END)
+            f.seek(end - 1)
+            if f.read(1) != b"\n":
+                # drop the torn row of a crashed save, so the new row starts on its own line
+                f.seek(0)
+                f.truncate(f.read().rfind(b"\n") + 1)
+                f.seek(0, os.SEEK_END)
+            for row in table.to_pylist():
+                record = json.dumps(row).encode()
+                f.write(b"%08x %s\n" % (zlib.crc32(record), record))
+            f.flush()
+            if settings.feather_store.fsync:
+                os.fsync(f.fileno())
+            return f.tell()
 
-        return pd.concat(
-            [pd.DataFrame([data_dict]), pd.DataFrame([metadata_dict])], axis=1
+    def _with_pending(self, table: pa.Table) -> pa.Table:
+        """The rows of the file followed by the rows of the log not yet folded into it."""
+        generation, rows = self._read_wal()
+        if not rows or generation <= _generation(table):
+            return table
+        # stores written before a metadata field was added lack its column,
+        # and the pandas metadata of stores written by pandas is dropped
+        return pa.concat_tables(
+            [table.replace_schema_metadata(None), to_table(rows)],
+            promote_options="permissive",
         )
+
+    def _checkpoint(self) -> None:
+        """Fold the rows of the write-ahead log into the file and start a new log. Called
+        with the lock held."""
+        table = feather.read_table(self.path)
+        folded = _generation(table)
+        generation, rows = self._read_wal()
+        if rows and generation > folded:
+            # a crash between writing the file and starting the new log leaves rows the
+            # file already has; its generation tells them apart
+            self._write(self._with_pending(table), generation)
+            folded = generation
+        if rows or generation <= folded:
+            self._new_wal(folded + 1)
+
+    def _write(self, table: pa.Table, generation: int) -> None:
+        """Atomically replace the file by `table`, which has folded the log `generation`."""
+        table = table.replace_schema_metadata({_GENERATION: str(generation)})
+        # uncompressed, so load_arrow can memory-map the columns without copying.
+        # The file is replaced rather than rewritten, so tables mapped by earlier
+        # loads keep reading the previous file
+        feather.write_feather(table, f"{self.path}.tmp", compression="uncompressed")
+        self._replace(f"{self.path}.tmp", self.path)
+
+    def _new_wal(self, generation: int) -> None:
+        with open(f"{self.wal_path}.tmp", "wb") as f:
+            f.write(b"perfeed-wal %d\n" % generation)
+        self._replace(f"{self.wal_path}.tmp", self.wal_path)
+
+    def _replace(self, tmp: str, path: str) -> None:
+        """Rename `tmp` over `path`, durably if `fsync` of `[feather_store]` is set."""
+        if settings.feather_store.fsync:
+            _fsync(tmp)
+        os.replace(tmp, path)
+        if settings.feather_store.fsync and os.name == "posix":
+            _fsync(self.store_dict)
@@ -1,26 +1,59 @@
+import operator
 import pandas as pd
+import pyarrow as pa
 import sqlalchemy as sa
 from sqlalchemy import inspect
 from pydantic import BaseModel, ValidationError
 from perfeed.models.pr_summary import PRSummary, PRSummaryMetadata
+from perfeed.data_stores.arrow import PR_SUMMARY_SCHEMA, Filters
 from perfeed.data_stores.base import BaseStorage
+from perfeed.telemetry import get_tracer
 from typing import Dict
 import os
 import json
 
+_OPS = {
+    "==": operator.eq,
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
 
 class SQLStorage(BaseStorage):
 
-    def __init__(self, data_type: str, append: bool = True, overwrite: bool = False):
+    def __init__(
+        self,
+        data_type: str,
+        append: bool = True,
+        overwrite: bool = False,
+        engine: sa.Engine | None = None,
+        root: str = "../_data",
+    ):
         super().__init__(data_type, append, overwrite)
-        self.store_dict = f"../_data/{data_type}"
+        self.store_dict = os.path.join(root, data_type)
         self.db_path = os.path.join(self.store_dict, "sqldb_store.sqlite")
         self.data_type = data_type
-        # Create a SQLAlchemy engine with the local SQLite database
-        self.engine = sa.create_engine(f"sqlite:///{self.db_path}")
+        # Create a SQLAlchemy engine with the local SQLite database, unless a shared
+        # engine is given, which is then not disposed by aclose
+        self._owns_engine = engine is None
+        self.engine = engine or self.create_engine(data_type, root)
         # Ensure the directory for the database file exists
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
 
+    @staticmethod
+    def create_engine(data_type: str, root: str = "../_data") -> sa.Engine:
+        db_path = os.path.join(root, data_type, "sqldb_store.sqlite")
+        return sa.create_engine(f"sqlite:///{db_path}")
+
+    async def aclose(self) -> None:
+        await super().aclose()
+        if self._owns_engine:
+            self.engine.dispose()
+
     def save(self, data: BaseModel, metadata: BaseModel) -> None:
         """Validate, convert, and save the data along with metadata"""
         data_df = self.validate_and_convert(data, metadata)
@@ -31,9 +64,25 @@ class SQLStorage(BaseStorage):
         )
 
         # Save to SQL table
-        data_df.to_sql(
-            self.db_path, self.engine, if_exists=if_exists_option, index=False
-        )
+        with get_tracer().span("storage.save", backend="sql", rows=len(data_df)):
+            if if_exists_option == "append":
+                self._add_missing_columns(data_df)
+            data_df.to_sql(
+                self.db_path, self.engine, if_exists=if_exists_option, index=False
+            )
+
+    def _add_missing_columns(self, data_df: pd.DataFrame) -> None:
+        """Add the columns of newer metadata fields to a table created before them."""
+        inspector = inspect(self.engine)
+        if not inspector.has_table(self.db_path):
+            return
+        existing = {column["name"] for column in inspector.get_columns(self.db_path)}
+        with self.engine.begin() as connection:
+            for column in data_df.columns:
+                if column not in existing:
+                    connection.execute(
+                        sa.text(f'ALTER TABLE "{self.db_path}" ADD COLUMN "{column}" TEXT')
+                    )
 
     def load(self) -> pd.DataFrame:
         """Load data from SQL table"""
@@ -42,7 +91,55 @@ class SQLStorage(BaseStorage):
             raise FileNotFoundError(
                 f"Table '{self.db_path}' does not exist in the database."
             )
-        return pd.read_sql_table(self.db_path, self.engine)
+        with get_tracer().span("storage.load", backend="sql") as span:
+            df = pd.read_sql_table(self.db_path, self.engine)
+            span.set(rows=len(df))
+            return df
+
+    def load_arrow(
+        self, columns: list[str] | None = None, filters: Filters | None = None
+    ) -> pa.Table:
+        """Select only the requested columns and matching rows in SQL, and decode the
+        JSON cells of those into typed Arrow columns."""
+        inspector = inspect(self.engine)
+        if not inspector.has_table(self.db_path):
+            raise FileNotFoundError(
+                f"Table '{self.db_path}' does not exist in the database."
+            )
+        with get_tracer().span("storage.load_arrow", backend="sql") as span:
+            names = [column["name"] for column in inspector.get_columns(self.db_path)]
+            table = sa.table(self.db_path, *(sa.column(name) for name in names))
+            columns = names if columns is None else columns
+            query = sa.select(*(table.c[name] for name in columns))
+            for column, op, value in filters or []:
+                query = query.where(self._predicate(table.c[column], op, value))
+            with self.engine.connect() as connection:
+                rows = connection.execute(query).all()
+
+            arrays = {}
+            for i, name in enumerate(columns):
+                values = [None if row[i] is None else json.loads(row[i]) for row in rows]
+                field_type = (
+                    PR_SUMMARY_SCHEMA.field(name).type
+                    if name in PR_SUMMARY_SCHEMA.names
+                    else None
+                )
+                arrays[name] = pa.array(values, type=field_type)
+            span.set(rows=len(rows))
+            return pa.table(arrays)
+
+    @staticmethod
+    def _predicate(column: sa.ColumnClause, op: str, value):
+        """A filter on a column of JSON-encoded cells."""
+        if op in ("in", "not in"):
+            predicate = column.in_([json.dumps(v) for v in value])
+            return predicate if op == "in" else ~predicate
+        if op not in _OPS:
+            raise ValueError(f"Unsupported filter operator {op!r}")
+        if op in ("==", "=", "!=") or not isinstance(value, (int, float)):
+            # JSON strings keep their order, e.g. of ISO timestamps, inside the quotes
+            return _OPS[op](column, json.dumps(value))
+        return _OPS[op](sa.cast(column, sa.Float), value)
 
     def validate_and_convert(
         self, data: BaseModel, metadata: BaseModel
@@ -0,0 +1,99 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Iterable
+
+
+def unit_key(content: str) -> str:
+    """The content hash that identifies a summarized unit, e.g. a file's diff."""
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+class SummaryUnitCache:
+    """
+    Memoizes the summaries of the parts of a PR, backed by SQLite.
+
+    Units are file descriptions keyed by the hash of the file's diff, and comment thread
+    summaries keyed by the hash of the thread. A PR that gains a commit or a review reply
+    only needs the changed units summarized again. Entries are kept per LLM provider and
+    model, so lookups can be restricted to the models in use.
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path = path or os.path.join("../_data/pr_summary", "summary_units.sqlite")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS units (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                llm_provider TEXT NOT NULL,
+                model TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                PRIMARY KEY (kind, key, llm_provider, model)
+            )
+            """
+        )
+
+    def get_many(
+        self,
+        kind: str,
+        keys: Iterable[str],
+        candidates: list[tuple[str, str]] | None = None,
+    ) -> dict[str, str]:
+        """
+        Look up units by key.
+
+        Args:
+            kind (str): The kind of unit, e.g. 'file' or 'thread'.
+            keys (Iterable[str]): The keys to look up.
+            candidates (list[tuple[str, str]] | None): If set, only units summarized by
+                one of these (LLM provider, model) pairs are returned.
+
+        Returns:
+            dict[str, str]: The most recent JSON value of each key found.
+        """
+        keys = list(keys)
+        if not keys:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT key, llm_provider, model, value FROM units
+                WHERE kind = ? AND key IN ({", ".join("?" * len(keys))})
+                ORDER BY created_at, rowid
+                """,
+                (kind, *keys),
+            ).fetchall()
+        allowed = None if candidates is None else set(candidates)
+        return {
+            key: value
+            for key, provider, model, value in rows
+            if allowed is None or (provider, model) in allowed
+        }
+
+    def put_many(
+        self, kind: str, values: dict[str, str], llm_provider: str, model: str
+    ) -> None:
+        """Save the JSON values of units by key."""
+        now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO units VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (kind, key, llm_provider, model, value, now)
+                    for key, value in values.items()
+                ],
+            )
+
+    def close(self) -> None:
+        self._conn.close()
@@ -1,15 +1,68 @@
+import asyncio
+import time
 from abc import ABC, abstractmethod
 from datetime import datetime
+from urllib.error import HTTPError
 
+import requests
+
+from perfeed.config_loader import settings
+from perfeed.log import get_logger
 from perfeed.models.git_provider import PRComment, PullRequest
+from perfeed.telemetry import get_tracer
+from perfeed.utils.cassette import Cassette, request_key
 
 
 class BaseGitProvider(ABC):
+    _session: requests.Session | None = None
+    # records the responses of the provider, or replays them instead of requesting them
+    cassette: Cassette | None = None
 
     @abstractmethod
     def __init__(self, owner: str, token: str | None = None):
         pass
 
+    async def __aenter__(self) -> "BaseGitProvider":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    @property
+    def session(self) -> requests.Session:
+        """A pooled HTTP session for downloads outside the API, e.g. diffs."""
+        if self._session is None:
+            self._session = requests.Session()
+        return self._session
+
+    async def _fetch(self, parts: tuple, fn, *args, **kwargs):
+        """
+        Run a blocking request in a thread. With a `cassette`, the response is recorded
+        under the key of `parts`, or replayed without running the request.
+        """
+        if self.cassette is None:
+            return await asyncio.to_thread(fn, *args, **kwargs)
+        key = request_key(*parts)
+        if self.cassette.replaying:
+            return await self.cassette.areplay("github", key)
+        now = time.perf_counter()
+        try:
+            result = await asyncio.to_thread(fn, *args, **kwargs)
+        except HTTPError as e:
+            self.cassette.record("github", key, None, time.perf_counter() - now, error=e)
+            raise
+        self.cassette.record("github", key, result, time.perf_counter() - now)
+        return result
+
+    def _download(self, url: str) -> str:
+        return self.session.get(url).text
+
+    async def aclose(self) -> None:
+        """Close the pooled connections of the provider."""
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
     @abstractmethod
     async def list_pr_comments(self, repo_name: str, pr_number: int) -> list[PRComment]:
         pass
@@ -24,7 +77,90 @@ class BaseGitProvider(ABC):
         repo_name: str,
         start_date: datetime,
         end_date: datetime,
-        authors: set[str],
+        authors: set[str] | None,
         closed_only: bool = True,
     ) -> list[int]:
         pass
+
+    @abstractmethod
+    async def list_repos(self) -> list[str]:
+        """The names of the owner's repositories."""
+        pass
+
+    async def search_org_prs(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        authors: set[str] | None,
+        closed_only: bool = True,
+        repos: list[str] | None = None,
+        max_concurrency: int | None = None,
+    ) -> list[tuple[str, int]]:
+        """
+        Search the pull requests of many repositories of the owner concurrently.
+
+        Repositories are searched with `search_prs`, up to `max_concurrency` at a time, so
+        a search takes about as long as the slowest repositories. A repository whose
+        search fails is skipped with a warning.
+
+        Args:
+            start_date (datetime): The start date for filtering PRs.
+            end_date (datetime): The end date for filtering PRs.
+            authors (set[str] | None): A set of author names to filter by, or None for all authors.
+            closed_only (bool): Only includes the closed PRs if True. Otherwise, all PRs are included.
+            repos (list[str] | None): The names of the repositories. Defaults to all the
+                repositories of the owner, from `list_repos`.
+            max_concurrency (int | None): The number of repositories searched at a time.
+                Defaults to `settings.org_search.max_concurrency`.
+
+        Returns:
+            list[tuple[str, int]]: The (repository, PR number) pairs, in the order of
+                `repos` and then of `search_prs`.
+        """
+        with get_tracer().span("git.search_org_prs") as span:
+            if repos is None:
+                repos = await self.list_repos()
+            limit = asyncio.Semaphore(
+                max_concurrency or settings.org_search.max_concurrency
+            )
+
+            async def search(repo: str) -> list[int]:
+                async with limit:
+                    return await self.search_prs(
+                        repo, start_date, end_date, authors, closed_only
+                    )
+
+            results = await asyncio.gather(
+                *(search(repo) for repo in repos), return_exceptions=True
+            )
+            prs = []
+            for repo, result in zip(repos, results):
+                if isinstance(result, BaseException):
+                    get_logger().warning(f"Skipping the PRs of {repo}: {result!r}")
+                    continue
+                prs.extend((repo, pr_number) for pr_number in result)
+            span.set(repos=len(repos), prs=len(prs))
+        return prs
+
+    async def get_pr_diff(self, repo_name: str, pr: PullRequest) -> str:
+        """
+        Fetch the unified diff of a pull request.
+
+        The default implementation downloads `pr.diff_url`. Providers with a cheaper
+        source for the diff, e.g. a local clone, should override it.
+
+        Args:
+            repo_name (str): The name of the repository.
+            pr (PullRequest): The pull request to fetch the diff for.
+
+        Returns:
+            str: The unified diff of the pull request.
+        """
+        with get_tracer().span(
+            "git.get_pr_diff", pr=f"{repo_name}#{pr.number}", source="diff_url"
+        ) as span:
+            diff = await self._fetch(
+                ("diff", repo_name, pr.number), self._download, pr.diff_url
+            )
+            span.set(bytes=len(diff))
+            return diff
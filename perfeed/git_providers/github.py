@@ -1,24 +1,121 @@
 import asyncio
+import sys
+import time
 from datetime import datetime
+from urllib.error import HTTPError
 
+from fastcore.xtras import dict2obj
 from ghapi.all import GhApi
 
 from perfeed.config_loader import settings
+from perfeed.data_stores.pr_index import PRIndex
 from perfeed.git_providers.base import BaseGitProvider
 from perfeed.models.git_provider import CommentType, PRComment, PullRequest
-from perfeed.models.git_provider import PRComment
+from perfeed.telemetry import get_tracer
+from perfeed.utils.cassette import Cassette
 from collections import defaultdict
 import json
 
 
+def parse_timestamp(value: str) -> datetime:
+    """
+    Parse a GitHub timestamp, e.g. '2024-10-21T10:00:00Z' or '2024-10-21T18:00:00+08:00'.
+
+    `datetime.fromisoformat` is several times faster than `strptime`. Python 3.10 only
+    accepts an explicit offset, so a trailing 'Z' is replaced.
+    """
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    return datetime.fromisoformat(value)
+
+
+def decode_comments(
+    payload: bytes | str | list[dict], comment_type: CommentType
+) -> list[PRComment]:
+    """
+    Decode the items of a GitHub comments endpoint into `PRComment`s.
+
+    Args:
+        payload (bytes | str | list[dict]): The raw JSON response body, which is parsed
+            into plain dicts, or the already parsed items.
+        comment_type (CommentType): The type of the comments.
+
+    Returns:
+        list[PRComment]: The comments, in the order of the payload. Logins and user types
+            are interned, so the comments of a user share the same strings.
+    """
+    items = json.loads(payload) if isinstance(payload, (bytes, str)) else payload
+    intern = sys.intern
+    comments = []
+    for item in items:
+        user = item["user"]
+        comments.append(
+            PRComment(
+                id=item["id"],
+                type=comment_type,
+                user=intern(user["login"]),
+                user_type=intern(user["type"]),
+                diff_hunk=item.get("diff_hunk"),
+                body=item.get("body"),
+                created_at=item["created_at"],
+                # position = None indicates the original index of the comment is no longer existed, suggesting a code change happened
+                code_change=not item.get("position"),
+                in_reply_to_id=item.get("in_reply_to_id"),
+                html_url=item["html_url"],
+            )
+        )
+    return comments
+
+
 class GithubProvider(BaseGitProvider):
-    def __init__(self, owner: str, token: str | None = None):
+    def __init__(
+        self,
+        owner: str,
+        token: str | None = None,
+        gh_host: str | None = None,
+        use_index: bool | None = None,
+        cassette: Cassette | None = None,
+    ):
+        """
+        Args:
+            owner (str): The owner of the repositories.
+            token (str | None): A personal access token. Defaults to
+                `settings.github.personal_access_token`.
+            gh_host (str | None): The API URL. Defaults to `settings.config.github_api_url`.
+            use_index (bool | None): Answer `search_prs` from a local `PRIndex` synced
+                incrementally, instead of listing the PRs from the newest backwards on
+                every search. Defaults to `settings.pr_index.enabled`, or False with a
+                cassette, since the requests of an index sync depend on what the index
+                already holds, and a replay must not write into it.
+            cassette (Cassette | None): Record the API responses and diffs into the
+                cassette, or replay them from it without requesting GitHub.
+        """
         self.owner = owner
+        self.gh_host = gh_host or settings.config.github_api_url
+        if use_index is None:
+            use_index = settings.pr_index.enabled and cassette is None
+        self.use_index = use_index
+        self._index: PRIndex | None = None
+        self._repos: list[str] | None = None
+        self.cassette = cassette
 
         self.api = GhApi(
-            owner=owner, token=token or settings.github.personal_access_token
+            owner=owner,
+            token=token or settings.get("github.personal_access_token"),
+            gh_host=self.gh_host,
         )
 
+    async def _call(self, endpoint: str, fn, *args, **kwargs):
+        """Call a GhApi endpoint in a thread, traced as a `github.api` span."""
+        with get_tracer().span("github.api", endpoint=endpoint) as span:
+            result = await self._fetch((endpoint, args, kwargs), fn, *args, **kwargs)
+            if self.cassette is not None:
+                # replayed responses are plain JSON, GhApi returns `AttrDict`s and `L`s
+                result = dict2obj(result)
+            if isinstance(result, list):
+                span.set(items=len(result))
+            return result
+
     async def _get_pr_comments(
         self, owner: str, repo_name: str, pr_number: int, comment_type: CommentType
     ) -> list[PRComment]:
@@ -35,36 +132,22 @@ class GithubProvider(BaseGitProvider):
             list[PRComment]: A list of PRComment objects representing the comments of the specified type.
         """
         if comment_type == CommentType.ISSUE_COMMENT:
-            comments = await asyncio.to_thread(
+            comments = await self._call(
+                "issues.list_comments",
                 self.api.issues.list_comments,  # type: ignore
                 owner=owner,
                 repo=repo_name,
                 issue_number=pr_number,
             )
         else:
-            comments = await asyncio.to_thread(
+            comments = await self._call(
+                "pulls.list_review_comments",
                 self.api.pulls.list_review_comments,  # type: ignore
                 owner=owner,
                 repo=repo_name,
                 pull_number=pr_number,
             )
-        return [
-            PRComment(
-                id=comment["id"],
-                type=comment_type,
-                user=comment["user"]["login"],
-                user_type=comment["user"]["type"],
-                diff_hunk=comment.get("diff_hunk"),
-                body=comment.get("body"),
-                created_at=comment["created_at"],
-                code_change=not comment.get(
-                    "position"
-                ),  # position = None indicates the original index of the comment is no longer existed, suggesting a code change happened
-                in_reply_to_id=comment.get("in_reply_to_id"),
-                html_url=comment["html_url"],
-            )
-            for comment in comments
-        ]
+        return decode_comments(comments, comment_type)
 
     async def list_pr_comments(self, repo_name: str, pr_number: int) -> list[PRComment]:
         """
@@ -89,11 +172,34 @@ class GithubProvider(BaseGitProvider):
         awaitable_review_comments = self._get_pr_comments(
             self.owner, repo_name, pr_number, CommentType.REVIEW_COMMENT
         )
-        comments = await asyncio.gather(
-            awaitable_issue_comments, awaitable_review_comments
-        )
+        with get_tracer().span("github.list_pr_comments", repo=repo_name) as span:
+            comments = await asyncio.gather(
+                awaitable_issue_comments, awaitable_review_comments
+            )
+            span.set(comments=len(comments[0]) + len(comments[1]))
         return sorted(comments[0] + comments[1], key=lambda x: x.created_at)
 
+    async def _get_first_committed_at(self, repo_name: str, pr: dict) -> str:
+        """
+        Retrieves the author date of the first commit in a pull request.
+
+        Args:
+            repo_name (str): The name of the repository.
+            pr (dict): The pull request data from the GitHub API.
+
+        Returns:
+            str: The author date of the first commit.
+        """
+        commits = await self._call(
+            "pulls.list_commits",
+            self.api.pulls.list_commits,  # type: ignore
+            owner=self.owner,
+            repo=repo_name,
+            pull_number=pr["number"],
+        )
+        first_commit = commits[0].get("commit")
+        return first_commit.get("author").get("date")
+
     async def _to_PullRequest(self, pr: dict) -> PullRequest:
         """
         Convert a GitHub pull request dictionary into a `PullRequest` dataclass.
@@ -107,13 +213,9 @@ class GithubProvider(BaseGitProvider):
         pr_number = pr["number"]
         repo_name = pr["base"]["repo"]["name"]
 
-        awaitable_commits = asyncio.to_thread(
-            self.api.pulls.list_commits,  # type: ignore
-            owner=self.owner,
-            repo=repo_name,
-            pull_number=pr_number,
-        )
-        awaitable_reviews = asyncio.to_thread(
+        awaitable_first_committed_at = self._get_first_committed_at(repo_name, pr)
+        awaitable_reviews = self._call(
+            "pulls.list_reviews",
             self.api.pulls.list_reviews,  # type: ignore
             owner=self.owner,
             repo=repo_name,
@@ -122,14 +224,12 @@ class GithubProvider(BaseGitProvider):
         awaitable_comments = self.list_pr_comments(repo_name, pr_number)
 
         results = await asyncio.gather(
-            awaitable_commits, awaitable_reviews, awaitable_comments
+            awaitable_first_committed_at, awaitable_reviews, awaitable_comments
         )
-        commits = results[0]
+        first_committed_at = results[0]
         reviews = results[1]
         comments = results[2]
 
-        first_commit = commits[0].get("commit")
-        first_committed_at = first_commit.get("author").get("date")
         diff_lines = f'+{pr.get("additions")} -{pr.get("deletions")}'
         merged_at = pr.get("merged_at") if pr.get("merged_at") != "null" else None
 
@@ -142,12 +242,12 @@ class GithubProvider(BaseGitProvider):
             ):
                 continue
             else:
-                pr_reviewers.add(review["user"]["login"])
+                pr_reviewers.add(sys.intern(review["user"]["login"]))
 
         return PullRequest(
             number=pr_number,
             title=pr["title"],
-            author=pr["user"]["login"],
+            author=sys.intern(pr["user"]["login"]),
             state=pr["state"],
             reviewers=list(pr_reviewers),
             created_at=pr["created_at"],
@@ -158,6 +258,8 @@ class GithubProvider(BaseGitProvider):
             comments=comments,
             diff_lines=diff_lines,
             merged_at=merged_at,
+            base_sha=pr.get("base", {}).get("sha"),
+            head_sha=pr.get("head", {}).get("sha"),
         )
 
     async def get_pr(self, repo: str, pr_number: int) -> PullRequest:
@@ -171,15 +273,16 @@ class GithubProvider(BaseGitProvider):
         Returns:
             PullRequest: The `PullRequest` object containing detailed information about the PR.
         """
-        pr = await asyncio.to_thread(self.api.pulls.get, repo, pr_number)  # type: ignore
-        return await self._to_PullRequest(pr)
+        with get_tracer().span("github.get_pr", pr=f"{repo}#{pr_number}"):
+            pr = await self._call("pulls.get", self.api.pulls.get, repo, pr_number)  # type: ignore
+            return await self._to_PullRequest(pr)
 
     async def search_prs(
         self,
         repo_name: str,
         start_date: datetime,
         end_date: datetime,
-        authors: set[str],
+        authors: set[str] | None,
         closed_only: bool = True,
     ) -> list[int]:
         """
@@ -189,25 +292,132 @@ class GithubProvider(BaseGitProvider):
             repo_name (str): The name of the repository.
             start_date (datetime): The start date for filtering PRs.
             end_date (datetime): The end date for filtering PRs.
-            authors (set[str]): A set of author names to filter by.
+            authors (set[str] | None): A set of author names to filter by, or None for all authors.
             closed_only (bool): Only includes the closed PRs if True. Otherwise, all PRs are included.
 
         Returns:
             list[int]: A list of pull request numbers that match the criteria.
         """
+        with get_tracer().span("github.search_prs", repo=repo_name) as span:
+            if self.use_index:
+                await self.sync_index(repo_name)
+                all_prs = self.index.search(
+                    self.owner, repo_name, start_date, end_date, authors, closed_only
+                )
+            else:
+                all_prs = await self._search_prs(
+                    repo_name, start_date, end_date, authors, closed_only
+                )
+            span.set(prs=len(all_prs), index=self.use_index)
+        return all_prs
+
+    async def list_repos(self) -> list[str]:
+        """
+        The names of the owner's repositories, listed once per provider. The owner is
+        looked up as an organization, then as a user.
+        """
+        if self._repos is None:
+            try:
+                repos = await self._list_repos("repos.list_for_org", self.api.repos.list_for_org)  # type: ignore
+            except HTTPError as e:
+                if e.code != 404:
+                    raise
+                repos = await self._list_repos("repos.list_for_user", self.api.repos.list_for_user)  # type: ignore
+            self._repos = [repo["name"] for repo in repos]
+        return self._repos
+
+    async def _list_repos(self, endpoint: str, fn) -> list:
+        repos = []
+        page = 1
+        while True:
+            items = await self._call(endpoint, fn, self.owner, per_page=100, page=page)
+            repos.extend(items)
+            if len(items) < 100:
+                return repos
+            page += 1
+
+    @property
+    def index(self) -> PRIndex:
+        """The PR index, opened on first use."""
+        if self._index is None:
+            self._index = PRIndex(settings.pr_index.path, self.gh_host)
+        return self._index
+
+    async def aclose(self) -> None:
+        """Close the pooled connections of the provider and the PR index."""
+        await super().aclose()
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+
+    async def sync_index(self, repo_name: str, force: bool = False) -> int:
+        """
+        Bring the PR index of a repository up to date.
+
+        PRs are listed by `updated` in descending order until a page reaches the watermark
+        of the previous sync, so only the PRs created or updated since are fetched. The
+        watermark moves only once the sync completes, so an interrupted sync is resumed
+        from the old one.
+
+        Args:
+            repo_name (str): The name of the repository.
+            force (bool): Sync even if the repository was synced less than
+                `settings.pr_index.sync_interval` seconds ago.
+
+        Returns:
+            int: The number of PR headers fetched.
+        """
+        watermark, synced_at = self.index.sync_state(self.owner, repo_name)
+        if (
+            not force
+            and synced_at is not None
+            and time.time() - synced_at < settings.pr_index.sync_interval
+        ):
+            return 0
+        with get_tracer().span("github.sync_index", repo=repo_name) as span:
+            since = watermark and parse_timestamp(watermark)
+            newest = None
+            fetched = 0
+            page = 1
+            while True:
+                prs: list = await self._call("pulls.list", self.api.pulls.list, owner=self.owner, repo=repo_name, state="all", sort="updated", direction="desc", per_page=100, page=page)  # type: ignore
+                if len(prs) == 0:
+                    break
+                newest = newest or prs[0]["updated_at"]
+                self.index.update(self.owner, repo_name, prs)
+                fetched += len(prs)
+                if len(prs) < 100 or (
+                    since and parse_timestamp(prs[-1]["updated_at"]) < since
+                ):
+                    break
+                page += 1
+            self.index.set_watermark(self.owner, repo_name, newest or watermark)
+            span.set(prs=fetched, pages=page)
+        return fetched
+
+    async def _search_prs(
+        self,
+        repo_name: str,
+        start_date: datetime,
+        end_date: datetime,
+        authors: set[str] | None,
+        closed_only: bool,
+    ) -> list[int]:
         all_prs = []
         page = 1
         state = "closed" if closed_only else "all"
         while True:
-            prs: list = await asyncio.to_thread(self.api.pulls.list, owner=self.owner, repo=repo_name, state=state, sort="created", direction="desc", per_page=100, page=page)  # type: ignore
+            prs: list = await self._call("pulls.list", self.api.pulls.list, owner=self.owner, repo=repo_name, state=state, sort="created", direction="desc", per_page=100, page=page)  # type: ignore
+
+            # each timestamp is parsed once, for the filter and the end of the search
+            created = [parse_timestamp(pr["created_at"]) for pr in prs]
 
             # Filter PRs for the date range within this page
             filtered_prs = []
-            for pr in prs:
-                created_at = datetime.strptime(pr["created_at"], "%Y-%m-%dT%H:%M:%S%z")
+            for pr, created_at in zip(prs, created):
                 if (
                     start_date <= created_at <= end_date
-                    and pr["user"]["login"] in authors
+                    and (authors is None or pr["user"]["login"] in authors)
                 ):
                     filtered_prs.append(pr["number"])
 
@@ -220,11 +430,7 @@ class GithubProvider(BaseGitProvider):
             ## prs[-1]
             ##        |-----------------------------|
             ##      start_date                    end_date
-            if (
-                len(prs) == 0
-                or datetime.strptime(prs[-1]["created_at"], "%Y-%m-%dT%H:%M:%S%z")
-                < start_date
-            ):
+            if len(prs) == 0 or created[-1] < start_date:
                 break
 
             page += 1
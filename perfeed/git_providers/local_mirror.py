@@ -0,0 +1,167 @@
+import asyncio
+import os
+import subprocess
+
+from perfeed.config_loader import settings
+from perfeed.git_providers.github import GithubProvider
+from perfeed.log import get_logger
+from perfeed.models.git_provider import PullRequest
+from perfeed.telemetry import get_tracer
+
+
+class LocalMirrorProvider(GithubProvider):
+    """
+    A hybrid GitHub provider backed by local bare mirrors.
+
+    Commits, first-commit dates and merge-base diffs are read from a mirror created with
+    `git clone --mirror`, which also carries the `refs/pull/*` refs. Only PR, review and
+    comment metadata are fetched from the GitHub API. Whenever an object is missing from
+    the mirror, the provider falls back to the API.
+    """
+
+    def __init__(
+        self,
+        owner: str,
+        token: str | None = None,
+        mirror_dir: str | None = None,
+        fetch_before_read: bool | None = None,
+    ):
+        super().__init__(owner, token)
+        self.mirror_dir = mirror_dir or settings.local_mirror.mirror_dir
+        self.fetch_before_read = (
+            settings.local_mirror.fetch_before_read
+            if fetch_before_read is None
+            else fetch_before_read
+        )
+
+    def mirror_path(self, repo_name: str) -> str:
+        """
+        Resolve the path of the mirror for a repository.
+
+        Both `<mirror_dir>/<repo>.git` and `<mirror_dir>/<repo>` are accepted.
+
+        Args:
+            repo_name (str): The name of the repository.
+
+        Returns:
+            str: The path of the mirror.
+
+        Raises:
+            FileNotFoundError: If no mirror exists for the repository.
+        """
+        for candidate in (f"{repo_name}.git", repo_name):
+            path = os.path.join(self.mirror_dir, candidate)
+            if os.path.isdir(path):
+                return path
+        raise FileNotFoundError(
+            f"No local mirror for {self.owner}/{repo_name} in {self.mirror_dir}."
+        )
+
+    def _git(self, repo_name: str, *args: str) -> str:
+        with get_tracer().span("git.mirror", command=args[0]) as span:
+            result = subprocess.run(
+                ["git", "--git-dir", self.mirror_path(repo_name), *args],
+                capture_output=True,
+                text=True,
+            )
+            span.set(bytes=len(result.stdout))
+        if result.returncode != 0:
+            raise RuntimeError(
+                f"git {' '.join(args)} failed for {repo_name}: {result.stderr.strip()}"
+            )
+        return result.stdout
+
+    def _has_commits(self, repo_name: str, *shas: str | None) -> bool:
+        if not all(shas):
+            return False
+        try:
+            for sha in shas:
+                self._git(repo_name, "cat-file", "-e", f"{sha}^{{commit}}")
+        except (FileNotFoundError, RuntimeError):
+            return False
+        return True
+
+    async def sync(self, repo_name: str) -> None:
+        """
+        Fetch the latest branches and pull request refs into the mirror.
+
+        Args:
+            repo_name (str): The name of the repository.
+        """
+        await asyncio.to_thread(self._git, repo_name, "remote", "update", "--prune")
+
+    async def _ensure_commits(self, repo_name: str, *shas: str | None) -> bool:
+        if await asyncio.to_thread(self._has_commits, repo_name, *shas):
+            return True
+        if self.fetch_before_read and all(shas):
+            try:
+                await self.sync(repo_name)
+            except (FileNotFoundError, RuntimeError) as e:
+                get_logger().warning(f"Failed to sync mirror of {repo_name}: {e}")
+                return False
+            return await asyncio.to_thread(self._has_commits, repo_name, *shas)
+        return False
+
+    async def _get_first_committed_at(self, repo_name: str, pr: dict) -> str:
+        """
+        Reads the author date of the first commit in a pull request from the mirror.
+
+        Falls back to the GitHub API if the base or head commit is not in the mirror.
+
+        Args:
+            repo_name (str): The name of the repository.
+            pr (dict): The pull request data from the GitHub API.
+
+        Returns:
+            str: The author date of the first commit.
+        """
+        base_sha = pr["base"]["sha"]
+        head_sha = pr["head"]["sha"]
+        if not await self._ensure_commits(repo_name, base_sha, head_sha):
+            return await super()._get_first_committed_at(repo_name, pr)
+
+        dates = await asyncio.to_thread(
+            self._git,
+            repo_name,
+            "log",
+            "--reverse",
+            "--format=%aI",
+            f"{base_sha}..{head_sha}",
+        )
+        if not dates.strip():
+            return await super()._get_first_committed_at(repo_name, pr)
+        return dates.splitlines()[0]
+
+    async def get_pr_diff(self, repo_name: str, pr: PullRequest) -> str:
+        """
+        Computes the merge-base diff of a pull request from the mirror.
+
+        This matches the content served by `pr.diff_url`. Falls back to downloading
+        `pr.diff_url` if the base or head commit is not in the mirror.
+
+        Args:
+            repo_name (str): The name of the repository.
+            pr (PullRequest): The pull request to compute the diff for.
+
+        Returns:
+            str: The unified diff of the pull request.
+        """
+        if not await self._ensure_commits(repo_name, pr.base_sha, pr.head_sha):
+            get_logger().info(
+                f"{repo_name}#{pr.number} is not in the local mirror, downloading the diff"
+            )
+            return await super().get_pr_diff(repo_name, pr)
+
+        with get_tracer().span(
+            "git.get_pr_diff", pr=f"{repo_name}#{pr.number}", source="mirror"
+        ) as span:
+            diff = await asyncio.to_thread(
+                self._git,
+                repo_name,
+                "diff",
+                "--no-color",
+                "--no-ext-diff",
+                f"{pr.base_sha}...{pr.head_sha}",
+            )
+            span.set(bytes=len(diff))
+            return diff
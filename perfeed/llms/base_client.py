@@ -1,11 +1,26 @@
 from abc import ABC, abstractmethod
 
+from perfeed.llms.usage import estimate_cost
+from perfeed.models.llm_usage import LLMUsage
+from perfeed.utils import count_tokens
+
+
 class BaseClient(ABC):
     """
     This class defines the interface for a LLM client.
     """
     model: str
 
+    async def __aenter__(self) -> "BaseClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Release the connections of the client. Clients that own a pool override it."""
+        pass
+
     @abstractmethod
     def chat_completion(self, system: str, user: str, **kwargs) -> str:
         """
@@ -18,3 +33,37 @@ class BaseClient(ABC):
         Returns: the chat completion response
         """
         pass
+
+    def chat_completion_with_usage(
+        self, system: str, user: str, **kwargs
+    ) -> tuple[str, LLMUsage]:
+        """
+        Return a chat completion along with its token usage and cost.
+
+        Clients whose API reports usage should override this. The default counts the
+        tokens of the prompt and the response with the tokenizer.
+
+        Args:
+            system (str): the system message string to use for the chat completion
+            user (str): the user message string to use for the chat completion
+
+        Returns: the chat completion response and its usage
+        """
+        response = self.chat_completion(system, user, **kwargs)
+        return response, self._usage(
+            count_tokens(system + user), count_tokens(response)
+        )
+
+    def candidates(self) -> list[tuple[str, str]]:
+        """The (provider, model) pairs the client may answer with, as in `LLMUsage`."""
+        return [(self.__class__.__name__, self.model)]
+
+    def _usage(self, prompt_tokens: int, completion_tokens: int) -> LLMUsage:
+        provider = self.__class__.__name__
+        return LLMUsage(
+            provider=provider,
+            model=self.model,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cost_usd=estimate_cost(provider, self.model, prompt_tokens, completion_tokens),
+        )
@@ -0,0 +1,104 @@
+from typing import Callable
+
+from perfeed.log import get_logger
+from perfeed.models.llm_usage import LLMUsage
+from perfeed.telemetry import get_tracer
+
+from .base_client import BaseClient
+
+
+class CascadeClient(BaseClient):
+    """
+    Tries a small, fast model first and escalates to a large model when needed.
+
+    A completion goes straight to the large model if `escalate(system, user)` is true,
+    e.g. for large diffs. Otherwise the small model answers, and its output is returned
+    if `accept(user, output)` holds. If the small model fails or its output is rejected,
+    the large model answers. The usage returned is that of the model that answered, with
+    the tokens and cost of a rejected small attempt added.
+    """
+
+    def __init__(
+        self,
+        small: BaseClient,
+        large: BaseClient,
+        accept: Callable[[str, str], bool],
+        escalate: Callable[[str, str], bool] | None = None,
+    ):
+        """
+        Args:
+            small (BaseClient): The fast, cheap client tried first.
+            large (BaseClient): The client used on escalation.
+            accept (Callable[[str, str], bool]): Whether the small model's output for a
+                user prompt is good enough.
+            escalate (Callable[[str, str], bool] | None): Whether a system and user prompt
+                should skip the small model.
+        """
+        self.small = small
+        self.large = large
+        self.accept = accept
+        self.escalate = escalate
+        self.model = f"{small.model}|{large.model}"
+        self.calls = 0
+        self.escalations = 0
+
+    def candidates(self) -> list[tuple[str, str]]:
+        return self.small.candidates() + self.large.candidates()
+
+    def chat_completion(self, system: str, user: str, **kwargs) -> str:
+        return self.chat_completion_with_usage(system, user, **kwargs)[0]
+
+    def chat_completion_with_usage(
+        self, system: str, user: str, **kwargs
+    ) -> tuple[str, LLMUsage]:
+        """
+        Generate a chat completion with the small model, escalating to the large one.
+
+        Args:
+            system (str): The system message.
+            user (str): The user message.
+            **kwargs: Passed to both clients.
+
+        Returns:
+            tuple[str, LLMUsage]: The accepted response and its usage.
+        """
+        self.calls += 1
+        with get_tracer().span("llm.cascade", model=self.model) as span:
+            wasted = None
+            if self.escalate is not None and self.escalate(system, user):
+                reason = "escalate"
+            else:
+                try:
+                    output, usage = self.small.chat_completion_with_usage(
+                        system, user, **kwargs
+                    )
+                    reason = None if self.accept(user, output) else "rejected"
+                except Exception as e:
+                    get_logger().warning(f"{self.small.model} failed: {e!r}")
+                    output, usage, reason = None, None, "error"
+                if reason is None:
+                    span.set(escalated=False)
+                    return output, usage
+                wasted = usage
+
+            self.escalations += 1
+            span.set(escalated=True, reason=reason)
+            output, usage = self.large.chat_completion_with_usage(system, user, **kwargs)
+            if wasted is not None:
+                usage = usage.model_copy(
+                    update={
+                        "prompt_tokens": usage.prompt_tokens + wasted.prompt_tokens,
+                        "completion_tokens": usage.completion_tokens
+                        + wasted.completion_tokens,
+                        "cost_usd": (
+                            None
+                            if usage.cost_usd is None or wasted.cost_usd is None
+                            else usage.cost_usd + wasted.cost_usd
+                        ),
+                    }
+                )
+            return output, usage
+
+    async def aclose(self) -> None:
+        await self.small.aclose()
+        await self.large.aclose()
@@ -0,0 +1,64 @@
+import hashlib
+import time
+
+from perfeed.models.llm_usage import LLMUsage
+from perfeed.utils.cassette import Cassette, request_key
+
+from .base_client import BaseClient
+
+
+class CassetteClient(BaseClient):
+    """
+    Records the completions of a client into a `Cassette`, or replays them without it.
+
+    The client's model and candidates are recorded too, so a replayed run loads and saves
+    summaries under the same (provider, model) pairs as the recorded one, and its usage
+    is the recorded usage. Completions are keyed by `name`, the prompts and the keyword
+    arguments.
+    """
+
+    def __init__(self, client: BaseClient | None, cassette: Cassette, name: str):
+        """
+        Args:
+            client (BaseClient | None): The recorded client. Not needed to replay.
+            cassette (Cassette): The cassette.
+            name (str): Tells apart the clients recorded in one cassette, e.g.
+                'openai:gpt-4o-mini'.
+        """
+        self.client = client
+        self.cassette = cassette
+        self.name = name
+        if cassette.replaying:
+            meta = cassette.replay("client", name)
+        else:
+            meta = {"model": client.model, "candidates": client.candidates()}
+            cassette.record("client", name, meta, 0.0)
+        self.model = meta["model"]
+        self._candidates = [tuple(candidate) for candidate in meta["candidates"]]
+
+    def candidates(self) -> list[tuple[str, str]]:
+        return self._candidates
+
+    def chat_completion(self, system: str, user: str, **kwargs) -> str:
+        return self.chat_completion_with_usage(system, user, **kwargs)[0]
+
+    def chat_completion_with_usage(
+        self, system: str, user: str, **kwargs
+    ) -> tuple[str, LLMUsage]:
+        # prompts are long, so completions are keyed by their hash
+        key = hashlib.sha256(request_key(self.name, system, user, kwargs).encode())
+        key = key.hexdigest()
+        if self.cassette.replaying:
+            response, usage = self.cassette.replay("llm", key)
+            return response, LLMUsage(**usage)
+
+        now = time.perf_counter()
+        response, usage = self.client.chat_completion_with_usage(system, user, **kwargs)
+        self.cassette.record(
+            "llm", key, [response, usage.model_dump()], time.perf_counter() - now
+        )
+        return response, usage
+
+    async def aclose(self) -> None:
+        if self.client is not None:
+            await self.client.aclose()
@@ -3,14 +3,21 @@ import ollama
 from perfeed.config_loader import settings
 
 from .base_client import BaseClient
+from perfeed.models.llm_usage import LLMUsage
+from perfeed.telemetry import get_tracer
 from perfeed.utils import count_tokens
 
 
 class OllamaClient(BaseClient):
-    def __init__(self, model: str = settings.config.ollama_model):
-        self.model = model
+    def __init__(self, model: str | None = None):
+        self.model = model or settings.config.ollama_model
 
     def chat_completion(self, system: str, user: str, **kwargs) -> str:
+        return self.chat_completion_with_usage(system, user, **kwargs)[0]
+
+    def chat_completion_with_usage(
+        self, system: str, user: str, **kwargs
+    ) -> tuple[str, LLMUsage]:
         """
         Generate a chat completion response using the specified model.
 
@@ -27,7 +34,8 @@ class OllamaClient(BaseClient):
                   default is 0.
 
         Returns:
-            str: The content of the generated message response.
+            tuple[str, LLMUsage]: The content of the generated message response and the
+                token counts reported as `prompt_eval_count` and `eval_count`.
         """
 
         default_num_ctx = settings.ollama.num_ctx
@@ -38,16 +46,32 @@ class OllamaClient(BaseClient):
 
         default_temperature = settings.ollama.temperature
 
-        response = ollama.chat(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system},
-                {"role": "user", "content": user},
-            ],
-            options={
-                "num_ctx": kwargs.get("num_ctx", default_num_ctx),
-                "temperature": kwargs.get("temperature", default_temperature),
-            },
-        )
-
-        return response["message"]["content"]
+        with get_tracer().span(
+            "llm.chat_completion", provider="ollama", model=self.model
+        ) as span:
+            response = ollama.chat(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": system},
+                    {"role": "user", "content": user},
+                ],
+                options={
+                    "num_ctx": kwargs.get("num_ctx", default_num_ctx),
+                    "temperature": kwargs.get("temperature", default_temperature),
+                },
+            )
+            # prompt_eval_count is omitted when the prompt is served from the cache
+            usage = self._usage(
+                response.get("prompt_eval_count", 0), response.get("eval_count", 0)
+            )
+            # durations are reported in nanoseconds
+            span.set(
+                bytes=len(system) + len(user),
+                prompt_tokens=usage.prompt_tokens,
+                completion_tokens=usage.completion_tokens,
+                load_ms=response.get("load_duration", 0) / 1e6,
+                prefill_ms=response.get("prompt_eval_duration", 0) / 1e6,
+                generation_ms=response.get("eval_duration", 0) / 1e6,
+            )
+
+        return response["message"]["content"], usage
@@ -5,21 +5,42 @@ from requests.exceptions import RequestException
 
 
 from perfeed.config_loader import settings
+from perfeed.models.llm_usage import LLMUsage
+from perfeed.telemetry import get_tracer
 
 from .base_client import BaseClient
 
 
 class OpenAIClient(BaseClient):
 
-    def __init__(self, model: str = settings.config.openai_model) -> None:
-        self.model = model
+    def __init__(self, model: str | None = None, client: OpenAI | None = None) -> None:
+        """
+        Args:
+            model (str | None): The model to use, defaults to `settings.config.openai_model`.
+            client (OpenAI | None): A client to share with other instances, so they reuse
+                its connection pool. It is not closed by `aclose`.
+        """
+        self.model = model or settings.config.openai_model
+        self._owns_client = client is None
+        self.client = client or self.create_client()
 
+    @staticmethod
+    def create_client() -> OpenAI:
         key = settings.openai.key
         if not key:
             raise RuntimeError("'OPENAI_API_KEY' not found via os.getenv")
-        self.client = OpenAI(api_key=key)
+        return OpenAI(api_key=key)
+
+    async def aclose(self) -> None:
+        if self._owns_client:
+            self.client.close()
 
     def chat_completion(self, system: str, user: str, **kwargs) -> str:
+        return self.chat_completion_with_usage(system, user, **kwargs)[0]
+
+    def chat_completion_with_usage(
+        self, system: str, user: str, **kwargs
+    ) -> tuple[str, LLMUsage]:
         """
         Generates a completion for a chat interaction using the OpenAI API.
 
@@ -31,25 +52,41 @@ class OpenAIClient(BaseClient):
                 such as 'temperature' to adjust randomness or 'stream' for real-time streaming.
 
         Returns:
-            str: The content of the generated response from the AI model.
+            tuple[str, LLMUsage]: The content of the generated response from the AI model
+                and the tokens and cost reported in `response.usage`.
 
         Raises:
             RuntimeError: If there's an issue with the API key being unavailable
                 or if communication with the LLM platform fails due to a RequestException.
         """
 
-        try:
-            response = self.client.chat.completions.create(
-                messages=[
-                    {"role": "system", "content": system},
-                    {"role": "user", "content": user},
-                ],
-                **self._load_kwargs(kwargs),
+        with get_tracer().span(
+            "llm.chat_completion", provider="openai", model=self.model
+        ) as span:
+            try:
+                response = self.client.chat.completions.create(
+                    messages=[
+                        {"role": "system", "content": system},
+                        {"role": "user", "content": user},
+                    ],
+                    **self._load_kwargs(kwargs),
+                )
+            except RequestException as e:
+                raise RuntimeError(
+                    f"Failed to communicate with the LLM platform: {str(e)}"
+                )
+            usage = self._usage(
+                response.usage.prompt_tokens if response.usage else 0,
+                response.usage.completion_tokens if response.usage else 0,
+            )
+            span.set(
+                bytes=len(system) + len(user),
+                prompt_tokens=usage.prompt_tokens,
+                completion_tokens=usage.completion_tokens,
+                cost_usd=usage.cost_usd or 0.0,
             )
-        except RequestException as e:
-            raise RuntimeError(f"Failed to communicate with the LLM platform: {str(e)}")
 
-        return response.choices[0].message.content  # type: ignore
+        return response.choices[0].message.content, usage  # type: ignore
 
     def _load_kwargs(self, kwargs) -> Dict[str, Any]:
         # essential parameters
@@ -0,0 +1,206 @@
+import threading
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
+
+import pandas as pd
+
+from perfeed.config_loader import settings
+from perfeed.models.llm_usage import LLMUsage
+from perfeed.telemetry import current_span
+
+if TYPE_CHECKING:
+    from perfeed.llms.base_client import BaseClient
+
+
+def estimate_cost(
+    provider: str, model: str, prompt_tokens: int, completion_tokens: int
+) -> float | None:
+    """
+    Price a completion with the per-1M-token rates in `settings.pricing`.
+
+    Args:
+        provider (str): The name of the client class, e.g. 'OpenAIClient'.
+        model (str): The name of the model.
+        prompt_tokens (int): The number of prompt tokens.
+        completion_tokens (int): The number of completion tokens.
+
+    Returns:
+        float | None: The cost in USD. Local Ollama models are free; None if the model
+        has no price configured.
+    """
+    if provider == "OllamaClient":
+        return 0.0
+    price = settings.pricing.get(model)
+    if price is None:
+        return None
+    return (prompt_tokens * price.input + completion_tokens * price.output) / 1e6
+
+
+class BudgetExceededError(RuntimeError):
+    """Raised when a run reaches its token or dollar limit and has no fallback model."""
+
+    pass
+
+
+class UsageLedger:
+    """
+    Records the usage of every chat completion of a process.
+
+    Each record is tagged with the run it belongs to, which is the trace of the
+    enclosing span (e.g. `weekly_summarizer.run`), so usage can be aggregated per run,
+    repo and model. Finished runs are pruned, so the ledger of a long-running process,
+    e.g. the webhook service, keeps only the records of the runs in progress.
+    """
+
+    columns = [
+        "run_id",
+        "repo",
+        "pr_number",
+        "provider",
+        "model",
+        "prompt_tokens",
+        "completion_tokens",
+        "cost_usd",
+        "created_at",
+    ]
+
+    def __init__(self):
+        self.records: list[dict] = []
+        # the totals of the pruned runs
+        self.pruned = self._sum([])
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def current_run_id() -> str | None:
+        span = current_span()
+        return span.trace_id if span else None
+
+    def record(
+        self, usage: LLMUsage, repo: str | None = None, pr_number: int | None = None
+    ) -> None:
+        with self._lock:
+            self.records.append(
+                {
+                    "run_id": self.current_run_id(),
+                    "repo": repo,
+                    "pr_number": pr_number,
+                    **usage.model_dump(),
+                    "created_at": datetime.now(timezone.utc).strftime(
+                        "%Y-%m-%dT%H:%M:%SZ"
+                    ),
+                }
+            )
+
+    def totals(self, run_id: str | None = None) -> dict[str, float]:
+        """
+        Sum the tokens and cost of a run, or of all records, pruned runs included, if
+        `run_id` is None.
+
+        Unpriced completions count as free towards `cost_usd`.
+        """
+        with self._lock:
+            if run_id is not None:
+                return self._sum([r for r in self.records if r["run_id"] == run_id])
+            current = self._sum(self.records)
+            return {key: current[key] + self.pruned[key] for key in current}
+
+    def prune(self, run_id: str | None) -> dict[str, float]:
+        """
+        Drop the records of a finished run, once its usage is reported, and add them to
+        the totals of the pruned runs.
+
+        Returns:
+            dict[str, float]: The totals of the run.
+        """
+        with self._lock:
+            records = [r for r in self.records if r["run_id"] == run_id]
+            self.records = [r for r in self.records if r["run_id"] != run_id]
+            run = self._sum(records)
+            self.pruned = {key: self.pruned[key] + run[key] for key in run}
+        return run
+
+    @staticmethod
+    def _sum(records: list[dict]) -> dict[str, float]:
+        return {
+            "calls": len(records),
+            "prompt_tokens": sum(r["prompt_tokens"] for r in records),
+            "completion_tokens": sum(r["completion_tokens"] for r in records),
+            "total_tokens": sum(r["prompt_tokens"] + r["completion_tokens"] for r in records),
+            "cost_usd": sum(r["cost_usd"] or 0.0 for r in records),
+        }
+
+    def aggregate(self, by: tuple[str, ...] = ("run_id", "repo", "model")) -> pd.DataFrame:
+        """
+        Aggregate calls, tokens and cost by the given columns, over the runs that are
+        not pruned.
+
+        Args:
+            by (tuple[str, ...]): The columns to group by, any of `run_id`, `repo`,
+                `pr_number`, `provider` and `model`.
+
+        Returns:
+            pd.DataFrame: One row per group, most expensive first.
+        """
+        with self._lock:
+            df = pd.DataFrame(self.records, columns=self.columns)
+        df["total_tokens"] = df["prompt_tokens"] + df["completion_tokens"]
+        return (
+            df.groupby(list(by), dropna=False)
+            .agg(
+                calls=("model", "size"),
+                prompt_tokens=("prompt_tokens", "sum"),
+                completion_tokens=("completion_tokens", "sum"),
+                total_tokens=("total_tokens", "sum"),
+                cost_usd=("cost_usd", "sum"),
+            )
+            .reset_index()
+            .sort_values(["cost_usd", "total_tokens"], ascending=False, ignore_index=True)
+        )
+
+
+class Budget:
+    """
+    A per-run limit on tokens and dollars.
+
+    Once the usage of the current run reaches a limit, completions switch to the
+    `fallback` client, typically a cheaper or local model. Without a fallback,
+    `BudgetExceededError` is raised so the run stops summarizing. The limit is checked
+    before each completion, so a run can overshoot it by the completions in flight.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int | None = None,
+        max_cost_usd: float | None = None,
+        fallback: "BaseClient | None" = None,
+    ):
+        """
+        Args:
+            max_tokens (int | None): The limit on prompt plus completion tokens per run.
+            max_cost_usd (float | None): The limit on the cost in USD per run.
+            fallback (BaseClient | None): The client to use once a limit is reached.
+        """
+        self.max_tokens = max_tokens
+        self.max_cost_usd = max_cost_usd
+        self.fallback = fallback
+
+    def exceeded(self, ledger: UsageLedger) -> bool:
+        totals = ledger.totals(ledger.current_run_id())
+        return (self.max_tokens is not None and totals["total_tokens"] >= self.max_tokens) or (
+            self.max_cost_usd is not None and totals["cost_usd"] >= self.max_cost_usd
+        )
+
+    def select(self, llm: "BaseClient", ledger: UsageLedger) -> "BaseClient":
+        """
+        Pick the client for the next completion of the current run.
+
+        Raises:
+            BudgetExceededError: If the budget is exceeded and there is no fallback.
+        """
+        if not self.exceeded(ledger):
+            return llm
+        if self.fallback is None:
+            raise BudgetExceededError(
+                f"LLM budget exceeded: {ledger.totals(ledger.current_run_id())}"
+            )
+        return self.fallback
@@ -8,7 +8,8 @@ class CommentType(Enum):
     REVIEW_COMMENT = "review_comment"
 
 
-@dataclass
+# slotted, as a backfill keeps hundreds of thousands of comments in memory
+@dataclass(slots=True)
 class PRComment:
     id: int
     type: CommentType
@@ -36,7 +37,7 @@ class PRComment:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class PullRequest:
     number: int
     title: str
@@ -51,6 +52,8 @@ class PullRequest:
     comments: list[PRComment]
     diff_lines: str
     merged_at: Optional[str] = None
+    base_sha: Optional[str] = None
+    head_sha: Optional[str] = None
 
     def to_dict(self) -> dict:
         return {
@@ -84,3 +84,13 @@ class PRSummaryMetadata(BaseModel):
     pr_created_at: str
     pr_merged_at: Optional[str] = None
     created_at: str
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cost_usd: Optional[float] = None
+    diff_fingerprint: Optional[str] = None
+    reused_from: Optional[str] = None
+    # review metrics of the PR, see `perfeed.utils.review_metrics`
+    time_to_first_review_h: Optional[float] = None
+    review_rounds: Optional[int] = None
+    comments_per_100_lines: Optional[float] = None
+    cycle_time_h: Optional[float] = None
@@ -0,0 +1,200 @@
+import tempfile
+
+from perfeed.config_loader import settings
+from perfeed.utils.cassette import Cassette
+
+
+class Resources:
+    """
+    Builds the git providers, LLM clients and stores from `settings` once and shares them.
+
+    Instances are cached by their arguments, `OpenAIClient`s share one `OpenAI` client
+    and its connection pool, and `SQLStorage`s of a data type share one SQLAlchemy
+    engine. Everything is closed by `aclose`, or on leaving `async with Resources()`.
+    Backends are imported when first built.
+
+    With a `cassette`, the git providers and the OpenAI and Ollama clients record their
+    responses into it, or replay them without GitHub or the LLM servers. The git
+    providers then search without the PR index, and the stores and their memos live in
+    a temporary directory removed by `aclose`, so a run neither reads summaries stored
+    by earlier runs, which would skip the requests to record, nor writes into `../_data`.
+    """
+
+    def __init__(self, cassette: Cassette | None = None):
+        self.cassette = cassette
+        self._tmp: tempfile.TemporaryDirectory | None = None
+        self._git: dict = {}
+        self._llms: dict = {}
+        self._stores: dict = {}
+        self._engines: dict = {}
+        self._openai = None
+
+    async def __aenter__(self) -> "Resources":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    def git(self, owner: str):
+        """The `GithubProvider` of an owner."""
+        if owner not in self._git:
+            from perfeed.git_providers.github import GithubProvider
+
+            self._git[owner] = GithubProvider(owner, cassette=self.cassette)
+        return self._git[owner]
+
+    def llm(self, provider: str | None = None, model: str | None = None):
+        """
+        The LLM client of a provider and model.
+
+        Args:
+            provider (str | None): 'ollama', 'openai' or 'cascade', defaults to
+                `settings.config.llm_provider`. 'cascade' builds a `CascadeClient` for PR
+                summaries from `settings.cascade`, sharing the clients of its models.
+            model (str | None): The model, defaults to the provider's model in `settings.config`.
+        """
+        provider = provider or settings.config.llm_provider
+        if (provider, model) not in self._llms:
+            if provider in ("openai", "ollama") and self.cassette is not None:
+                from perfeed.llms.cassette_client import CassetteClient
+
+                client = None
+                if not self.cassette.replaying:
+                    client = self._client(provider, model)
+                llm = CassetteClient(
+                    client, self.cassette, f"{provider}:{model or 'default'}"
+                )
+            elif provider in ("openai", "ollama"):
+                llm = self._client(provider, model)
+            elif provider == "cascade":
+                from perfeed.llms.cascade_client import CascadeClient
+                from perfeed.tools.pr_summarizer import accept_pr_summary, is_large_pr
+
+                llm = CascadeClient(
+                    self.llm(settings.cascade.small_provider, settings.cascade.small_model),
+                    self.llm(
+                        settings.cascade.large_provider, settings.cascade.large_model or None
+                    ),
+                    accept=accept_pr_summary,
+                    escalate=is_large_pr,
+                )
+            else:
+                raise ValueError(f"Unknown LLM provider: {provider}")
+            self._llms[(provider, model)] = llm
+        return self._llms[(provider, model)]
+
+    def _client(self, provider: str, model: str | None):
+        if provider == "openai":
+            from perfeed.llms.openai_client import OpenAIClient
+
+            if self._openai is None:
+                self._openai = OpenAIClient.create_client()
+            return OpenAIClient(model, client=self._openai)
+        from perfeed.llms.ollama_client import OllamaClient
+
+        return OllamaClient(model)
+
+    @property
+    def root(self) -> str:
+        """The directory of the stores, a temporary one with a cassette."""
+        if self.cassette is None:
+            return "../_data"
+        if self._tmp is None:
+            self._tmp = tempfile.TemporaryDirectory(prefix="perfeed-cassette-")
+        return self._tmp.name
+
+    def store(self, backend: str | None = None, data_type: str = "pr_summary"):
+        """
+        The appending store of a backend and data type.
+
+        Args:
+            backend (str | None): 'feather', 'sql' or 'duckdb', defaults to
+                `settings.config.store_backend`.
+            data_type (str): The type of the stored data.
+        """
+        backend = backend or settings.config.store_backend
+        if (backend, data_type) not in self._stores:
+            if backend == "sql":
+                from perfeed.data_stores.storage_sqldb import SQLStorage
+
+                if data_type not in self._engines:
+                    self._engines[data_type] = SQLStorage.create_engine(
+                        data_type, self.root
+                    )
+                store = SQLStorage(
+                    data_type, engine=self._engines[data_type], root=self.root
+                )
+            elif backend == "feather":
+                from perfeed.data_stores.storage_feather import FeatherStorage
+
+                store = FeatherStorage(
+                    data_type, overwrite=False, append=True, root=self.root
+                )
+            elif backend == "duckdb":
+                from perfeed.data_stores.storage_duckdb import DuckDBStorage
+
+                store = DuckDBStorage(
+                    data_type, overwrite=False, append=True, root=self.root
+                )
+            else:
+                raise ValueError(f"Unknown store backend: {backend}")
+            self._stores[(backend, data_type)] = store
+        return self._stores[(backend, data_type)]
+
+    def budget(self, max_tokens: int | None = None, max_cost_usd: float | None = None):
+        """
+        The per-run `Budget` of `settings.budget`, or None if it sets no limit.
+
+        Args:
+            max_tokens (int | None): Overrides `settings.budget.max_tokens`.
+            max_cost_usd (float | None): Overrides `settings.budget.max_cost_usd`.
+        """
+        from perfeed.llms.usage import Budget
+
+        # 0 in the settings means no limit
+        max_tokens = max_tokens or settings.budget.max_tokens or None
+        max_cost_usd = max_cost_usd or settings.budget.max_cost_usd or None
+        if max_tokens is None and max_cost_usd is None:
+            return None
+        fallback = None
+        if settings.budget.fallback_provider:
+            fallback = self.llm(
+                settings.budget.fallback_provider, settings.budget.fallback_model or None
+            )
+        return Budget(max_tokens, max_cost_usd, fallback)
+
+    def summarizer(
+        self,
+        owner: str,
+        provider: str | None = None,
+        model: str | None = None,
+        backend: str | None = None,
+        **kwargs,
+    ):
+        """
+        A `PRSummarizer` over the shared provider, client and store of the arguments.
+        Its budget defaults to `self.budget()`.
+        """
+        from perfeed.tools.pr_summarizer import PRSummarizer
+
+        kwargs.setdefault("budget", self.budget())
+        return PRSummarizer(
+            self.git(owner), self.llm(provider, model), self.store(backend), **kwargs
+        )
+
+    async def aclose(self) -> None:
+        """Close every resource built so far."""
+        for resource in [*self._git.values(), *self._llms.values(), *self._stores.values()]:
+            await resource.aclose()
+        for engine in self._engines.values():
+            engine.dispose()
+        if self._openai is not None:
+            self._openai.close()
+        self._git.clear()
+        self._llms.clear()
+        self._stores.clear()
+        self._engines.clear()
+        self._openai = None
+        if self._tmp is not None:
+            self._tmp.cleanup()
+            self._tmp = None
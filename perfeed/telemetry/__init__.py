@@ -0,0 +1,11 @@
+__all__ = ["Span", "Tracer", "attach", "current_span", "get_tracer"]
+from perfeed.config_loader import settings
+from perfeed.telemetry.tracer import Span, Tracer, attach, current_span
+
+_tracer = Tracer(
+    enabled=settings.telemetry.enabled, max_spans=settings.telemetry.max_spans
+)
+
+
+def get_tracer() -> Tracer:
+    return _tracer
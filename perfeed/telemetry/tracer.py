@@ -0,0 +1,275 @@
+import json
+import os
+import secrets
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+
+_current_span: ContextVar["Span | None"] = ContextVar("perfeed_current_span", default=None)
+
+
+def current_span() -> "Span | None":
+    """The innermost open span of the current task or thread, if any."""
+    return _current_span.get()
+
+
+@contextmanager
+def attach(span: "Span | None") -> Iterator[None]:
+    """
+    Make `span` the current span of a block, e.g. in a worker task that runs steps on
+    behalf of a caller, so the spans opened in the block nest under the caller's span.
+    """
+    token = _current_span.set(span)
+    try:
+        yield
+    finally:
+        _current_span.reset(token)
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    start_ns: int
+    end_ns: int | None = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+    error: str | None = None
+
+    @property
+    def duration(self) -> float:
+        """The duration in seconds, up to now if the span has not ended."""
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def add(self, key: str, value: float) -> None:
+        """Increment a numeric attribute, e.g. bytes or tokens."""
+        self.attributes[key] = self.attributes.get(key, 0) + value
+
+
+@dataclass
+class _Aggregate:
+    count: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+    totals: dict[str, float] = field(default_factory=lambda: defaultdict(float))
+
+
+class Tracer:
+    """
+    Collects spans across the summarization pipeline.
+
+    Spans nest through a context variable, so they follow asyncio tasks and
+    `asyncio.to_thread`. Finished spans are kept up to `max_spans` for export, while
+    per-stage aggregates (count, duration and numeric attributes such as tokens, bytes or
+    cache hits) are kept for the whole process.
+    """
+
+    def __init__(self, enabled: bool = True, max_spans: int = 10_000):
+        self.enabled = enabled
+        self.spans: deque[Span] = deque(maxlen=max_spans)
+        self._aggregates: dict[str, _Aggregate] = defaultdict(_Aggregate)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """
+        Time a block as a span named `name`.
+
+        The span is yielded so attributes can be set while it runs. Exceptions are
+        recorded on the span and re-raised.
+        """
+        parent = _current_span.get()
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id if parent else secrets.token_hex(16),
+            span_id=secrets.token_hex(8),
+            parent_id=parent.span_id if parent else None,
+            start_ns=time.time_ns(),
+            attributes=dict(attributes),
+        )
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = repr(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_ns = time.time_ns()
+            if self.enabled:
+                self._record(span)
+
+    def _record(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+            aggregate = self._aggregates[span.name]
+            aggregate.count += 1
+            aggregate.errors += span.error is not None
+            aggregate.seconds += span.duration
+            for key, value in span.attributes.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    aggregate.totals[key] += value
+                elif isinstance(value, bool):
+                    aggregate.totals[key] += int(value)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.spans.clear()
+            self._aggregates.clear()
+
+    def summary(self) -> list[dict[str, Any]]:
+        """Per-stage aggregates, slowest stage first."""
+        with self._lock:
+            durations = defaultdict(list)
+            for span in self.spans:
+                durations[span.name].append(span.duration)
+            rows = []
+            for name, aggregate in self._aggregates.items():
+                samples = sorted(durations[name]) or [0.0]
+                rows.append(
+                    {
+                        "stage": name,
+                        "count": aggregate.count,
+                        "errors": aggregate.errors,
+                        "total_s": aggregate.seconds,
+                        "mean_ms": aggregate.seconds / aggregate.count * 1000,
+                        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+                        * 1000,
+                        **dict(aggregate.totals),
+                    }
+                )
+        return sorted(rows, key=lambda row: row["total_s"], reverse=True)
+
+    def summary_table(
+        self,
+        columns: tuple[str, ...] = (
+            "prompt_tokens",
+            "completion_tokens",
+            "bytes",
+            "removed_tokens",
+            "encoding_saved_tokens",
+            "cache_hit",
+            "dedup_hit",
+        ),
+    ) -> str:
+        """Render the per-stage aggregates as a plain text table."""
+        header = ["stage", "count", "errors", "total_s", "mean_ms", "p95_ms", *columns]
+        lines = [header]
+        for row in self.summary():
+            lines.append(
+                [
+                    row["stage"],
+                    str(row["count"]),
+                    str(row["errors"]),
+                    f"{row['total_s']:.3f}",
+                    f"{row['mean_ms']:.1f}",
+                    f"{row['p95_ms']:.1f}",
+                    *(f"{row[c]:.0f}" if c in row else "-" for c in columns),
+                ]
+            )
+        widths = [max(len(line[i]) for line in lines) for i in range(len(header))]
+        return "\n".join(
+            "  ".join(
+                cell.ljust(width) if i == 0 else cell.rjust(width)
+                for i, (cell, width) in enumerate(zip(line, widths))
+            )
+            for line in lines
+        )
+
+    def to_otlp(self, service_name: str = "perfeed") -> dict:
+        """The finished spans in the OpenTelemetry OTLP/JSON format."""
+
+        def value(v: Any) -> dict:
+            if isinstance(v, bool):
+                return {"boolValue": v}
+            if isinstance(v, int):
+                return {"intValue": str(v)}
+            if isinstance(v, float):
+                return {"doubleValue": v}
+            return {"stringValue": str(v)}
+
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {"key": "service.name", "value": {"stringValue": service_name}}
+                        ]
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "perfeed"},
+                            "spans": [
+                                {
+                                    "traceId": span.trace_id,
+                                    "spanId": span.span_id,
+                                    **(
+                                        {"parentSpanId": span.parent_id}
+                                        if span.parent_id
+                                        else {}
+                                    ),
+                                    "name": span.name,
+                                    "kind": 1,
+                                    "startTimeUnixNano": str(span.start_ns),
+                                    "endTimeUnixNano": str(span.end_ns),
+                                    "attributes": [
+                                        {"key": k, "value": value(v)}
+                                        for k, v in span.attributes.items()
+                                    ],
+                                    "status": (
+                                        {"code": 2, "message": span.error}
+                                        if span.error
+                                        else {"code": 1}
+                                    ),
+                                }
+                                for span in spans
+                            ],
+                        }
+                    ],
+                }
+            ]
+        }
+
+    def to_prometheus(self) -> str:
+        """The per-stage aggregates in the Prometheus text exposition format."""
+        lines = [
+            "# TYPE perfeed_stage_calls_total counter",
+            "# TYPE perfeed_stage_errors_total counter",
+            "# TYPE perfeed_stage_seconds_total counter",
+        ]
+        attribute_lines = []
+        with self._lock:
+            for name, aggregate in sorted(self._aggregates.items()):
+                label = f'{{stage="{name}"}}'
+                lines.append(f"perfeed_stage_calls_total{label} {aggregate.count}")
+                lines.append(f"perfeed_stage_errors_total{label} {aggregate.errors}")
+                lines.append(f"perfeed_stage_seconds_total{label} {aggregate.seconds}")
+                for key, total in sorted(aggregate.totals.items()):
+                    attribute_lines.append(
+                        f'perfeed_stage_attribute_total{{stage="{name}",attribute="{key}"}} {total}'
+                    )
+        if attribute_lines:
+            lines.append("# TYPE perfeed_stage_attribute_total counter")
+        return "\n".join(lines + attribute_lines) + "\n"
+
+    def export(self, otlp_path: str | None = None, prometheus_path: str | None = None) -> None:
+        """Write the spans as OTLP/JSON and the aggregates as Prometheus text files."""
+        for path, content in [
+            (otlp_path, lambda: json.dumps(self.to_otlp())),
+            (prometheus_path, self.to_prometheus),
+        ]:
+            if not path:
+                continue
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "w") as f:
+                f.write(content())
@@ -1,110 +1,722 @@
 import asyncio
+import contextlib
 import json
+import os
+import re
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from typing import Tuple
 
-import requests
+import numpy as np
 from jinja2 import Environment, StrictUndefined
+from pydantic import ValidationError
 
 from perfeed.config_loader import settings
 from perfeed.data_stores.base import BaseStorage
-from perfeed.data_stores.storage_feather import FeatherStorage
+from perfeed.data_stores.summary_cache import SummaryUnitCache, unit_key
 from perfeed.git_providers.base import BaseGitProvider
-from perfeed.git_providers.github import GithubProvider, comments_to_thread
+from perfeed.git_providers.github import comments_to_thread
 from perfeed.llms.base_client import BaseClient
+from perfeed.llms.usage import Budget, UsageLedger
+from perfeed.models.git_provider import PullRequest
+from perfeed.models.llm_usage import LLMUsage
 from perfeed.log import get_logger
-from perfeed.models.pr_summary import PRSummary, PRSummaryMetadata
+from perfeed.models.pr_summary import (
+    CommentThread,
+    FileDescription,
+    PRSummary,
+    PRSummaryMetadata,
+)
+from perfeed.telemetry import Span, attach, get_tracer
 from perfeed.utils import json_output_curator
+from perfeed.utils.diff_filter import DiffFilter
+from perfeed.utils.minhash import MinHasher
+from perfeed.utils.offload import BatchedProcessPool
+from perfeed.utils.pipeline import Pipeline, Stage
+from perfeed.utils.prompt_encoding import (
+    encode_schema,
+    encode_threads,
+    restore_thread_urls,
+    saved_tokens,
+)
+from perfeed.utils.review_metrics import pr_review_metrics
+
+
+def parse_pr_summary(llm_output: str) -> PRSummary:
+    """Curate the raw LLM output and validate it as a `PRSummary`."""
+    curated_summary = json_output_curator(llm_output)
+    return PRSummary(**json.loads(curated_summary))
+
+
+# the prompt quotes the diff, so its first header follows a quote
+_DIFF_FILE = re.compile(r"^'?diff --git a/\S+ b/(\S+)$", re.MULTILINE)
+_DIFF_CHANGE = re.compile(r"^[+-](?![+-]{2} )", re.MULTILINE)
+# threads are JSON or, in the compact prompt encoding, `parent_thread_id=<id>` lines
+_THREAD_ID = re.compile(r'"?parent_thread_id"?(?:: |=)(\d+)')
+
+
+def is_large_pr(system: str, user: str) -> bool:
+    """
+    Whether the diff in a PR summary prompt is too large for a small model.
+
+    A diff is large if it has more changed lines than
+    `settings.cascade.max_small_diff_lines`, or more files than a `PRSummary` can list.
+    """
+    max_files = PRSummary.model_fields["pr_files"].metadata[0].max_length
+    return (
+        len(_DIFF_CHANGE.findall(user)) > settings.cascade.max_small_diff_lines
+        or len(_DIFF_FILE.findall(user)) > max_files
+    )
+
+
+def accept_pr_summary(user: str, llm_output: str) -> bool:
+    """
+    Check the output of a PR summary prompt before accepting it from a small model.
+
+    The output must be a valid `PRSummary` that describes every file of the diff, and
+    summarizes at least one comment thread if the PR has any.
+
+    Args:
+        user (str): The user prompt, with the diff and comment threads.
+        llm_output (str): The output of the model.
+
+    Returns:
+        bool: True if the output is acceptable.
+    """
+    try:
+        pr_summary = parse_pr_summary(llm_output)
+    except (ValueError, ValidationError):
+        return False
+
+    described = {file.filename for file in pr_summary.pr_files}
+    if not set(_DIFF_FILE.findall(user)) <= described:
+        return False
+    if _THREAD_ID.search(user) and not pr_summary.comments:
+        return False
+    return all(thread.summary.strip() for thread in pr_summary.comments)
+
+
+def adapt_summary(pr_summary: PRSummary, diff: str, pr: PullRequest) -> PRSummary:
+    """
+    Adapt the summary of a near-duplicate PR to another PR and its diff.
+
+    The title and description of the original PR may not hold for the other one, e.g.
+    the version of a dependency bump, so they are taken from the PR itself: its title,
+    and the first paragraph of its description, or its title if it has none. Comment
+    threads belong to the original PR and are dropped, and only the files of the diff
+    are kept, unless none of them were described.
+    """
+    files = set(_DIFF_FILE.findall(diff))
+    pr_files = [file for file in pr_summary.pr_files if file.filename in files]
+    description = (pr.description or "").strip().split("\n\n")[0].strip()
+    return pr_summary.model_copy(
+        update={
+            "title": pr.title,
+            "description": description or pr.title,
+            "pr_files": pr_files or pr_summary.pr_files,
+            "comments": [],
+        }
+    )
+
+
+def split_diff_files(diff: str) -> dict[str, str]:
+    """The sections of a unified diff by the path of their file, in order."""
+    starts = [match.start() for match in _DIFF_FILE.finditer(diff)]
+    return {
+        _DIFF_FILE.match(diff, start)[1]: diff[start:end]
+        for start, end in zip(starts, starts[1:] + [len(diff)])
+    }
+
+
+def merge_summary(
+    pr_summary: PRSummary,
+    files: list[str],
+    threads: list[int],
+    cached_files: dict[str, FileDescription],
+    cached_threads: dict[int, CommentThread],
+) -> PRSummary:
+    """
+    Merge memoized file descriptions and thread summaries into the summary of the
+    changed ones, in the order of the diff and the threads.
+    """
+    new_files = {file.filename: file for file in pr_summary.pr_files}
+    new_threads = {thread.parent_thread_id: thread for thread in pr_summary.comments}
+    pr_files = [
+        cached_files.get(name) or new_files[name]
+        for name in files
+        if name in cached_files or name in new_files
+    ]
+    comments = [
+        cached_threads.get(thread_id) or new_threads[thread_id]
+        for thread_id in threads
+        if thread_id in cached_threads or thread_id in new_threads
+    ]
+    max_files = PRSummary.model_fields["pr_files"].metadata[0].max_length
+    max_threads = PRSummary.model_fields["comments"].metadata[0].max_length
+    return pr_summary.model_copy(
+        update={"pr_files": pr_files[:max_files], "comments": comments[:max_threads]}
+    )
+
+
+@dataclass
+class _PRJob:
+    """A PR moving through the stages of `PRSummarizer`, with what they produced so far."""
+
+    repo: str
+    pr_number: int
+    refresh: bool
+    span: Span
+    future: asyncio.Future
+    previous: Tuple[PRSummary, PRSummaryMetadata] | None = None
+    pr: PullRequest | None = None
+    code: str = ""
+    fingerprint: str | None = None
+    threads: list[dict] = field(default_factory=list)
+    files: dict[str, str] = field(default_factory=dict)
+    file_keys: dict[str, str] = field(default_factory=dict)
+    thread_keys: dict[int, str] = field(default_factory=dict)
+    cached_files: dict[str, FileDescription] = field(default_factory=dict)
+    cached_threads: dict[int, CommentThread] = field(default_factory=dict)
+    changed_files: list[str] = field(default_factory=list)
+    changed_threads: list[dict] = field(default_factory=list)
+    encoding: str = "json"
+    prompt: Tuple[str, str] | None = None
+    completion: str | None = None
+    usage: LLMUsage | None = None
+    pr_summary: PRSummary | None = None
+
+    @property
+    def partial(self) -> bool:
+        """
+        Whether the memoized files and threads are left out of the prompt, which then
+        asks for the changes since the stored summary. A PR summarized for the first
+        time has none, so its prompt has the whole diff even if units of other PRs are
+        memoized.
+        """
+        return self.previous is not None and bool(
+            self.cached_files or self.cached_threads
+        )
 
 
 class PRSummarizer:
-    def __init__(self, git: BaseGitProvider, llm: BaseClient, store: BaseStorage):
+    def __init__(
+        self,
+        git: BaseGitProvider,
+        llm: BaseClient,
+        store: BaseStorage,
+        offload: BatchedProcessPool | None = None,
+        ledger: UsageLedger | None = None,
+        budget: Budget | None = None,
+        dedup: bool | None = None,
+        diff_filter: DiffFilter | None = None,
+        memo: SummaryUnitCache | None = None,
+    ):
+        """
+        Args:
+            git (BaseGitProvider): The provider to fetch the pull requests from.
+            llm (BaseClient): The LLM client to summarize with.
+            store (BaseStorage): The store to load and save the summaries.
+            offload (BatchedProcessPool | None): If set, CPU-bound stages such as comment
+                threading and output parsing run in its worker processes instead of on
+                the event loop. Useful for large backfills.
+            ledger (UsageLedger | None): Where the usage of every completion is recorded.
+                A new ledger is created if not given.
+            budget (Budget | None): If set, completions switch to the budget's fallback
+                model, or raise `BudgetExceededError`, once the run reaches its limit.
+            dedup (bool | None): Reuse the stored summary of a near-duplicate diff for PRs
+                without comment threads, instead of calling the LLM. Defaults to
+                `settings.dedup.enabled`.
+            diff_filter (DiffFilter | None): The filter applied to diffs before they are
+                fingerprinted and prompted. Defaults to `[diff_filter]` in the settings,
+                or no filtering if it is disabled.
+            memo (SummaryUnitCache | None): The cache of file descriptions and thread
+                summaries, so only the changed parts of a PR are summarized again.
+                Defaults to a cache next to the store if `settings.memo.enabled`.
+        """
         self.git = git
         self.llm = llm
         self.store = store
+        self.offload = offload
+        self.ledger = ledger if ledger is not None else UsageLedger()
+        self.budget = budget
+        self.dedup = settings.dedup.enabled if dedup is None else dedup
+        if diff_filter is None and settings.diff_filter.enabled:
+            diff_filter = DiffFilter.from_settings()
+        self.diff_filter = diff_filter
+        # stores that keep nothing, e.g. in tests and benchmarks, have no directory
+        store_dict = getattr(store, "store_dict", None)
+        if memo is None and settings.memo.enabled and store_dict is not None:
+            memo = SummaryUnitCache(os.path.join(store_dict, "summary_units.sqlite"))
+        self.memo = memo
+        self.hasher = MinHasher(num_perm=settings.dedup.num_perm)
+        # the number of LLM calls saved by reusing near-duplicate summaries
+        self.saved_calls = 0
+        # the runs in progress, which concurrent runs of the same PR wait for
+        self._in_flight: dict[tuple, asyncio.Future] = {}
+        # concurrent runs share the stages, so fetching the next PRs overlaps with the
+        # LLM calls of the current ones
+        workers = settings.pipeline.workers
+        self.pipeline = Pipeline(
+            [
+                Stage(name, self._in_job_span(fn), workers[name])
+                for name, fn in [
+                    ("load", self._load),
+                    ("fetch_pr", self._fetch_pr),
+                    ("fetch_diff", self._fetch_diff),
+                    ("preprocess", self._preprocess),
+                    ("llm", self._complete),
+                    ("parse", self._parse),
+                    ("store", self._store),
+                ]
+            ],
+            queue_size=settings.pipeline.queue_size,
+        )
+
+    async def _cpu(self, fn, *args):
+        if self.offload is None:
+            return fn(*args)
+        return await self.offload.run(fn, *args)
 
     async def run(
-        self, repo: str, pr_number: int
+        self, repo: str, pr_number: int, refresh: bool = False
     ) -> Tuple[PRSummary, PRSummaryMetadata]:
-        get_logger().info(f"Summarizing {repo}#{pr_number}")
+        """
+        Summarize a PR, or load its stored summary.
 
-        pr_summary: PRSummary
-        pr_metadata: PRSummaryMetadata
+        The PR goes through the stages of `self.pipeline`: load from the store, fetch the
+        PR, fetch the diff, preprocess it into a prompt, call the LLM, parse the output
+        and store the summary. Concurrent runs overlap in these stages, and concurrent
+        runs of the same PR share one result. With `settings.single_flight.cross_process_lock`,
+        runs in other processes sharing the store wait for it too.
 
-        # load from store and return the previously saved result
-        df = self.store.load()
-        if df.size > 0 and not df[df["pr_number"] == pr_number].empty:
+        Args:
+            repo (str): The name of the repository.
+            pr_number (int): The pull request number.
+            refresh (bool): Summarize the PR again even if it is stored, e.g. after new
+                commits or review replies. With the memo, only the changed files and
+                comment threads are sent to the LLM.
 
-            if settings.config.strict_load_by_model_provider:
-                df = df[
-                    (df["llm_provider"] == self.llm.__class__.__name__)
-                    & (df["model"] == self.llm.model)
-                ]
+        Returns:
+            Tuple[PRSummary, PRSummaryMetadata]: The summary and its metadata.
+        """
+        with get_tracer().span(
+            "pr_summarizer.run", pr=f"{repo}#{pr_number}"
+        ) as span:
+            # a run of the same PR with the same models is already in progress, e.g. for
+            # another report or webhook event, so share its result
+            key = (repo, pr_number, tuple(self.llm.candidates()), refresh)
+            in_flight = self._in_flight.get(key)
+            if in_flight is not None:
+                get_logger().info(f"Waiting for the run of {repo}#{pr_number} in progress")
+                span.set(coalesced=True)
+                return await asyncio.shield(in_flight)
+
+            future = asyncio.get_running_loop().create_future()
+            # the result is only retrieved if other runs waited for it
+            future.add_done_callback(lambda done: done.cancelled() or done.exception())
+            self._in_flight[key] = future
+            try:
+                lock = (
+                    self.store.pr_lock(repo, pr_number)
+                    if settings.single_flight.cross_process_lock
+                    else contextlib.nullcontext()
+                )
+                async with lock:
+                    job = _PRJob(
+                        repo,
+                        pr_number,
+                        refresh,
+                        span,
+                        asyncio.get_running_loop().create_future(),
+                    )
+                    result = await self.pipeline.submit(job)
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as e:
+                future.set_exception(e)
+                raise
+            else:
+                future.set_result(result)
+            finally:
+                del self._in_flight[key]
+            return result
 
-            df = df[df["created_at"].rank(ascending=False) == 1]
+    @staticmethod
+    def _in_job_span(fn):
+        """Run a stage under the span of the job's run, so its spans and LLM usage are
+        attributed to the run that submitted the job."""
 
-            if not df.empty:
-                loaded_json = json.loads(df.to_json(orient="records"))[0]
-                pr_summary = PRSummary(**loaded_json)
-                pr_metadata = PRSummaryMetadata(**loaded_json)
+        async def stage(job: _PRJob) -> None:
+            with attach(job.span):
+                await fn(job)
+
+        return stage
+
+    async def _load(self, job: _PRJob) -> None:
+        repo, pr_number = job.repo, job.pr_number
+        get_logger().info(f"Summarizing {repo}#{pr_number}")
+
+        # load from store and return the previously saved result
+        candidates = (
+            self.llm.candidates()
+            if settings.config.strict_load_by_model_provider
+            else None
+        )
+        latest = await self.store.aget_latest(repo, pr_number, candidates)
+        if latest is not None:
+            if not job.refresh:
                 get_logger().info(f"Loaded {repo}#{pr_number} from store")
-                return pr_summary, pr_metadata
+                job.span.set(cache_hit=True)
+                job.future.set_result(latest)
+                return
+            job.previous = latest
 
-        pr = await self.git.get_pr(repo, pr_number)
+        job.span.set(cache_hit=False)
 
-        self.variables = {
-            "author": pr.author,
-            "title": pr.title,
-            "description": pr.description,
-            "code": requests.get(pr.diff_url).text,
-            "comments": comments_to_thread(pr.comments),
-            "PRSummary": PRSummary.to_json_schema(),
+    async def _fetch_pr(self, job: _PRJob) -> None:
+        job.pr = await self.git.get_pr(job.repo, job.pr_number)
+
+    async def _fetch_diff(self, job: _PRJob) -> None:
+        job.code = await self.git.get_pr_diff(job.repo, job.pr)
+
+    async def _preprocess(self, job: _PRJob) -> None:
+        """Filter and fingerprint the diff, thread the comments and look up the memo,
+        then render the prompt of what changed, unless the PR needs no LLM call."""
+        tracer = get_tracer()
+        repo, pr = job.repo, job.pr
+
+        if self.diff_filter is not None:
+            with tracer.span("pr_summarizer.filter_diff", bytes=len(job.code)) as filter_span:
+                job.code, report = await self._cpu(self.diff_filter.apply, job.code)
+                filter_span.set(removed_tokens=report.removed_tokens)
+            if report.files:
+                get_logger().info(
+                    f"Filtered ~{report.removed_tokens} tokens from the diff of "
+                    f"{repo}#{pr.number}: "
+                    + ", ".join(f"{path} ({reason})" for path, reason in report.files.items())
+                )
+
+        if self.dedup:
+            with tracer.span("pr_summarizer.fingerprint", bytes=len(job.code)):
+                signature = await self._cpu(self.hasher.signature, job.code)
+            # an empty diff is not fingerprinted, it would match every other empty diff
+            if not self.hasher.is_empty(signature):
+                job.fingerprint = self.hasher.to_hex(signature)
+            # comment threads are specific to a PR, so only PRs without them are reused
+            if job.fingerprint is not None and not pr.comments:
+                reused = await self._reuse_near_duplicate(
+                    signature, job.code, job.fingerprint, repo, pr
+                )
+                if reused is not None:
+                    job.span.set(dedup_hit=True)
+                    job.future.set_result(reused)
+                    return
+
+        job.threads = json.loads(await self._cpu(comments_to_thread, pr.comments))
+        job.files = split_diff_files(job.code)
+        job.file_keys = {name: unit_key(section) for name, section in job.files.items()}
+        job.thread_keys = {
+            thread["parent_thread_id"]: unit_key(json.dumps(thread, sort_keys=True))
+            for thread in job.threads
         }
+        if self.memo is not None:
+            # the memo is SQLite, so its queries run on the store's I/O thread
+            job.cached_files, job.cached_threads = await self.store.run_io(
+                self._memoized, job.file_keys, job.thread_keys
+            )
+        job.span.set(memo_files=len(job.cached_files), memo_threads=len(job.cached_threads))
+        job.changed_files = [name for name in job.files if name not in job.cached_files]
+        job.changed_threads = [
+            thread
+            for thread in job.threads
+            if thread["parent_thread_id"] not in job.cached_threads
+        ]
 
-        environment = Environment(undefined=StrictUndefined)
-        system_prompt = environment.from_string(
-            settings.pr_summary_prompt.system
-        ).render(self.variables)
-        # get_logger().debug(f"system_prompt: \n{system_prompt}")
+        previous = job.previous
+        if previous is not None and not job.changed_files and not job.changed_threads:
+            # nothing changed since the stored summary
+            job.pr_summary = previous[0]
+            job.usage = LLMUsage(
+                provider=previous[1].llm_provider, model=previous[1].model, cost_usd=0.0
+            )
+            return
+
+        job.encoding = settings.prompt_encoding.pr_summary
+        job.prompt = self._render(
+            pr,
+            job.code
+            if not job.partial
+            else "".join(job.files[name] for name in job.changed_files),
+            job.changed_threads if job.partial else job.threads,
+            job.encoding,
+            unchanged=(
+                self._unchanged(job.files, job.changed_files, previous)
+                if job.partial
+                else ""
+            ),
+        )
 
-        user_prompt = environment.from_string(settings.pr_summary_prompt.user).render(
-            self.variables
+    async def _complete(self, job: _PRJob) -> None:
+        """Call the LLM in a thread, so the event loop keeps serving the other stages."""
+        if job.prompt is None:
+            return
+        llm = self.llm if self.budget is None else self.budget.select(self.llm, self.ledger)
+        job.completion, job.usage = await asyncio.to_thread(
+            llm.chat_completion_with_usage, *job.prompt
         )
-        # get_logger().debug(f"user_prompt: \n{user_prompt}")
+        self.ledger.record(job.usage, repo=job.repo, pr_number=job.pr_number)
 
-        summary = self.llm.chat_completion(system_prompt, user_prompt)
-        curated_summary = json_output_curator(summary)
-        # get_logger().debug(f"curated_summary: \n{curated_summary}")
+    async def _parse(self, job: _PRJob) -> None:
+        if job.completion is None:
+            return
+        with get_tracer().span("pr_summarizer.parse", bytes=len(job.completion)):
+            pr_summary = await self._cpu(parse_pr_summary, job.completion)
+        if job.encoding != "json":
+            pr_summary = restore_thread_urls(pr_summary, job.threads)
+        job.pr_summary = pr_summary
+
+    async def _store(self, job: _PRJob) -> None:
+        """Memoize the new units, merge the memoized ones and save the summary."""
+        pr, usage, pr_summary = job.pr, job.usage, job.pr_summary
+        if job.completion is not None and self.memo is not None:
+            await self.store.run_io(
+                self._memoize,
+                pr_summary,
+                {name: job.file_keys[name] for name in job.changed_files},
+                {
+                    thread["parent_thread_id"]: job.thread_keys[thread["parent_thread_id"]]
+                    for thread in job.changed_threads
+                },
+                usage,
+            )
+        if job.cached_files or job.cached_threads:
+            pr_summary = merge_summary(
+                pr_summary,
+                list(job.files),
+                list(job.thread_keys),
+                job.cached_files,
+                job.cached_threads,
+            )
 
-        pr_summary = PRSummary(**json.loads(curated_summary))
         current_time = datetime.now(timezone.utc)
         pr_metadata = PRSummaryMetadata(
-            repo=repo,
+            repo=job.repo,
             author=pr.author,
-            pr_number=pr_number,
-            llm_provider=self.llm.__class__.__name__,
-            model=self.llm.model,
+            pr_number=job.pr_number,
+            llm_provider=usage.provider,
+            model=usage.model,
             pr_created_at=pr.created_at,
             pr_merged_at=pr.merged_at,
             created_at=current_time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            cost_usd=usage.cost_usd,
+            diff_fingerprint=job.fingerprint,
+            **pr_review_metrics(pr),
         )
 
         # save to store for future retrieval
-        self.store.save(pr_summary, pr_metadata)
+        await self.store.asave(pr_summary, pr_metadata)
+        job.future.set_result((pr_summary, pr_metadata))
+
+    def _memoized(
+        self, file_keys: dict[str, str], thread_keys: dict[int, str]
+    ) -> tuple[dict[str, FileDescription], dict[int, CommentThread]]:
+        """The memoized file descriptions and thread summaries of a PR's units."""
+        if self.memo is None:
+            return {}, {}
+        candidates = (
+            self.llm.candidates()
+            if settings.config.strict_load_by_model_provider
+            else None
+        )
+        files = self.memo.get_many("file", file_keys.values(), candidates)
+        threads = self.memo.get_many("thread", thread_keys.values(), candidates)
+        return (
+            {
+                name: FileDescription.model_validate_json(files[key])
+                for name, key in file_keys.items()
+                if key in files
+            },
+            {
+                thread_id: CommentThread.model_validate_json(threads[key])
+                for thread_id, key in thread_keys.items()
+                if key in threads
+            },
+        )
+
+    def _memoize(
+        self,
+        pr_summary: PRSummary,
+        file_keys: dict[str, str],
+        thread_keys: dict[int, str],
+        usage: LLMUsage,
+    ) -> None:
+        """Memoize the descriptions of the given files and threads of a summary."""
+        if self.memo is None:
+            return
+        self.memo.put_many(
+            "file",
+            {
+                file_keys[file.filename]: file.model_dump_json()
+                for file in pr_summary.pr_files
+                if file.filename in file_keys
+            },
+            usage.provider,
+            usage.model,
+        )
+        self.memo.put_many(
+            "thread",
+            {
+                thread_keys[thread.parent_thread_id]: thread.model_dump_json()
+                for thread in pr_summary.comments
+                if thread.parent_thread_id in thread_keys
+            },
+            usage.provider,
+            usage.model,
+        )
+
+    @staticmethod
+    def _unchanged(
+        files: dict[str, str],
+        changed_files: list[str],
+        previous: Tuple[PRSummary, PRSummaryMetadata],
+    ) -> str:
+        """The context of a partial prompt: the previous summary and the files that are
+        already described."""
+        return json.dumps(
+            {
+                "title": previous[0].title,
+                "description": previous[0].description,
+                "pr_files": [name for name in files if name not in changed_files],
+            }
+        )
 
+    def _render(
+        self,
+        pr: PullRequest,
+        code: str,
+        threads: list[dict],
+        encoding: str,
+        unchanged: str = "",
+    ) -> Tuple[str, str]:
+        """
+        Render the system and user prompts of a PR's diff and comment threads.
+        `unchanged` describes the memoized parts of the PR left out of a partial prompt.
+        """
+        variables = {
+            "author": pr.author,
+            "title": pr.title,
+            "description": pr.description,
+            "code": code,
+            "comments": encode_threads(threads, code, encoding),
+            "unchanged": unchanged,
+            "PRSummary": encode_schema(PRSummary.to_json_schema(), encoding),
+        }
+
+        with get_tracer().span("pr_summarizer.render_prompt") as render_span:
+            render_span.set(
+                encoding_saved_tokens=saved_tokens(
+                    encode_threads, threads, code, encoding=encoding
+                )
+                + saved_tokens(encode_schema, PRSummary.to_json_schema(), encoding=encoding)
+            )
+            environment = Environment(undefined=StrictUndefined)
+            system_prompt = environment.from_string(
+                settings.pr_summary_prompt.system
+            ).render(variables)
+            # get_logger().debug(f"system_prompt: \n{system_prompt}")
+
+            user_prompt = environment.from_string(
+                settings.pr_summary_prompt.user
+            ).render(variables)
+            # get_logger().debug(f"user_prompt: \n{user_prompt}")
+            render_span.set(bytes=len(system_prompt) + len(user_prompt))
+        return system_prompt, user_prompt
+
+    async def _reuse_near_duplicate(
+        self,
+        signature: np.ndarray,
+        code: str,
+        fingerprint: str,
+        repo: str,
+        pr: PullRequest,
+    ) -> Tuple[PRSummary, PRSummaryMetadata] | None:
+        """
+        Save and return the adapted summary of the most similar stored diff, if it is
+        at least `settings.dedup.threshold` similar.
+
+        Only the fingerprints are read to find it, then the rows of the matching PR.
+        """
+        try:
+            stored = await self.store.aload_arrow(
+                columns=["repo", "pr_number", "diff_fingerprint"]
+            )
+        except (FileNotFoundError, KeyError):
+            # nothing is stored yet, or only rows saved before diffs were fingerprinted
+            return None
+        if "diff_fingerprint" not in stored.column_names:
+            return None
+        # a refreshed PR is not a duplicate of its own previous diff
+        others = [
+            row
+            for row in stored.to_pylist()
+            if row["repo"] != repo or row["pr_number"] != pr.number
+        ]
+        match = self.hasher.nearest(
+            signature, [row["diff_fingerprint"] for row in others]
+        )
+        if match is None or match[1] < settings.dedup.threshold:
+            return None
+
+        nearest = others[match[0]]
+        rows = (
+            await self.store.aload_arrow(
+                filters=[
+                    ("repo", "==", nearest["repo"]),
+                    ("pr_number", "==", nearest["pr_number"]),
+                    ("diff_fingerprint", "==", nearest["diff_fingerprint"]),
+                ]
+            )
+        ).to_pylist()
+        loaded_json = max(rows, key=lambda row: row["created_at"])
+        source = PRSummaryMetadata(**loaded_json)
+        pr_summary = adapt_summary(PRSummary(**loaded_json), code, pr)
+        pr_metadata = PRSummaryMetadata(
+            repo=repo,
+            author=pr.author,
+            pr_number=pr.number,
+            llm_provider=source.llm_provider,
+            model=source.model,
+            pr_created_at=pr.created_at,
+            pr_merged_at=pr.merged_at,
+            created_at=datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            prompt_tokens=0,
+            completion_tokens=0,
+            cost_usd=0.0,
+            diff_fingerprint=fingerprint,
+            reused_from=f"{source.repo}#{source.pr_number}",
+            **pr_review_metrics(pr),
+        )
+        await self.store.asave(pr_summary, pr_metadata)
+        self.saved_calls += 1
+        get_logger().info(
+            f"Reused the summary of {pr_metadata.reused_from} for {repo}#{pr.number} "
+            f"({match[1]:.0%} similar), {self.saved_calls} LLM calls saved"
+        )
         return pr_summary, pr_metadata
 
 
 if __name__ == "__main__":
-    from perfeed.llms.ollama_client import OllamaClient
-    from perfeed.llms.openai_client import OpenAIClient
-
-    summarizer = PRSummarizer(
-        GithubProvider("Perfeed"),
-        llm=OllamaClient(),
-        # llm=OpenAIClient(),
-        store=FeatherStorage(data_type="pr_summary", overwrite=False, append=True),
-    )
-    pr_summary, pr_metadata = asyncio.run(summarizer.run("perfeed", 13))
-    get_logger().info(f"pr_summary: \n{pr_summary}")
-    get_logger().info(f"f pr_metadata: \n{pr_metadata}")
+    from perfeed.resources import Resources
+
+    async def main() -> None:
+        async with Resources() as resources:
+            summarizer = resources.summarizer("Perfeed", provider="ollama")
+            # summarizer = resources.summarizer("Perfeed", provider="openai")
+            pr_summary, pr_metadata = await summarizer.run("perfeed", 13)
+            get_logger().info(f"pr_summary: \n{pr_summary}")
+            get_logger().info(f"f pr_metadata: \n{pr_metadata}")
+
+    asyncio.run(main())
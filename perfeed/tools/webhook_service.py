@@ -0,0 +1,309 @@
+import asyncio
+import contextlib
+import hashlib
+import hmac
+import json
+from typing import Awaitable, Callable
+
+from perfeed.config_loader import settings
+from perfeed.data_stores.job_queue import JobQueue, JobStatus
+from perfeed.llms.usage import BudgetExceededError
+from perfeed.log import get_logger
+from perfeed.telemetry import get_tracer
+from perfeed.tools.pr_summarizer import PRSummarizer
+
+# the hosts that only accept local connections, the only ones served without a secret
+LOCAL_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+
+class WebhookService:
+    """
+    Pre-summarizes pull requests as soon as they are closed.
+
+    GitHub `pull_request` webhooks, received over HTTP or replayed from a file, are
+    turned into jobs on a durable `JobQueue`. A bounded pool of workers drains the queue
+    through `PRSummarizer`, which persists every result in its store, so the weekly run
+    only needs store lookups plus the roll-up call.
+
+    Once the summarizer's budget stops a job, the job is released back to pending and
+    the workers stop claiming jobs, leaving the rest of the queue to the next run.
+    """
+
+    def __init__(
+        self,
+        summarizer: PRSummarizer,
+        queue: JobQueue,
+        owner: str,
+        num_workers: int | None = None,
+        merged_only: bool | None = None,
+        secret: str | None = None,
+    ):
+        self.summarizer = summarizer
+        self.queue = queue
+        self.owner = owner
+        self.num_workers = num_workers or settings.webhook.num_workers
+        self.merged_only = (
+            settings.webhook.merged_only if merged_only is None else merged_only
+        )
+        self.secret = secret or settings.get("github.webhook_secret")
+
+        self._workers: list[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Condition()
+        self._busy = 0
+        # set once the budget stops a job, after which no more jobs are claimed
+        self.budget_exceeded = False
+
+    def verify_signature(self, body: bytes, signature: str | None) -> bool:
+        """
+        Verify the `X-Hub-Signature-256` header of a webhook delivery.
+
+        Always succeeds when no webhook secret is configured, which is only allowed
+        when the service listens on a local interface.
+        """
+        if not self.secret:
+            return True
+        if not signature:
+            return False
+        expected = hmac.new(self.secret.encode(), body, hashlib.sha256).hexdigest()
+        return hmac.compare_digest(f"sha256={expected}", signature)
+
+    def handle_event(self, event: str, payload: dict) -> bool:
+        """
+        Queue the pull request of a webhook event for summarization.
+
+        Args:
+            event (str): The value of the `X-GitHub-Event` header.
+            payload (dict): The webhook payload.
+
+        Returns:
+            bool: True if a new job was queued.
+        """
+        if event != "pull_request" or payload.get("action") != "closed":
+            return False
+
+        pr = payload["pull_request"]
+        if self.merged_only and not pr.get("merged"):
+            return False
+
+        repository = payload["repository"]
+        if repository["owner"]["login"].lower() != self.owner.lower():
+            get_logger().warning(
+                f"Ignoring webhook for {repository['full_name']}, not owned by {self.owner}"
+            )
+            return False
+
+        # a PR closed again after it was summarized, e.g. reopened for a fix, is
+        # summarized again
+        queued = self.queue.enqueue(repository["name"], pr["number"], requeue=True)
+        if queued:
+            get_logger().info(f"Queued {repository['name']}#{pr['number']}")
+            self._wakeup.set()
+        return queued
+
+    async def replay(self, path: str) -> int:
+        """
+        Queue the events recorded in a file, one JSON object per line.
+
+        Each line is either a raw `pull_request` payload or an object of the form
+        `{"event": "...", "payload": {...}}`.
+
+        Returns:
+            int: The number of new jobs queued.
+        """
+        queued = 0
+        with open(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if "payload" in record:
+                    event, payload = record.get("event", "pull_request"), record["payload"]
+                else:
+                    event, payload = "pull_request", record
+                queued += self.handle_event(event, payload)
+        return queued
+
+    async def _work(self) -> None:
+        # the queue is SQLite, so its calls run in threads
+        queue = self.queue
+        while True:
+            # a claim in flight counts as busy, so `join` cannot return before its job
+            self._busy += 1
+            job = None if self.budget_exceeded else await asyncio.to_thread(queue.claim)
+            if job is None:
+                self._busy -= 1
+                self._wakeup.clear()
+                async with self._idle:
+                    self._idle.notify_all()
+                await self._wakeup.wait()
+                continue
+
+            repo, pr_number = job
+            # outside of a `drain`, each job is a run of its own, whose usage is pruned
+            # from the ledger once it is done, so the ledger of the service does not grow
+            # without limit
+            ledger = self.summarizer.ledger
+            own_run = ledger.current_run_id() is None
+            with get_tracer().span("webhook_service.job", pr=f"{repo}#{pr_number}"):
+                try:
+                    async with queue.keep_leased(repo, pr_number):
+                        stale = await asyncio.to_thread(queue.is_stale, repo, pr_number)
+                        await self.summarizer.run(repo, pr_number, refresh=stale)
+                    await asyncio.to_thread(queue.complete, repo, pr_number)
+                except BudgetExceededError:
+                    # back to pending, so the PR is summarized by the next run
+                    get_logger().warning(
+                        f"Stopped {repo}#{pr_number} at the LLM budget, leaving the "
+                        "remaining jobs queued"
+                    )
+                    await asyncio.to_thread(queue.release, repo, pr_number)
+                    self.budget_exceeded = True
+                except Exception as e:
+                    get_logger().error(f"Failed to summarize {repo}#{pr_number}: {e}")
+                    await asyncio.to_thread(queue.fail, repo, pr_number, repr(e))
+                finally:
+                    self._busy -= 1
+                    if own_run:
+                        ledger.prune(ledger.current_run_id())
+
+    def start(self) -> None:
+        """Start the workers. Jobs left over from a previous process are picked up."""
+        if self._workers:
+            return
+        self._workers = [
+            asyncio.create_task(self._work()) for _ in range(self.num_workers)
+        ]
+        self._wakeup.set()
+
+    async def join(self) -> None:
+        """Wait until every queued job has been processed, or the budget stopped the
+        workers."""
+        async with self._idle:
+            await self._idle.wait_for(
+                lambda: self._busy == 0
+                and (
+                    self.budget_exceeded
+                    or self.queue.counts().get(JobStatus.pending, 0) == 0
+                )
+            )
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def drain(self) -> dict[str, float]:
+        """
+        Process every queued job as one run, then stop the workers.
+
+        The workers are started under a `webhook_service.drain` span, so the jobs share
+        its run and the summarizer's budget limits them together, e.g. the cost of a
+        backfill, instead of each PR.
+
+        Returns:
+            dict[str, float]: The LLM usage of the run.
+        """
+        ledger = self.summarizer.ledger
+        with get_tracer().span("webhook_service.drain") as span:
+            self.start()
+            try:
+                await self.join()
+            finally:
+                await self.stop()
+        return ledger.prune(span.trace_id)
+
+
+def create_app(
+    service: WebhookService, on_shutdown: Callable[[], Awaitable[None]] | None = None
+):
+    """
+    Build a FastAPI app that receives GitHub webhooks at `POST /webhook`.
+
+    The workers run while the app is up. `on_shutdown`, e.g. `Resources.aclose`, is
+    awaited once they are stopped.
+    """
+    from fastapi import FastAPI, HTTPException, Request
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app: FastAPI):
+        service.start()
+        try:
+            yield
+        finally:
+            await service.stop()
+            if on_shutdown is not None:
+                await on_shutdown()
+
+    app = FastAPI(title="Perfeed webhook service", lifespan=lifespan)
+
+    @app.post("/webhook")
+    async def webhook(request: Request) -> dict:
+        body = await request.body()
+        if not service.verify_signature(
+            body, request.headers.get("X-Hub-Signature-256")
+        ):
+            raise HTTPException(status_code=401, detail="Invalid signature")
+        # GitHub also delivers form-encoded payloads, which are not supported
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Expected a JSON payload")
+        if not isinstance(payload, dict):
+            raise HTTPException(status_code=400, detail="Expected a JSON object")
+        queued = service.handle_event(request.headers.get("X-GitHub-Event", ""), payload)
+        return {"queued": queued}
+
+    @app.get("/jobs")
+    async def jobs() -> dict:
+        return {status.value: count for status, count in service.queue.counts().items()}
+
+    @app.get("/metrics")
+    async def metrics():
+        from fastapi.responses import PlainTextResponse
+
+        return PlainTextResponse(
+            get_tracer().to_prometheus(), media_type="text/plain; version=0.0.4"
+        )
+
+    return app
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import uvicorn
+
+    from perfeed.resources import Resources
+
+    parser = argparse.ArgumentParser(description="Pre-summarize closed pull requests.")
+    parser.add_argument("owner", help="the owner of the repositories, e.g. Perfeed")
+    parser.add_argument("--replay", help="replay webhook payloads from a JSON lines file")
+    parser.add_argument(
+        "--host",
+        default=settings.webhook.host,
+        help="the interface to listen on; other than localhost requires a webhook secret",
+    )
+    parser.add_argument("--port", type=int, default=settings.webhook.port)
+    args = parser.parse_args()
+
+    resources = Resources()
+    service = WebhookService(
+        resources.summarizer(args.owner), JobQueue(), owner=args.owner
+    )
+    if not args.replay and not service.secret and args.host not in LOCAL_HOSTS:
+        # unsigned deliveries would let anyone reaching the port queue LLM work
+        parser.error(f"set github.webhook_secret to listen on {args.host}")
+
+    if args.replay:
+
+        async def replay() -> None:
+            async with resources:
+                await service.replay(args.replay)
+                await service.drain()
+
+        asyncio.run(replay())
+    else:
+        app = create_app(service, on_shutdown=resources.aclose)
+        uvicorn.run(app, host=args.host, port=args.port)
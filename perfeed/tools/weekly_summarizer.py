@@ -1,26 +1,143 @@
 import asyncio
 import time
+from collections import defaultdict
 from datetime import datetime, timedelta
 from jinja2 import Environment, StrictUndefined
 from perfeed.config_loader import settings
+from perfeed.data_stores.job_queue import JobQueue, JobStatus
 from perfeed.git_providers.base import BaseGitProvider
-from perfeed.git_providers.github import GithubProvider
 from perfeed.llms.base_client import BaseClient
-from perfeed.llms.ollama_client import OllamaClient
+from perfeed.llms.usage import BudgetExceededError
 from perfeed.log import get_logger
-from perfeed.models.pr_summary import PRSummary
+from perfeed.models.pr_summary import PRSummary, PRSummaryMetadata
+from perfeed.telemetry import get_tracer
 from perfeed.tools.pr_summarizer import PRSummarizer
-from IPython.display import display, Markdown
+from perfeed.utils.prompt_encoding import encode_summaries, saved_tokens
+from perfeed.utils.review_metrics import format_metrics_table, stored_review_metrics
+
+
+def _repos_label(repo_name: str | list[str] | None) -> str:
+    """The repositories of a run in logs, spans and the usage ledger, '*' for all."""
+    if isinstance(repo_name, str):
+        return repo_name
+    return ",".join(repo_name) if repo_name else "*"
 
 
 class WeeklySummarizer:
-    def __init__(self, git: BaseGitProvider, summarizer: PRSummarizer, llm: BaseClient):
+    def __init__(
+        self,
+        git: BaseGitProvider,
+        summarizer: PRSummarizer,
+        llm: BaseClient,
+        queue: JobQueue | None = None,
+    ):
         self.git = git
         self.summarizer = summarizer
         self.llm = llm
+        self.queue = queue
+
+    async def _summarize(self, repo_name: str, pr_number: int):
+        """
+        Summarize a PR, recording its progress in the job queue if there is one.
+
+        PRs whose job already failed are skipped until they are retried. PRs leased by
+        another worker, e.g. the webhook service, are waited for until their job is done,
+        and done PRs are loaded from the summarizer's store. If the other worker dies, its
+        lease expires and the PR is claimed here. The lease of a claimed PR is renewed
+        while it is summarized. PRs stopped by the budget are released back to pending
+        for the next run. The queue is SQLite, so its calls run in threads.
+        """
+        if self.queue is None:
+            return await self.summarizer.run(repo_name, pr_number)
+
+        queue = self.queue
+        await asyncio.to_thread(queue.enqueue, repo_name, pr_number)
+        while not await asyncio.to_thread(queue.claim_job, repo_name, pr_number):
+            status = await asyncio.to_thread(queue.status, repo_name, pr_number)
+            if status == JobStatus.done:
+                return await self.summarizer.run(repo_name, pr_number)
+            if status == JobStatus.failed:
+                raise RuntimeError(f"{repo_name}#{pr_number} is {status.value}")
+            await asyncio.sleep(settings.job_queue.poll_interval)
+
+        try:
+            async with queue.keep_leased(repo_name, pr_number):
+                result = await self.summarizer.run(
+                    repo_name,
+                    pr_number,
+                    refresh=await asyncio.to_thread(queue.is_stale, repo_name, pr_number),
+                )
+        except BudgetExceededError:
+            await asyncio.to_thread(queue.release, repo_name, pr_number)
+            raise
+        except Exception as e:
+            await asyncio.to_thread(queue.fail, repo_name, pr_number, repr(e))
+            raise
+        await asyncio.to_thread(queue.complete, repo_name, pr_number)
+        return result
+
+    def _review_metrics(
+        self, repos: str, summaries: list[tuple[PRSummary, PRSummaryMetadata]]
+    ) -> str:
+        """
+        Tabulate the review metrics saved with the summaries of the PRs, so the roll-up
+        quotes them instead of inferring them, without fetching the PRs again. The metrics
+        are optional, so an empty string is returned if they are disabled or fail.
+        """
+        if not settings.review_metrics.enabled:
+            return ""
+        try:
+            with get_tracer().span(
+                "weekly_summarizer.review_metrics", prs=len(summaries)
+            ):
+                return format_metrics_table(
+                    stored_review_metrics([metadata for _, metadata in summaries])
+                )
+        except Exception as e:
+            get_logger().warning(f"Skipping the review metrics of {repos}: {e!r}")
+            return ""
 
-    async def run(self, users: list[str], repo_name: str, start_of_week: str) -> None:
+    async def run(
+        self,
+        users: list[str],
+        repo_name: str | list[str] | None,
+        start_of_week: str,
+        retry_failed: bool = False,
+    ) -> str:
+        """
+        Summarize the PRs closed by the users in the week and roll them up.
+
+        Args:
+            users (list[str]): The GitHub logins of the authors.
+            repo_name (str | list[str] | None): The name of the repository, the names of
+                several repositories, or None for all the repositories of the owner.
+                Several repositories are searched concurrently with `search_org_prs`.
+            start_of_week (str): The Sunday or Monday the week starts on, as 'YYYY-MM-DD'.
+            retry_failed (bool): Retry the PRs whose job failed in a previous run. Only
+                applies when a job queue is configured.
+
+        Returns:
+            str: The weekly summary in Markdown.
+        """
+        tracer = get_tracer()
+        repos = _repos_label(repo_name)
+        try:
+            with tracer.span("weekly_summarizer.run", repo=repos):
+                return await self._run(users, repo_name, start_of_week, retry_failed)
+        finally:
+            get_logger().info(f"Pipeline stages:\n{tracer.summary_table()}")
+            tracer.export(
+                otlp_path=settings.telemetry.otlp_path,
+                prometheus_path=settings.telemetry.prometheus_path,
+            )
 
+    async def _run(
+        self,
+        users: list[str],
+        repo_name: str | list[str] | None,
+        start_of_week: str,
+        retry_failed: bool,
+    ) -> str:
         # Check if start_of_week must be the Sunday or Monday of the week
         try:
             date = datetime.strptime(start_of_week, "%Y-%m-%d")
@@ -35,73 +152,122 @@ class WeeklySummarizer:
         start_date = date.astimezone()
         end_date = start_date + timedelta(days=6)
 
+        repos = _repos_label(repo_name)
         get_logger().info(
-            f"Summarizing {repo_name} for {users} from {start_date} to {end_date}"
+            f"Summarizing {repos} for {users} from {start_date} to {end_date}"
         )
 
         now = time.perf_counter()
 
-        pr_numbers = await self.git.search_prs(
-            repo_name, start_date, end_date, set(users), closed_only=True
-        )
+        if isinstance(repo_name, str):
+            pr_numbers = await self.git.search_prs(
+                repo_name, start_date, end_date, set(users), closed_only=True
+            )
+            pr_keys = [(repo_name, pr_number) for pr_number in pr_numbers]
+        else:
+            pr_keys = await self.git.search_org_prs(
+                start_date, end_date, set(users), closed_only=True, repos=repo_name
+            )
         # to ensure pr number can be found. if not, double check user id and date
-        assert any(pr_numbers), "no pr number found."
-        get_logger().info(f"Summarizing the following PR-{pr_numbers}")
+        assert any(pr_keys), "no pr number found."
+        get_logger().info(
+            "Summarizing the following PR-"
+            f"{[f'{repo}#{pr_number}' for repo, pr_number in pr_keys]}"
+        )
 
-        # TODO: load the PR summaries from the pervious batch if exists.
+        if self.queue is not None and retry_failed:
+            by_repo = defaultdict(list)
+            for repo, pr_number in pr_keys:
+                by_repo[repo].append(pr_number)
+            retried = 0
+            for repo, pr_numbers in by_repo.items():
+                retried += await asyncio.to_thread(
+                    self.queue.retry_failed, repo, pr_numbers
+                )
+            get_logger().info(f"Retrying {retried} failed PRs")
 
         summary_objects_futures = [
-            self.summarizer.run(repo_name, pr_number) for pr_number in pr_numbers
+            self._summarize(repo, pr_number) for repo, pr_number in pr_keys
         ]
 
         resolved_summaries = await asyncio.gather(
             *summary_objects_futures, return_exceptions=True
         )
-        summaries = [resolved_summary[0] for resolved_summary in resolved_summaries if not isinstance(resolved_summary, BaseException)]
+        summaries = []
+        over_budget = 0
+        for (repo, pr_number), resolved_summary in zip(pr_keys, resolved_summaries):
+            if isinstance(resolved_summary, BudgetExceededError):
+                over_budget += 1
+            elif isinstance(resolved_summary, BaseException):
+                get_logger().error(f"Skipping {repo}#{pr_number}: {resolved_summary!r}")
+            else:
+                summaries.append(resolved_summary)
 
         elapsed = time.perf_counter() - now
         get_logger().info(f"Summarized {len(summaries)} PRs in {elapsed:0.5f} seconds")
+        if over_budget:
+            get_logger().warning(
+                f"Stopped {over_budget} PRs of {repos} at the LLM budget"
+            )
+        if len(summaries) < len(pr_keys) and self.queue is not None:
+            get_logger().warning(
+                f"{len(pr_keys) - len(summaries)} PRs were not summarized, "
+                "run again with retry_failed=True to retry them"
+            )
 
-        # TODO: store PRSummary results so we don't have to re-process again
-
-        # TODO: handle failed summary futures with BaseException
-        json_summaries = [
-            summary.model_dump_json()
-            for summary in summaries
-            if not isinstance(summary, BaseException)
-        ]
+        encoding = settings.prompt_encoding.weekly_summary
         self.variables = {
             "PRSummary": PRSummary.to_json_schema(),
-            "pr_summaries": json_summaries,
+            "pr_summaries": encode_summaries(summaries, encoding),
+            "compact": encoding == "compact",
+            "review_metrics": self._review_metrics(repos, summaries),
         }
 
-        environment = Environment(undefined=StrictUndefined)
-        system_prompt = environment.from_string(
-            settings.weekly_summary_prompt.system
-        ).render(self.variables)
-        user_prompt = environment.from_string(
-            settings.weekly_summary_prompt.user
-        ).render(self.variables)
-        summary = self.llm.chat_completion(system_prompt, user_prompt)
-        display(Markdown(summary))
+        with get_tracer().span(
+            "weekly_summarizer.rollup",
+            prs=len(summaries),
+            encoding_saved_tokens=saved_tokens(
+                encode_summaries, summaries, encoding=encoding
+            ),
+        ):
+            environment = Environment(undefined=StrictUndefined)
+            system_prompt = environment.from_string(
+                settings.weekly_summary_prompt.system
+            ).render(self.variables)
+            user_prompt = environment.from_string(
+                settings.weekly_summary_prompt.user
+            ).render(self.variables)
+            # the roll-up is always made so the PRs summarized so far are reported,
+            # with the fallback model if the budget is exceeded
+            ledger, budget = self.summarizer.ledger, self.summarizer.budget
+            llm = self.llm
+            if budget is not None and budget.exceeded(ledger):
+                llm = budget.fallback or self.llm
+            summary, usage = llm.chat_completion_with_usage(system_prompt, user_prompt)
+            ledger.record(usage, repo=repos)
+
+        run_usage = ledger.aggregate(by=("run_id", "repo", "model"))
+        run_usage = run_usage[run_usage["run_id"] == ledger.current_run_id()]
+        get_logger().info(
+            f"LLM usage:\n{run_usage.drop(columns='run_id').to_string(index=False)}"
+        )
+        ledger.prune(ledger.current_run_id())
+        return summary
 
 
 if __name__ == "__main__":
-    from perfeed.data_stores.storage_feather import FeatherStorage
-
-    git = GithubProvider("Perfeed")
-    llm = OllamaClient()
-    store = FeatherStorage(data_type="pr_summary", overwrite=False, append=True)
-    summarizer = PRSummarizer(
-        git=git,
-        llm=llm,
-        store=store
-    )
-    weekly_summarizer = WeeklySummarizer(git=git, summarizer=summarizer, llm=llm)
-    asyncio.run(
-        weekly_summarizer.run(
-            users=["jzxcd"],
-            repo_name="perfeed",
-            start_of_week="2024-10-21",
-        )
-    )
+    from perfeed.resources import Resources
+
+    async def main() -> str:
+        async with Resources() as resources:
+            summarizer = resources.summarizer("Perfeed")
+            weekly_summarizer = WeeklySummarizer(
+                git=summarizer.git, summarizer=summarizer, llm=summarizer.llm
+            )
+            return await weekly_summarizer.run(
+                users=["jzxcd"],
+                repo_name="perfeed",
+                start_of_week="2024-10-21",
+            )
+
+    print(asyncio.run(main()))
@@ -1,2 +1,2 @@
-__all__ = ['json_output_curator', 'count_tokens']
+__all__ = ['json_output_curator', 'count_tokens', 'approx_tokens']
 from .utils import *
@@ -0,0 +1,142 @@
+import asyncio
+import gzip
+import json
+import threading
+import time
+from collections import defaultdict
+from typing import Any
+from urllib.error import HTTPError
+
+MODES = ("record", "replay")
+
+
+def request_key(*parts: Any) -> str:
+    """The key of a request made of `parts`, e.g. an endpoint and its arguments, that
+    is the same for equal requests across runs."""
+    return json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+
+
+class Cassette:
+    """
+    Records GitHub responses and LLM completions to a gzipped JSON lines file, and replays
+    them offline.
+
+    An entry is a request's kind, e.g. 'github' or 'llm', its key, the response and how
+    long the request took. Replayed requests are matched by kind and key, and requests
+    made several times get their recorded responses in order, the last one repeating.
+    Each replayed response waits the recorded time multiplied by `latency_scale`, so a
+    run keeps the original latency, or e.g. a tenth of it with 0.1, or none with 0.
+
+    Replays are deterministic, as the responses of a request are returned in the same
+    order whatever the order of the requests. Saving is too: entries are sorted by kind
+    and key, and the gzip header has no timestamp, so the same entries write the same
+    bytes.
+
+    Args:
+        path (str): The cassette file, e.g. 'weekly.jsonl.gz'.
+        mode (str): 'record' or 'replay'.
+        latency_scale (float): The factor of the recorded latency waited on replay.
+    """
+
+    def __init__(self, path: str, mode: str = "replay", latency_scale: float = 1.0):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode {mode!r}, expected one of {MODES}")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self._entries: dict[tuple[str, str], list[dict]] = defaultdict(list)
+        self._played: dict[tuple[str, str], int] = defaultdict(int)
+        if self.replaying:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self._entries[(entry["kind"], entry["key"])].append(entry)
+
+    def __enter__(self) -> "Cassette":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.save()
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def record(
+        self,
+        kind: str,
+        key: str,
+        response: Any,
+        elapsed: float,
+        error: HTTPError | None = None,
+    ) -> None:
+        """
+        Record the response of a request.
+
+        Args:
+            kind (str): The kind of request, e.g. 'github'.
+            key (str): The key of the request, from `request_key`.
+            response (Any): The JSON-serializable response. Lists and tuples are saved
+                as JSON arrays.
+            elapsed (float): The seconds the request took.
+            error (HTTPError | None): The HTTP error the request failed with, which is
+                raised again on replay.
+        """
+        entry = {"kind": kind, "key": key, "elapsed": round(elapsed, 6)}
+        if error is not None:
+            entry["error"] = {"code": error.code, "reason": str(error.reason)}
+        else:
+            # a copy, so later changes to the response are not recorded
+            entry["response"] = json.loads(json.dumps(response, default=list))
+        with self._lock:
+            self._entries[(kind, key)].append(entry)
+
+    def replay(self, kind: str, key: str) -> Any:
+        """
+        Wait the scaled latency of a recorded request in the current thread, then return
+        its response.
+
+        Raises:
+            KeyError: If the request was not recorded.
+            HTTPError: If the recorded request failed with an HTTP error.
+        """
+        entry = self._next(kind, key)
+        time.sleep(entry["elapsed"] * self.latency_scale)
+        return self._response(entry)
+
+    async def areplay(self, kind: str, key: str) -> Any:
+        """`replay` that waits without blocking the event loop."""
+        entry = self._next(kind, key)
+        await asyncio.sleep(entry["elapsed"] * self.latency_scale)
+        return self._response(entry)
+
+    def _next(self, kind: str, key: str) -> dict:
+        with self._lock:
+            entries = self._entries.get((kind, key))
+            if not entries:
+                raise KeyError(f"No {kind} request {key[:200]} in {self.path}")
+            played = self._played[(kind, key)]
+            self._played[(kind, key)] = played + 1
+            return entries[min(played, len(entries) - 1)]
+
+    @staticmethod
+    def _response(entry: dict) -> Any:
+        if "error" in entry:
+            error = entry["error"]
+            raise HTTPError(entry["key"], error["code"], error["reason"], None, None)  # type: ignore[arg-type]
+        return entry["response"]
+
+    def save(self) -> None:
+        """Write the recorded entries to the cassette file. Replaying cassettes are not
+        written."""
+        if self.replaying:
+            return
+        with self._lock:
+            entries = [self._entries[key] for key in sorted(self._entries)]
+        with open(self.path, "wb") as f:
+            with gzip.GzipFile(filename="", mode="wb", fileobj=f, mtime=0) as gz:
+                for same_key in entries:
+                    for entry in same_key:
+                        line = json.dumps(entry, sort_keys=True)
+                        gz.write(line.encode() + b"\n")
@@ -0,0 +1,224 @@
+import re
+from dataclasses import dataclass, field
+from fnmatch import fnmatch
+from typing import Iterable, Iterator
+
+from perfeed.utils.utils import approx_tokens
+
+_FILE_HEADER = re.compile(r"^diff --git a/(\S+) b/(\S+)")
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,\d+)? \+(\d+)(?:,\d+)? @@")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@dataclass
+class DiffFilterReport:
+    """What a `DiffFilter` removed from a diff."""
+
+    removed_bytes: int = 0
+    removed_tokens: int = 0
+    files: dict[str, str] = field(default_factory=dict)
+
+    def add(self, path: str, reason: str, removed: Iterable[str]) -> None:
+        text = "".join(removed)
+        self.removed_bytes += len(text)
+        self.removed_tokens += approx_tokens(text)
+        self.files[path] = reason
+
+
+class DiffFilter:
+    """
+    Removes noise from a unified diff before it is prompted.
+
+    Per file, in order:
+    - files matching an `exclude` glob, e.g. lockfiles or vendored code, are omitted;
+    - generated files, detected linguist-style by a marker such as `@generated` near
+      the top of the file or by minified lines, are omitted;
+    - pure renames are reduced to their header;
+    - changes to cell outputs and execution counts of notebooks are stripped;
+    - hunks that only change whitespace are collapsed.
+
+    Omitted files keep their `diff --git` header plus a note, so the model still knows
+    they changed. The diff is processed one file at a time, so it can be streamed from
+    an iterable of lines.
+    """
+
+    def __init__(
+        self,
+        exclude: list[str] | None = None,
+        generated_markers: list[str] | None = None,
+        max_line_length: int = 1000,
+        strip_notebook_outputs: bool = True,
+        collapse_whitespace_hunks: bool = True,
+    ):
+        """
+        Args:
+            exclude (list[str] | None): Globs matched against the path and the file name.
+            generated_markers (list[str] | None): Strings marking a generated file when
+                they appear in its first lines.
+            max_line_length (int): Files with a longer changed line count as minified.
+            strip_notebook_outputs (bool): Strip the outputs of `.ipynb` cells.
+            collapse_whitespace_hunks (bool): Collapse hunks that only change whitespace.
+        """
+        self.exclude = exclude or []
+        self.generated_markers = generated_markers or []
+        self.max_line_length = max_line_length
+        self.strip_notebook_outputs = strip_notebook_outputs
+        self.collapse_whitespace_hunks = collapse_whitespace_hunks
+
+    @classmethod
+    def from_settings(cls) -> "DiffFilter":
+        from perfeed.config_loader import settings
+
+        config = settings.diff_filter
+        return cls(
+            exclude=list(config.exclude),
+            generated_markers=list(config.generated_markers),
+            max_line_length=config.max_line_length,
+            strip_notebook_outputs=config.strip_notebook_outputs,
+            collapse_whitespace_hunks=config.collapse_whitespace_hunks,
+        )
+
+    def apply(self, diff: str) -> tuple[str, DiffFilterReport]:
+        """
+        Filter a diff.
+
+        Returns:
+            tuple[str, DiffFilterReport]: The filtered diff and what was removed.
+        """
+        report = DiffFilterReport()
+        filtered = "".join(self.stream(diff.splitlines(keepends=True), report))
+        return filtered, report
+
+    def stream(self, lines: Iterable[str], report: DiffFilterReport) -> Iterator[str]:
+        """Filter the lines of a diff, yielding the kept lines and recording the rest in
+        `report`. Lines must keep their line endings."""
+        section: list[str] = []
+        for line in lines:
+            if line.startswith("diff --git ") and section:
+                yield from self._filter_file(section, report)
+                section = []
+            section.append(line)
+        if section:
+            yield from self._filter_file(section, report)
+
+    def _filter_file(self, section: list[str], report: DiffFilterReport) -> list[str]:
+        match = _FILE_HEADER.match(section[0])
+        if match is None:
+            return section
+        path = match[2]
+        header, hunks = self._split_hunks(section)
+
+        reason = self._omit_reason(path, header, hunks)
+        if reason is not None:
+            changed = sum(
+                line.startswith(("+", "-")) for hunk in hunks for line in hunk[1:]
+            )
+            note = f"[{changed} changed lines omitted, {reason} file]\n"
+            report.add(path, reason, section[1:])
+            return [section[0], note]
+
+        if not hunks and any(line.startswith("rename from ") for line in header):
+            kept = [line for line in header if line.startswith(("diff --git", "rename "))]
+            if len(kept) < len(header):
+                report.add(path, "rename", [l for l in header if l not in kept])
+            return kept
+
+        kept = list(header)
+        for hunk in hunks:
+            if path.endswith(".ipynb") and self.strip_notebook_outputs:
+                hunk = self._strip_notebook_outputs(path, hunk, report)
+            if self.collapse_whitespace_hunks and self._whitespace_only(hunk):
+                report.add(path, "whitespace", hunk[1:])
+                kept.extend([hunk[0], "[whitespace-only changes omitted]\n"])
+            elif len(hunk) > 1:
+                kept.extend(hunk)
+        return kept
+
+    @staticmethod
+    def _split_hunks(section: list[str]) -> tuple[list[str], list[list[str]]]:
+        header: list[str] = []
+        hunks: list[list[str]] = []
+        for line in section:
+            if line.startswith("@@"):
+                hunks.append([line])
+            elif hunks:
+                hunks[-1].append(line)
+            else:
+                header.append(line)
+        return header, hunks
+
+    def _omit_reason(
+        self, path: str, header: list[str], hunks: list[list[str]]
+    ) -> str | None:
+        name = path.rsplit("/", 1)[-1]
+        if any(fnmatch(path, glob) or fnmatch(name, glob) for glob in self.exclude):
+            return "excluded"
+        if any(line.startswith("Binary files ") for line in header):
+            return "binary"
+        for hunk in hunks:
+            match = _HUNK_HEADER.match(hunk[0])
+            # markers are only looked for at the top of a file
+            if match and min(int(match[1]), int(match[2])) <= 1:
+                top = "".join(hunk[1:6])
+                if any(marker in top for marker in self.generated_markers):
+                    return "generated"
+            if any(
+                len(line) > self.max_line_length
+                for line in hunk[1:]
+                if line.startswith(("+", "-"))
+            ):
+                return "minified"
+        return None
+
+    @staticmethod
+    def _whitespace_only(hunk: list[str]) -> bool:
+        removed = [
+            _WHITESPACE.sub("", line[1:])
+            for line in hunk[1:]
+            if line.startswith("-")
+        ]
+        added = [
+            _WHITESPACE.sub("", line[1:])
+            for line in hunk[1:]
+            if line.startswith("+")
+        ]
+        if not removed and not added:
+            return False
+        return [l for l in removed if l] == [l for l in added if l]
+
+    @staticmethod
+    def _strip_notebook_outputs(
+        path: str, hunk: list[str], report: DiffFilterReport
+    ) -> list[str]:
+        """Drop the changed lines inside `"outputs": [...]` and `"execution_count"`
+        changes. The bracket depth is tracked over the old and new versions separately."""
+        kept = [hunk[0]]
+        removed = []
+        depth = {"-": 0, "+": 0}
+        for line in hunk[1:]:
+            sides = ("-", "+") if line.startswith(" ") else (line[:1],)
+            content = line[1:].strip()
+            inside = any(depth.get(side, 0) > 0 for side in sides)
+            if not inside and content.startswith('"outputs": [') and not content.startswith(
+                '"outputs": []'
+            ):
+                inside = True
+            if inside:
+                for side in sides:
+                    if side in depth:
+                        depth[side] = max(
+                            0, depth[side] + content.count("[") - content.count("]")
+                        )
+                if line.startswith(("+", "-")):
+                    removed.append(line)
+                    continue
+            elif line.startswith(("+", "-")) and content.startswith('"execution_count"'):
+                removed.append(line)
+                continue
+            kept.append(line)
+        if removed:
+            report.add(path, "notebook outputs", removed)
+        if all(not line.startswith(("+", "-")) for line in kept[1:]):
+            # nothing but outputs changed, so the hunk is dropped
+            return [hunk[0]]
+        return kept
@@ -0,0 +1,125 @@
+import hashlib
+import re
+
+import numpy as np
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_HEX_DIGEST = re.compile(r"\b[0-9a-f]{7,}\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def diff_shingles(diff: str, size: int = 5) -> set[str]:
+    """
+    Normalize the hunks of a unified diff into word shingles.
+
+    Only the changed lines are kept, with whitespace collapsed and hex digests such as
+    commit SHAs or lockfile hashes masked, so diffs that differ only in those compare
+    as equal. File headers contribute the base name of each changed file.
+
+    Args:
+        diff (str): The unified diff.
+        size (int): The number of words per shingle.
+
+    Returns:
+        set[str]: The shingles of the diff.
+    """
+    words = []
+    for line in diff.splitlines():
+        if line.startswith("diff --git "):
+            words.append("file:" + line.rsplit("/", 1)[-1])
+        elif line.startswith(("+++", "---")) or not line.startswith(("+", "-")):
+            continue
+        else:
+            normalized = _HEX_DIGEST.sub("<hash>", _WHITESPACE.sub(" ", line[1:].strip()))
+            words.extend(f"{line[0]}{word}" for word in normalized.split(" ") if word)
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+class MinHasher:
+    """
+    MinHash signatures of diffs, to estimate the Jaccard similarity of their shingles.
+
+    Signatures are arrays of `num_perm` 32-bit minimum hashes; the fraction of equal
+    positions between two signatures estimates the similarity of the diffs.
+    """
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.a = rng.integers(1, _MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, _MERSENNE_PRIME, num_perm, dtype=np.uint64)
+
+    def signature(self, diff: str, chunk_size: int = 4096) -> np.ndarray:
+        """The MinHash signature of a diff. An empty diff has an all-max signature,
+        see `is_empty`."""
+        shingles = diff_shingles(diff, self.shingle_size)
+        signature = np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        hashes = np.fromiter(
+            (
+                int.from_bytes(hashlib.blake2b(s.encode(), digest_size=4).digest(), "little")
+                for s in shingles
+            ),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        # the products wrap around in uint64, which keeps them well mixed
+        with np.errstate(over="ignore"):
+            for i in range(0, len(hashes), chunk_size):
+                permuted = (
+                    np.outer(hashes[i : i + chunk_size], self.a) + self.b
+                ) % _MERSENNE_PRIME & _MAX_HASH
+                signature = np.minimum(signature, permuted.min(axis=0))
+        return signature.astype(np.uint32)
+
+    @staticmethod
+    def is_empty(signature: np.ndarray) -> bool:
+        """Whether a signature is the one of a diff without shingles, which would match
+        every other empty diff."""
+        return bool((signature == _MAX_HASH).all())
+
+    @staticmethod
+    def similarity(a: np.ndarray, b: np.ndarray) -> float:
+        return float(np.mean(a == b))
+
+    @staticmethod
+    def to_hex(signature: np.ndarray) -> str:
+        return signature.astype("<u4").tobytes().hex()
+
+    @staticmethod
+    def from_hex(fingerprint: str) -> np.ndarray:
+        return np.frombuffer(bytes.fromhex(fingerprint), dtype="<u4")
+
+    def nearest(
+        self, signature: np.ndarray, fingerprints: list[str]
+    ) -> tuple[int, float] | None:
+        """
+        Find the most similar of the stored fingerprints.
+
+        Args:
+            signature (np.ndarray): The signature to look up.
+            fingerprints (list[str]): Hex fingerprints, as stored in the metadata.
+
+        Returns:
+            tuple[int, float] | None: The position of the most similar fingerprint and
+            its similarity, or None if none has this signature's length. Fingerprints
+            of empty diffs are skipped.
+        """
+        candidates = [
+            (i, fingerprint)
+            for i, fingerprint in enumerate(fingerprints)
+            if isinstance(fingerprint, str) and len(fingerprint) == self.num_perm * 8
+        ]
+        if not candidates:
+            return None
+        matrix = np.stack([self.from_hex(fingerprint) for _, fingerprint in candidates])
+        similarities = (matrix == signature).mean(axis=1)
+        # empty diffs all share one signature, so they are not near-duplicates
+        similarities[(matrix == _MAX_HASH).all(axis=1)] = -1
+        best = int(similarities.argmax())
+        if similarities[best] < 0:
+            return None
+        return candidates[best][0], float(similarities[best])
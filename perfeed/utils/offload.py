@@ -0,0 +1,83 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable
+
+
+def _run_batch(calls: list[tuple[Callable, tuple]]) -> list[tuple[bool, Any]]:
+    results = []
+    for fn, args in calls:
+        try:
+            results.append((True, fn(*args)))
+        except Exception as e:
+            results.append((False, e))
+    return results
+
+
+class BatchedProcessPool:
+    """
+    Runs CPU-bound functions in a `ProcessPoolExecutor` so the event loop keeps doing I/O.
+
+    Calls are collected into batches of up to `batch_size`, or whatever arrived within
+    `max_delay` seconds, and each batch is handed to a worker process in one round trip.
+    Functions and their arguments must be picklable, i.e. defined at module level.
+    """
+
+    def __init__(
+        self,
+        max_workers: int | None = None,
+        batch_size: int = 32,
+        max_delay: float = 0.005,
+    ):
+        self.executor = ProcessPoolExecutor(max_workers=max_workers)
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self._pending: list[tuple[Callable, tuple, asyncio.Future]] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """
+        Run `fn(*args)` in a worker process and return its result.
+
+        Exceptions raised by `fn` are re-raised in the caller.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((fn, args, future))
+
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_delay, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, []
+        calls = [(fn, args) for fn, args, _ in batch]
+        futures = [future for _, _, future in batch]
+        batch_future = asyncio.wrap_future(self.executor.submit(_run_batch, calls))
+        batch_future.add_done_callback(lambda done: self._resolve(done, futures))
+
+    @staticmethod
+    def _resolve(done: asyncio.Future, futures: list[asyncio.Future]) -> None:
+        if done.exception() is not None:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(done.exception())
+            return
+
+        for future, (ok, value) in zip(futures, done.result()):
+            if future.done():
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=True, cancel_futures=True)
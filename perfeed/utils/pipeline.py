@@ -0,0 +1,85 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+
+@dataclass
+class Stage:
+    """
+    A step of a `Pipeline`.
+
+    `fn` works on a job in place. It finishes a job early by resolving the job's
+    `future`, in which case the job skips the remaining stages.
+    """
+
+    name: str
+    fn: Callable[[Any], Awaitable[None]]
+    workers: int = 1
+
+
+class Pipeline:
+    """
+    Runs jobs through stages connected by bounded `asyncio.Queue`s.
+
+    Each stage has its own workers, so a slow stage such as an LLM call keeps working on
+    some jobs while the I/O stages before it already fetch the next ones. A full queue
+    blocks the stage feeding it, which bounds the jobs in flight to roughly the queue
+    sizes plus the workers.
+
+    A job is any object with a `future` attribute, resolved by the last stage or by an
+    earlier one that finishes the job. An exception raised by a stage is set on the
+    job's future. Workers are started on first use in the running event loop, and again
+    if a later call runs in another loop.
+    """
+
+    def __init__(self, stages: list[Stage], queue_size: int = 8):
+        self.stages = stages
+        self.queue_size = queue_size
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._queues: list[asyncio.Queue] = []
+        self._workers: list[asyncio.Task] = []
+
+    def _start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._queues = [asyncio.Queue(self.queue_size) for _ in self.stages]
+        self._workers = [
+            asyncio.create_task(self._work(i), name=f"pipeline.{stage.name}.{n}")
+            for i, stage in enumerate(self.stages)
+            for n in range(stage.workers)
+        ]
+
+    async def _work(self, i: int) -> None:
+        stage, inbox = self.stages[i], self._queues[i]
+        outbox = self._queues[i + 1] if i + 1 < len(self._queues) else None
+        while True:
+            job = await inbox.get()
+            try:
+                if not job.future.done():
+                    await stage.fn(job)
+            except Exception as e:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            finally:
+                inbox.task_done()
+            if job.future.done():
+                continue
+            if outbox is None:
+                job.future.set_exception(
+                    RuntimeError(f"Stage {stage.name} did not finish the job")
+                )
+            else:
+                await outbox.put(job)
+
+    async def submit(self, job: Any) -> Any:
+        """Run a job through the stages and return the result of its future."""
+        if self._loop is not asyncio.get_running_loop():
+            self._start()
+        await self._queues[0].put(job)
+        return await job.future
+
+    def close(self) -> None:
+        """Cancel the workers."""
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+        self._loop = None
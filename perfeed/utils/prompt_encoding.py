@@ -0,0 +1,142 @@
+"""
+Serialization of the variable parts of prompts.
+
+The "json" encoding is the original one. The "compact" encoding writes the same facts
+as terse text: comment threads are one line per message, diff hunks that are already in
+the PR's diff are referenced by their header instead of repeated, URLs are left out and
+restored from the thread ids after parsing, and the PR summaries of a weekly roll-up
+are short tables instead of JSON.
+"""
+
+import json
+from typing import Callable
+
+from perfeed.models.pr_summary import PRSummary, PRSummaryMetadata
+from perfeed.utils.utils import approx_tokens
+
+ENCODINGS = ("json", "compact")
+
+
+def _check(encoding: str) -> None:
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown prompt encoding {encoding!r}, expected one of {ENCODINGS}")
+
+
+def _one_line(text: str | None) -> str:
+    return (text or "").strip().replace("\r\n", "\n").replace("\n", "\\n")
+
+
+def _hunk_reference(hunk: str, diff: str) -> str:
+    """Reference a review comment's hunk by its header if the diff contains it, with
+    the commented line, which is the last line of the hunk."""
+    lines = hunk.strip("\n").split("\n")
+    if len(lines) > 1 and lines[0].startswith("@@") and "\n".join(lines) in diff:
+        return f"diff {lines[0].split(' @@')[0]} @@, on: {lines[-1]}"
+    return "\n    ".join(lines)
+
+
+def encode_schema(schema: str, encoding: str = "json") -> str:
+    """The JSON schema of the output, minified by the compact encoding."""
+    _check(encoding)
+    if encoding == "json":
+        return schema
+    return json.dumps(json.loads(schema), separators=(",", ":"))
+
+
+def encode_threads(threads: list[dict], diff: str = "", encoding: str = "json") -> str:
+    """
+    Serialize the comment threads of `comments_to_thread` for the PR summary prompt.
+
+    Args:
+        threads (list[dict]): The threads.
+        diff (str): The diff in the same prompt, which hunks are referenced against.
+        encoding (str): 'json' or 'compact'.
+
+    Returns:
+        str: The serialized threads.
+    """
+    _check(encoding)
+    if encoding == "json":
+        return json.dumps(threads)
+    lines = []
+    for thread in threads:
+        head = f"parent_thread_id={thread['parent_thread_id']}"
+        if thread["child_thread_ids"]:
+            head += " child_thread_ids=" + ",".join(map(str, thread["child_thread_ids"]))
+        head += f" code_change={'yes' if thread['code_change'] else 'no'}"
+        lines.append(head)
+        if thread.get("diff_hunk"):
+            lines.append("  hunk: " + _hunk_reference(thread["diff_hunk"], diff))
+        for message in thread["content"]:
+            lines.append(
+                f"  {message['user']} {(message['created_at'] or '')[:16]}: "
+                f"{_one_line(message['body'])}"
+            )
+    return "\n".join(lines)
+
+
+def restore_thread_urls(pr_summary: PRSummary, threads: list[dict]) -> PRSummary:
+    """Set the URL of each summarized thread from the fetched threads, since the
+    compact encoding leaves them out of the prompt."""
+    urls = {thread["parent_thread_id"]: thread["html_url"] for thread in threads}
+    comments = [
+        thread.model_copy(update={"html_url": urls[thread.parent_thread_id]})
+        if urls.get(thread.parent_thread_id)
+        else thread
+        for thread in pr_summary.comments
+    ]
+    return pr_summary.model_copy(update={"comments": comments})
+
+
+def encode_summaries(
+    summaries: list[tuple[PRSummary, PRSummaryMetadata]], encoding: str = "json"
+) -> str:
+    """
+    Serialize the PR summaries of a weekly roll-up.
+
+    Args:
+        summaries (list[tuple[PRSummary, PRSummaryMetadata]]): The summaries and their
+            metadata.
+        encoding (str): 'json' or 'compact'.
+
+    Returns:
+        str: The serialized summaries.
+    """
+    _check(encoding)
+    if encoding == "json":
+        return str([pr_summary.model_dump_json() for pr_summary, _ in summaries])
+    # the summaries of a run over several repositories name the repository of each PR
+    with_repo = len({pr_metadata.repo for _, pr_metadata in summaries}) > 1
+    blocks = []
+    for pr_summary, pr_metadata in summaries:
+        types = ", ".join(pr_type.value for pr_type in pr_summary.type)
+        repo = pr_metadata.repo if with_repo else ""
+        lines = [
+            f"PR {repo}#{pr_metadata.pr_number} by {pr_metadata.author} [{types}]: "
+            f"{_one_line(pr_summary.title)}",
+            _one_line(pr_summary.description),
+        ]
+        if pr_summary.pr_files:
+            lines.append("files (filename | label | changes):")
+            lines.extend(
+                f"- {file.filename} | {file.label} | {_one_line(file.changes_summary)}"
+                for file in pr_summary.pr_files
+            )
+        if pr_summary.comments:
+            lines.append("threads (users | lead_to_action | summary | details):")
+            lines.extend(
+                f"- {', '.join(thread.users)} | {thread.lead_to_action} | "
+                f"{_one_line(thread.summary)} | {_one_line(thread.details)}"
+                for thread in pr_summary.comments
+            )
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
+
+
+def saved_tokens(encode: Callable[..., str], *args, encoding: str) -> int:
+    """The estimated tokens an encoding saves over the JSON encoding of the same data."""
+    if encoding == "json":
+        return 0
+    return approx_tokens(encode(*args, encoding="json")) - approx_tokens(
+        encode(*args, encoding=encoding)
+    )
@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+
+from perfeed.models.git_provider import PullRequest
+from perfeed.models.pr_summary import PRSummaryMetadata
+
+_HOUR = pd.Timedelta(hours=1)
+# the metrics saved in the metadata of a PR's summary, which the weekly summary reads
+STORED_METRICS = [
+    "time_to_first_review_h",
+    "review_rounds",
+    "comments_per_100_lines",
+    "cycle_time_h",
+]
+
+
+def _timestamps(values: list[str | None]) -> pd.Series:
+    return pd.Series(pd.to_datetime(values, utc=True, errors="coerce"))
+
+
+def pr_frame(prs: list[PullRequest]) -> pd.DataFrame:
+    """
+    One row per PR, with its timestamps parsed and its diff size split into additions
+    and deletions. Rows are indexed by the position of the PR in `prs`.
+    """
+    changes = (
+        pd.Series([pr.diff_lines for pr in prs], dtype=object)
+        .str.extract(r"\+(\d+)\s+-(\d+)")
+        .astype(float)
+    )
+    return pd.DataFrame(
+        {
+            "number": np.array([pr.number for pr in prs], dtype=np.int64),
+            "author": [pr.author for pr in prs],
+            "reviewers": np.array([len(pr.reviewers) for pr in prs], dtype=np.int64),
+            "created_at": _timestamps([pr.created_at for pr in prs]),
+            "first_committed_at": _timestamps([pr.first_committed_at for pr in prs]),
+            "merged_at": _timestamps([pr.merged_at for pr in prs]),
+            "additions": changes[0],
+            "deletions": changes[1],
+        }
+    )
+
+
+def comment_frame(prs: list[PullRequest]) -> pd.DataFrame:
+    """One row per comment of the PRs, with the position of its PR in `pr`."""
+    rows = [(i, comment) for i, pr in enumerate(prs) for comment in pr.comments]
+    return pd.DataFrame(
+        {
+            "pr": np.array([i for i, _ in rows], dtype=np.int64),
+            "user": [comment.user for _, comment in rows],
+            "user_type": [comment.user_type for _, comment in rows],
+            "type": [comment.type.value for _, comment in rows],
+            "created_at": _timestamps([comment.created_at for _, comment in rows]),
+            "is_reply": np.array(
+                [comment.in_reply_to_id is not None for _, comment in rows], dtype=bool
+            ),
+        }
+    )
+
+
+def review_metrics(prs: list[PullRequest]) -> pd.DataFrame:
+    """
+    Compute review metrics of PRs from their timestamps and comments.
+
+    A reviewer comment is a comment by anyone but the author and bots. The columns are:
+    - `time_to_first_review_h`: hours from opening the PR to the first reviewer comment;
+    - `review_rounds`: the number of runs of reviewer comments, each ended by the author;
+    - `comments_per_100_lines`: reviewer comments per 100 changed lines;
+    - `cycle_time_h`: hours from the first commit to the merge.
+
+    Args:
+        prs (list[PullRequest]): The fetched PRs.
+
+    Returns:
+        pd.DataFrame: One row per PR, with its number and author and the metrics.
+    """
+    frame = pr_frame(prs)
+    comments = comment_frame(prs)
+    comments = comments.assign(
+        by_reviewer=(comments["user"].to_numpy() != frame["author"].to_numpy()[comments["pr"]])
+        & (comments["user_type"] != "Bot")
+    ).sort_values(["pr", "created_at"], kind="stable")
+    by_reviewer = comments[comments["by_reviewer"]]
+
+    first_review = by_reviewer.groupby("pr")["created_at"].min().reindex(frame.index)
+    # a round starts with a reviewer comment that follows an author comment or the PR
+    previous = comments.groupby("pr")["by_reviewer"].shift(fill_value=False)
+    round_starts = comments["by_reviewer"] & ~previous.astype(bool)
+    rounds = round_starts.groupby(comments["pr"]).sum().reindex(frame.index, fill_value=0)
+    reviewer_comments = by_reviewer.groupby("pr").size().reindex(frame.index, fill_value=0)
+    changed = (frame["additions"] + frame["deletions"]).replace(0, np.nan)
+
+    return pd.DataFrame(
+        {
+            "number": frame["number"],
+            "author": frame["author"],
+            "reviewers": frame["reviewers"],
+            "time_to_first_review_h": (first_review - frame["created_at"]) / _HOUR,
+            "review_rounds": rounds.astype(np.int64),
+            "reviewer_comments": reviewer_comments.astype(np.int64),
+            "comments_per_100_lines": reviewer_comments / changed * 100,
+            "cycle_time_h": (frame["merged_at"] - frame["first_committed_at"]) / _HOUR,
+        }
+    )
+
+
+def summarize_review_metrics(metrics: pd.DataFrame, by: str = "author") -> pd.DataFrame:
+    """Aggregate the per-PR metrics per group, with a last row over all PRs."""
+    everyone = metrics.assign(**{by: "all"})
+    return (
+        pd.concat([metrics, everyone])
+        .groupby(by, sort=False)
+        .agg(
+            prs=("number", "size"),
+            median_time_to_first_review_h=("time_to_first_review_h", "median"),
+            mean_review_rounds=("review_rounds", "mean"),
+            comments_per_100_lines=("comments_per_100_lines", "mean"),
+            median_cycle_time_h=("cycle_time_h", "median"),
+        )
+    )
+
+
+def pr_review_metrics(pr: PullRequest) -> dict:
+    """The metrics of a PR to save with its summary, None where they are undefined."""
+    row = review_metrics([pr])[STORED_METRICS].iloc[0]
+    return {name: None if pd.isna(value) else float(value) for name, value in row.items()}
+
+
+def stored_review_metrics(metadata: list[PRSummaryMetadata]) -> pd.DataFrame:
+    """The per-PR metrics saved in the metadata of summaries, in the columns of
+    `review_metrics`, so a weekly run needs no PR to be fetched again."""
+    return pd.DataFrame(
+        {
+            "number": np.array([m.pr_number for m in metadata], dtype=np.int64),
+            "author": [m.author for m in metadata],
+            **{
+                name: pd.Series([getattr(m, name) for m in metadata], dtype=float)
+                for name in STORED_METRICS
+            },
+        }
+    )
+
+
+def format_metrics_table(metrics: pd.DataFrame) -> str:
+    """The per-author summary of per-PR metrics as a plain text table for a prompt."""
+    if metrics.empty:
+        return ""
+    summary = summarize_review_metrics(metrics)
+    return summary.to_string(float_format=lambda value: f"{value:.1f}", na_rep="-")
+
+
+def format_review_metrics(prs: list[PullRequest]) -> str:
+    """The per-author review metrics of PRs as a plain text table for a prompt."""
+    if not prs:
+        return ""
+    return format_metrics_table(review_metrics(prs))
@@ -1,4 +1,3 @@
-import tiktoken
 import re
 
 
@@ -7,7 +6,15 @@ def json_output_curator(llm_output):
     return regex.sub("", llm_output)
 
 
+def approx_tokens(text: str) -> int:
+    """A tokenizer-free estimate of ~4 characters per token."""
+    return len(text) // 4
+
+
 def count_tokens(text, model="gpt-4o"):
+    # imported here as loading tiktoken is slow and only needed to count tokens
+    import tiktoken
+
     # Load the appropriate encoding for the model
     encoding = tiktoken.encoding_for_model(model)
     # Encode the text to get tokens
@@ -0,0 +1,89 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+import pyarrow as pa
+
+from benchmarks.synthetic import CannedClient, FakeGitProvider, NullStorage
+from perfeed.data_stores import FeatherStorage, SQLStorage
+from perfeed.data_stores.arrow import PR_SUMMARY_SCHEMA
+from perfeed.tools.pr_summarizer import PRSummarizer
+
+
+class TestLoadArrow(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        summarizer = PRSummarizer(
+            FakeGitProvider(n_comments=6), CannedClient(n_threads=2), NullStorage()
+        )
+        cls.rows = [
+            asyncio.run(summarizer.run(repo, pr_number))
+            for repo, pr_number in [("perfeed", 1), ("perfeed", 2), ("other", 3)]
+        ]
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.tmp.name, "work"))
+        os.chdir(os.path.join(self.tmp.name, "work"))
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def check_store(self, store):
+        for pr_summary, pr_metadata in self.rows:
+            store.save(pr_summary, pr_metadata)
+
+        table = store.load_arrow(
+            columns=["repo", "pr_number", "type", "comments"],
+            filters=[("repo", "==", "perfeed"), ("pr_number", ">", 1)],
+        )
+
+        self.assertEqual(table.column_names, ["repo", "pr_number", "type", "comments"])
+        self.assertEqual(table.to_pydict()["pr_number"], [2])
+        self.assertEqual(
+            table.schema.field("comments").type, PR_SUMMARY_SCHEMA.field("comments").type
+        )
+        self.assertEqual(
+            table["comments"].to_pylist()[0],
+            [thread.model_dump() for thread in self.rows[1][0].comments],
+        )
+        self.assertEqual(
+            store.load_arrow(filters=[("repo", "in", ["other"])])["pr_number"].to_pylist(),
+            [3],
+        )
+        self.assertEqual(store.load_arrow(columns=["repo"]).num_rows, 3)
+
+    def test_feather(self):
+        store = FeatherStorage(data_type="pr_summary")
+        self.check_store(store)
+
+        # opening the store folds the rows of the write-ahead log into the file,
+        # whose loaded columns are views of the memory-mapped file
+        store = FeatherStorage(data_type="pr_summary")
+        allocated = pa.total_allocated_bytes()
+        table = store.load_arrow(columns=["repo", "comments"])
+        self.assertEqual(pa.total_allocated_bytes(), allocated)
+        self.assertEqual(table.num_rows, 3)
+
+        # nested cells are loaded as plain lists, as dumped from the models
+        df = store.load()
+        self.assertEqual(len(df), 3)
+        pr_summary = self.rows[0][0]
+        self.assertEqual(
+            df.iloc[0]["pr_files"], [file.model_dump() for file in pr_summary.pr_files]
+        )
+        self.assertEqual(df.iloc[0]["comments"][0]["users"], pr_summary.comments[0].users)
+        json.dumps(df.iloc[0][["type", "pr_files", "comments"]].tolist())
+
+    def test_sql(self):
+        store = SQLStorage(data_type="pr_summary")
+        self.check_store(store)
+        asyncio.run(store.aclose())
+
+
+if __name__ == "__main__":
+    unittest.main()
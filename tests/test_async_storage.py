@@ -0,0 +1,81 @@
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+
+from benchmarks.synthetic import CannedClient, FakeGitProvider, NullStorage
+from perfeed.data_stores import DuckDBStorage, FeatherStorage, SQLStorage
+from perfeed.tools.pr_summarizer import PRSummarizer
+
+
+class TestAsyncStorage(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        summarizer = PRSummarizer(
+            FakeGitProvider(n_comments=6), CannedClient(n_threads=2), NullStorage()
+        )
+        cls.pr_summary, cls.pr_metadata = asyncio.run(summarizer.run("perfeed", 1))
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.tmp.name, "work"))
+        os.chdir(os.path.join(self.tmp.name, "work"))
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def metadata(self, pr_number: int, model: str = "canned"):
+        return self.pr_metadata.model_copy(
+            update={
+                "pr_number": pr_number,
+                "model": model,
+                "created_at": "2024-11-01T00:00:00Z",
+            }
+        )
+
+    def test_backends(self):
+        for storage_cls in [FeatherStorage, SQLStorage, DuckDBStorage]:
+            with self.subTest(storage=storage_cls.__name__):
+                store = storage_cls(data_type=storage_cls.__name__)
+                saved_on = set()
+                save = store.save
+
+                def record_thread(data, metadata):
+                    saved_on.add(threading.current_thread().name)
+                    save(data, metadata)
+
+                store.save = record_thread
+
+                async def main():
+                    # saved in the order they were made, and loaded after them
+                    await asyncio.gather(
+                        *(store.asave(self.pr_summary, self.metadata(n)) for n in range(1, 6)),
+                        store.asave(self.pr_summary, self.metadata(2, model="other")),
+                        # saved later with the same timestamp, so it is the latest
+                        store.asave(self.pr_summary, self.metadata(3)),
+                    )
+                    loaded = await store.aload()
+                    latest = await store.aget_latest("perfeed", 2, [("CannedClient", "canned")])
+                    any_model = await store.aget_latest("perfeed", 2)
+                    missing = await store.aget_latest("perfeed", 9)
+                    await store.aclose()
+                    return loaded, latest, any_model, missing
+
+                loaded, latest, any_model, missing = asyncio.run(main())
+
+                # the SQL store keeps JSON-encoded cells
+                self.assertEqual(
+                    [int(n) for n in loaded["pr_number"]], [1, 2, 3, 4, 5, 2, 3]
+                )
+                self.assertEqual(latest, (self.pr_summary, self.metadata(2)))
+                self.assertEqual(any_model[1].model, "other")
+                self.assertIsNone(missing)
+                self.assertEqual(len(saved_on), 1)
+                self.assertNotEqual(saved_on, {threading.main_thread().name})
+
+
+if __name__ == "__main__":
+    unittest.main()
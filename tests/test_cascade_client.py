@@ -0,0 +1,142 @@
+import asyncio
+import os
+import random
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from benchmarks.synthetic import (
+    CannedClient,
+    FakeGitProvider,
+    synthetic_comments,
+    synthetic_diff,
+    synthetic_llm_output,
+)
+from perfeed.data_stores import FeatherStorage
+from perfeed.git_providers.github import comments_to_thread
+from perfeed.llms.cascade_client import CascadeClient
+from perfeed.tools.pr_summarizer import (
+    PRSummarizer,
+    accept_pr_summary,
+    is_large_pr,
+    parse_pr_summary,
+)
+
+
+def prompt(n_files: int, n_comments: int, lines_per_file: int = 10) -> str:
+    rng = random.Random(0)
+    return (
+        synthetic_diff(rng, n_files, lines_per_file)
+        + comments_to_thread(synthetic_comments(rng, 1, n_comments))
+    )
+
+
+def output(n_files: int, n_threads: int) -> str:
+    return synthetic_llm_output(random.Random(0), n_files, n_threads)
+
+
+class TestAcceptPRSummary(unittest.TestCase):
+    def test_accepts_complete_summary(self):
+        self.assertTrue(accept_pr_summary(prompt(3, 6), output(3, 2)))
+        self.assertTrue(accept_pr_summary(prompt(3, 0), output(3, 0)))
+
+    def test_rejects_missing_files(self):
+        self.assertFalse(accept_pr_summary(prompt(3, 6), output(2, 2)))
+
+    def test_rejects_missing_threads(self):
+        self.assertFalse(accept_pr_summary(prompt(3, 6), output(3, 0)))
+
+    def test_rejects_invalid_output(self):
+        self.assertFalse(accept_pr_summary(prompt(3, 6), "I can't summarize this PR."))
+        self.assertFalse(accept_pr_summary(prompt(3, 6), '{"title": "missing fields"}'))
+
+    def test_rejects_missing_first_file_of_quoted_diff(self):
+        # the prompt quotes the diff, so its first header follows a quote
+        quoted = f"'{prompt(3, 0)}'"
+        complete = parse_pr_summary(output(3, 0))
+        without_first = complete.model_copy(update={"pr_files": complete.pr_files[1:]})
+
+        self.assertTrue(accept_pr_summary(quoted, complete.model_dump_json()))
+        self.assertFalse(accept_pr_summary(quoted, without_first.model_dump_json()))
+
+    def test_is_large_pr(self):
+        self.assertFalse(is_large_pr("", prompt(3, 0, lines_per_file=10)))
+        self.assertTrue(is_large_pr("", prompt(3, 0, lines_per_file=1000)))
+        self.assertTrue(is_large_pr("", prompt(16, 0, lines_per_file=1)))
+
+
+class TestCascadeClient(unittest.TestCase):
+    def setUp(self):
+        self.small = CannedClient(n_files=3, n_threads=2, model="small")
+        self.large = CannedClient(n_files=3, n_threads=2, model="large")
+        self.cascade = CascadeClient(
+            self.small, self.large, accept=accept_pr_summary, escalate=is_large_pr
+        )
+
+    def test_small_model_answers(self):
+        _, usage = self.cascade.chat_completion_with_usage("system", prompt(3, 6))
+
+        self.assertEqual(usage.model, "small")
+        self.assertEqual(self.cascade.escalations, 0)
+
+    def test_escalates_rejected_output(self):
+        self.small.output = output(1, 2)
+        small_usage = self.small.chat_completion_with_usage("system", prompt(3, 6))[1]
+        large_usage = self.large.chat_completion_with_usage("system", prompt(3, 6))[1]
+
+        response, usage = self.cascade.chat_completion_with_usage("system", prompt(3, 6))
+
+        self.assertEqual(response, self.large.output)
+        self.assertEqual(usage.model, "large")
+        self.assertEqual(
+            usage.prompt_tokens, small_usage.prompt_tokens + large_usage.prompt_tokens
+        )
+        self.assertEqual(self.cascade.escalations, 1)
+
+    def test_escalates_on_error(self):
+        self.cascade.small = MagicMock()
+        self.cascade.small.chat_completion_with_usage.side_effect = RuntimeError("down")
+
+        _, usage = self.cascade.chat_completion_with_usage("system", prompt(3, 6))
+
+        self.assertEqual(usage.model, "large")
+
+    def test_large_diff_skips_small_model(self):
+        self.cascade.small = MagicMock()
+
+        _, usage = self.cascade.chat_completion_with_usage(
+            "system", prompt(3, 6, lines_per_file=1000)
+        )
+
+        self.assertEqual(usage.model, "large")
+        self.cascade.small.chat_completion_with_usage.assert_not_called()
+
+
+class TestPRSummarizerWithCascade(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.tmp.name, "work"))
+        os.chdir(os.path.join(self.tmp.name, "work"))
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_loads_summaries_of_either_model(self):
+        git = FakeGitProvider(n_comments=6, n_files=3, lines_per_file=10)
+        small = CannedClient(n_files=3, n_threads=2, model="small")
+        cascade = CascadeClient(small, CannedClient(model="large"), accept_pr_summary)
+        store = FeatherStorage(data_type="pr_summary", overwrite=False, append=True)
+        summarizer = PRSummarizer(git, cascade, store)
+
+        _, metadata = asyncio.run(summarizer.run("perfeed", 1))
+        self.assertEqual(metadata.model, "small")
+
+        _, loaded = asyncio.run(summarizer.run("perfeed", 1))
+        self.assertEqual(loaded.created_at, metadata.created_at)
+        self.assertEqual(cascade.calls, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from urllib.error import HTTPError
+
+from benchmarks.fake_github import FakeGithubServer
+from benchmarks.synthetic import CannedClient, NullStorage, SyntheticRepo
+from perfeed.git_providers.github import GithubProvider
+from perfeed.llms.cassette_client import CassetteClient
+from perfeed.tools.pr_summarizer import PRSummarizer
+from perfeed.tools.weekly_summarizer import WeeklySummarizer
+from perfeed.utils.cassette import Cassette, request_key
+
+
+class TestCassette(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.tmp.name, "work"))
+        os.chdir(os.path.join(self.tmp.name, "work"))
+        self.path = os.path.join(self.tmp.name, "weekly.jsonl.gz")
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def weekly(self, cassette: Cassette, gh_host: str, client=None) -> tuple[str, int]:
+        git = GithubProvider("Perfeed", token="fake", gh_host=gh_host, cassette=cassette)
+        llm = CassetteClient(client, cassette, "canned")
+        summarizer = PRSummarizer(git, llm, NullStorage())
+        weekly_summarizer = WeeklySummarizer(git, summarizer, llm)
+        summary = asyncio.run(weekly_summarizer.run(["user1"], "perfeed", "2024-10-21"))
+        return summary, summarizer.ledger.aggregate().shape[0]
+
+    def test_weekly_run_replays_offline(self):
+        repo = SyntheticRepo(n_prs=120, n_comments=6, spacing_hours=2)
+        with FakeGithubServer([repo]) as server:
+            cassette = Cassette(self.path, "record")
+            recorded = self.weekly(cassette, server.url, CannedClient(n_threads=2))
+            cassette.save()
+            requests = server.requests
+
+        # the server is gone and there is no LLM client, every response is replayed
+        replayed = self.weekly(Cassette(self.path, latency_scale=0), server.url)
+
+        self.assertGreater(requests, 0)
+        self.assertEqual(replayed, recorded)
+
+    def test_latency_is_scaled(self):
+        cassette = Cassette(self.path, "record")
+        key = request_key("pulls.get", ["perfeed", 1], {})
+        cassette.record("github", key, {"number": 1}, elapsed=0.2)
+        cassette.save()
+
+        replay = Cassette(self.path, latency_scale=0.25)
+        now = time.perf_counter()
+        response = asyncio.run(replay.areplay("github", key))
+        elapsed = time.perf_counter() - now
+
+        self.assertEqual(response, {"number": 1})
+        self.assertGreaterEqual(elapsed, 0.05)
+        self.assertLess(elapsed, 0.2)
+        with self.assertRaises(KeyError):
+            replay.replay("github", request_key("pulls.get", ["perfeed", 2], {}))
+
+    def test_responses_replay_in_order_and_errors_are_raised(self):
+        cassette = Cassette(self.path, "record")
+        cassette.record("llm", "a", "first", 0)
+        cassette.record("llm", "a", "second", 0)
+        url = "https://api.github.com/orgs/jzxcd/repos"
+        error = HTTPError(url, 404, "Not Found", None, None)  # type: ignore[arg-type]
+        cassette.record("github", "repos", None, 0, error=error)
+        cassette.save()
+
+        replay = Cassette(self.path, latency_scale=0)
+
+        self.assertEqual(
+            [replay.replay("llm", "a") for _ in range(3)], ["first", "second", "second"]
+        )
+        with self.assertRaises(HTTPError) as raised:
+            replay.replay("github", "repos")
+        self.assertEqual(raised.exception.code, 404)
+
+    def test_saved_bytes_do_not_depend_on_request_order(self):
+        saved = []
+        for order in [["a", "b", "c"], ["c", "a", "b"]]:
+            cassette = Cassette(self.path, "record")
+            for key in order:
+                cassette.record("github", key, [key, {"n": 1}], 0.01)
+            cassette.save()
+            with open(self.path, "rb") as f:
+                saved.append(f.read())
+
+        self.assertEqual(saved[0], saved[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
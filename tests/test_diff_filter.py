@@ -0,0 +1,126 @@
+import random
+import unittest
+
+from benchmarks.synthetic import synthetic_diff
+from perfeed.utils.diff_filter import DiffFilter, DiffFilterReport
+
+LOCKFILE = """diff --git a/poetry.lock b/poetry.lock
+index 1234567..89abcde 100644
+--- a/poetry.lock
++++ b/poetry.lock
+@@ -10,3 +10,3 @@
+ name = "requests"
+-version = "2.31.0"
++version = "2.32.0"
+"""
+
+GENERATED = """diff --git a/api/schema.go b/api/schema.go
+--- a/api/schema.go
++++ b/api/schema.go
+@@ -1,3 +1,3 @@
+ // Code generated by protoc-gen-go. DO NOT EDIT.
+-var x = 1
++var x = 2
+"""
+
+WHITESPACE = """diff --git a/perfeed/cli.py b/perfeed/cli.py
+--- a/perfeed/cli.py
++++ b/perfeed/cli.py
+@@ -5,3 +5,3 @@
+ def main():
+-    return  run(args)
++    return run(args)
+@@ -20,2 +20,2 @@
+-x = 1
++x = 2
+"""
+
+RENAME = """diff --git a/old.py b/new.py
+similarity index 100%
+rename from old.py
+rename to new.py
+"""
+
+NOTEBOOK = """diff --git a/demo.ipynb b/demo.ipynb
+--- a/demo.ipynb
++++ b/demo.ipynb
+@@ -1,14 +1,14 @@
+    {
+-    "execution_count": 3,
++    "execution_count": 7,
+     "outputs": [
+      {
+-      "text": "old output"
++      "text": "new output"
+      }
+     ],
+     "source": [
+-     "print(1)"
++     "print(2)"
+     ]
+    }
+"""
+
+
+class TestDiffFilter(unittest.TestCase):
+    def setUp(self):
+        self.filter = DiffFilter.from_settings()
+
+    def test_omits_excluded_and_generated_files(self):
+        filtered, report = self.filter.apply(LOCKFILE + GENERATED)
+
+        self.assertEqual(
+            filtered,
+            "diff --git a/poetry.lock b/poetry.lock\n"
+            "[2 changed lines omitted, excluded file]\n"
+            "diff --git a/api/schema.go b/api/schema.go\n"
+            "[2 changed lines omitted, generated file]\n",
+        )
+        self.assertEqual(report.files, {"poetry.lock": "excluded", "api/schema.go": "generated"})
+        headers = LOCKFILE.splitlines(True)[0] + GENERATED.splitlines(True)[0]
+        self.assertEqual(report.removed_bytes, len(LOCKFILE + GENERATED) - len(headers))
+        self.assertGreater(report.removed_tokens, 0)
+
+    def test_omits_minified_files(self):
+        diff = "diff --git a/app.js b/app.js\n@@ -1 +1 @@\n-a\n+" + "x;" * 600 + "\n"
+        filtered, report = self.filter.apply(diff)
+
+        self.assertEqual(report.files, {"app.js": "minified"})
+        self.assertNotIn("x;x;", filtered)
+
+    def test_collapses_whitespace_hunks_and_renames(self):
+        filtered, report = self.filter.apply(WHITESPACE + RENAME)
+
+        self.assertIn("[whitespace-only changes omitted]", filtered)
+        self.assertNotIn("return  run(args)", filtered)
+        self.assertIn("+x = 2\n", filtered)
+        self.assertTrue(filtered.endswith("rename from old.py\nrename to new.py\n"))
+        self.assertNotIn("similarity index", filtered)
+
+    def test_strips_notebook_outputs(self):
+        filtered, report = self.filter.apply(NOTEBOOK)
+
+        self.assertNotIn("output", filtered.replace('"outputs": [', ""))
+        self.assertNotIn("execution_count", filtered)
+        self.assertIn('+     "print(2)"\n', filtered)
+        self.assertEqual(report.files, {"demo.ipynb": "notebook outputs"})
+
+    def test_keeps_source_diffs(self):
+        diff = synthetic_diff(random.Random(0), 5, 40)
+        filtered, report = self.filter.apply(diff)
+
+        self.assertEqual(filtered, diff)
+        self.assertEqual((report.removed_tokens, report.files), (0, {}))
+
+    def test_streams_per_file(self):
+        seen = []
+        lines = (seen.append(line) or line for line in (LOCKFILE + WHITESPACE).splitlines(True))
+        filtered = self.filter.stream(lines, DiffFilterReport())
+
+        self.assertEqual(next(filtered), "diff --git a/poetry.lock b/poetry.lock\n")
+        # the first file is yielded once the second one starts
+        self.assertEqual(len(seen), len(LOCKFILE.splitlines()) + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from benchmarks.synthetic import CannedClient, FakeGitProvider, NullStorage
+from perfeed.data_stores import DuckDBStorage
+from perfeed.tools.pr_summarizer import PRSummarizer
+
+
+class TestDuckDBStorage(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        summarizer = PRSummarizer(
+            FakeGitProvider(n_comments=6), CannedClient(n_threads=2), NullStorage()
+        )
+        cls.pr_summary, cls.pr_metadata = asyncio.run(summarizer.run("perfeed", 1))
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.tmp.name, "work"))
+        os.chdir(os.path.join(self.tmp.name, "work"))
+        self.store = DuckDBStorage(data_type="pr_summary")
+
+    def tearDown(self):
+        asyncio.run(self.store.aclose())
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def save(self, pr_number, author, created, merged, created_at="2024-11-01T00:00:00Z"):
+        self.store.save(
+            self.pr_summary,
+            self.pr_metadata.model_copy(
+                update={
+                    "pr_number": pr_number,
+                    "author": author,
+                    "pr_created_at": created,
+                    "pr_merged_at": merged,
+                    "created_at": created_at,
+                }
+            ),
+        )
+
+    def test_load(self):
+        self.save(1, "alice", "2024-10-21T09:00:00Z", "2024-10-21T19:00:00Z")
+        self.save(2, "bob", "2024-10-22T09:00:00Z", None)
+
+        df = self.store.load()
+        table = self.store.load_arrow(
+            columns=["pr_number", "comments"], filters=[("author", "in", ["bob"])]
+        )
+
+        self.assertEqual(df["pr_number"].tolist(), [1, 2])
+        self.assertEqual(table["pr_number"].to_pylist(), [2])
+        self.assertEqual(
+            table["comments"].to_pylist()[0],
+            [thread.model_dump() for thread in self.pr_summary.comments],
+        )
+
+    def test_trend(self):
+        self.save(1, "alice", "2024-10-21T09:00:00Z", "2024-10-21T19:00:00Z")
+        self.save(2, "alice", "2024-10-23T09:00:00Z", "2024-10-23T13:00:00Z")
+        self.save(3, "bob", "2024-10-22T09:00:00Z", None)
+        self.save(4, "alice", "2024-10-29T09:00:00Z", "2024-10-30T09:00:00Z")
+        # a newer summary of the same PR replaces the older one
+        self.save(4, "alice", "2024-10-29T09:00:00Z", "2024-10-29T11:00:00Z", "2024-11-02T00:00:00Z")
+
+        trend = self.store.trend(metrics=("prs", "turnaround_hours", "comment_threads"))
+
+        self.assertEqual(trend["author"].tolist(), ["alice", "bob", "alice"])
+        self.assertEqual(trend["prs"].tolist(), [2, 1, 1])
+        self.assertEqual(trend["turnaround_hours"].tolist()[::2], [7.0, 2.0])
+        self.assertEqual(trend["comment_threads"].tolist(), [4, 2, 2])
+        with self.assertRaises(ValueError):
+            self.store.trend(metrics=("velocity",))
+
+    def test_comment_actions(self):
+        self.save(1, "alice", "2024-10-21T09:00:00Z", None)
+        self.save(2, "bob", "2024-10-22T09:00:00Z", None)
+
+        actions = self.store.comment_actions(filters=[("author", "==", "alice")])
+
+        self.assertEqual(set(actions["author"]), {"alice"})
+        self.assertEqual(actions["threads"].sum(), len(self.pr_summary.comments))
+
+
+if __name__ == "__main__":
+    unittest.main()
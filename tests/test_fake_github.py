@@ -0,0 +1,174 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from datetime import timedelta
+from unittest.mock import MagicMock
+
+from benchmarks.fake_github import FakeGithubServer
+from benchmarks.synthetic import CannedClient, NullStorage, SyntheticRepo
+from perfeed.config_loader import settings
+from perfeed.git_providers.github import GithubProvider
+from perfeed.models.llm_usage import LLMUsage
+from perfeed.tools.pr_summarizer import PRSummarizer
+from perfeed.tools.weekly_summarizer import WeeklySummarizer
+
+
+class TestGithubProviderAgainstFakeServer(unittest.TestCase):
+    def setUp(self):
+        self.repo = SyntheticRepo(n_prs=250, n_comments=6, spacing_hours=1)
+        self.server = FakeGithubServer([self.repo]).__enter__()
+        self.git = GithubProvider(
+            self.repo.owner, token="fake", gh_host=self.server.url, use_index=False
+        )
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def test_search_prs_paginates(self):
+        start = SyntheticRepo.START
+        end = start + timedelta(days=6)
+
+        pr_numbers = asyncio.run(
+            self.git.search_prs(self.repo.name, start, end, {"user1"})
+        )
+
+        expected = [
+            pr_number
+            for pr_number in range(self.repo.n_prs, 0, -1)
+            if pr_number % 4 == 1 and start <= self.repo.created_at(pr_number) <= end
+        ]
+        self.assertSequenceEqual(pr_numbers, expected)
+        # 250 PRs at 100 per page, the oldest PR is still in range so an empty 4th page ends the search
+        self.assertEqual(self.server.requests, 4)
+
+    def test_get_pr_and_diff(self):
+        pr = asyncio.run(self.git.get_pr(self.repo.name, 7))
+        diff = asyncio.run(self.git.get_pr_diff(self.repo.name, pr))
+
+        self.assertEqual(pr.number, 7)
+        self.assertEqual(pr.author, "user3")
+        self.assertEqual(pr.reviewers, ["user0"])
+        self.assertEqual(len(pr.comments), 6 + 1)
+        self.assertEqual(diff, self.repo.diff(7))
+
+
+class TestPRIndexAgainstFakeServer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        settings.set("pr_index.path", os.path.join(self.tmp.name, "pr_index.sqlite"))
+        settings.set("pr_index.sync_interval", 0)
+        self.repo = SyntheticRepo(n_prs=250, n_comments=6, spacing_hours=1)
+        self.server = FakeGithubServer([self.repo]).__enter__()
+        self.git = GithubProvider(self.repo.owner, token="fake", gh_host=self.server.url)
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+        asyncio.run(self.git.aclose())
+        settings.set("pr_index.path", "../_data/pr_index/pr_index.sqlite")
+        settings.set("pr_index.sync_interval", 60)
+        self.tmp.cleanup()
+
+    def search(self, authors=None):
+        start = SyntheticRepo.START
+        end = start + timedelta(days=30)
+        return asyncio.run(self.git.search_prs(self.repo.name, start, end, authors))
+
+    def test_search_syncs_only_the_delta(self):
+        # the first search indexes the 250 PRs, 100 per page
+        self.assertEqual(self.search({"user1"}), list(range(249, 0, -4)))
+        self.assertEqual(self.server.requests, 3)
+
+        # nothing changed, so the first page reaches the watermark
+        self.assertEqual(len(self.search()), 250)
+        self.assertEqual(self.server.requests, 4)
+
+        self.repo.n_prs = 255
+        self.assertEqual(self.search()[:6], [255, 254, 253, 252, 251, 250])
+        self.assertEqual(self.server.requests, 5)
+        # the updated_at of PR 255
+        self.assertEqual(
+            self.git.index.sync_state("Perfeed", "perfeed")[0], "2024-11-01T10:00:00Z"
+        )
+
+    def test_recent_sync_is_not_repeated(self):
+        settings.set("pr_index.sync_interval", 60)
+        self.search()
+        self.repo.n_prs = 255
+
+        self.assertEqual(len(self.search()), 250)
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual(asyncio.run(self.git.sync_index(self.repo.name, force=True)), 100)
+        self.assertEqual(len(self.search()), 255)
+
+    def test_aclose_closes_the_index(self):
+        self.search()
+        index = self.git.index
+
+        asyncio.run(self.git.aclose())
+
+        with self.assertRaises(sqlite3.ProgrammingError):
+            index.sync_state(self.repo.owner, self.repo.name)
+        # the index is opened again on next use
+        self.assertEqual(len(self.search()), 250)
+
+
+class TestOrgSearchAgainstFakeServer(unittest.TestCase):
+    def setUp(self):
+        self.repos = [
+            SyntheticRepo(name=name, n_prs=n_prs, n_comments=6, spacing_hours=1)
+            for name, n_prs in [("perfeed", 150), ("docs", 120), ("infra", 30)]
+        ]
+        self.server = FakeGithubServer(self.repos, latency=0.05).__enter__()
+        self.git = GithubProvider(
+            "Perfeed", token="fake", gh_host=self.server.url, use_index=False
+        )
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def test_repos_are_searched_concurrently(self):
+        start = SyntheticRepo.START
+        end = start + timedelta(days=6)
+
+        now = time.perf_counter()
+        prs = asyncio.run(self.git.search_org_prs(start, end, {"user1"}))
+        elapsed = time.perf_counter() - now
+
+        expected = [
+            (repo.name, pr_number)
+            for repo in sorted(self.repos, key=lambda repo: repo.name)
+            for pr_number in range(repo.n_prs, 0, -1)
+            if pr_number % 4 == 1 and start <= repo.created_at(pr_number) <= end
+        ]
+        self.assertEqual(prs, expected)
+        # one request lists the repos, then 3 + 3 + 2 sequential pages are searched
+        # at the same time, instead of one after the other
+        self.assertEqual(self.server.requests, 1 + 3 + 3 + 2)
+        self.assertLess(elapsed, 0.05 * (1 + 3 + 3 + 2))
+        # the repos are listed once
+        asyncio.run(self.git.search_org_prs(start, end, {"user1"}, repos=None))
+        self.assertEqual(self.server.requests, 2 * (3 + 3 + 2) + 1)
+
+    def test_weekly_over_several_repos(self):
+        self.server.latency = 0
+        llm = MagicMock()
+        llm.chat_completion_with_usage.return_value = (
+            "summary",
+            LLMUsage(provider="MagicMock", model="weekly"),
+        )
+        summarizer = PRSummarizer(self.git, CannedClient(n_threads=2), NullStorage())
+        weekly_summarizer = WeeklySummarizer(self.git, summarizer, llm)
+
+        asyncio.run(weekly_summarizer.run(["user1"], ["docs", "infra"], "2024-10-21"))
+
+        user_prompt = llm.chat_completion_with_usage.call_args.args[1]
+        self.assertIn("PR docs#117 by user1", user_prompt)
+        self.assertIn("PR infra#29 by user1", user_prompt)
+        self.assertNotIn("PR perfeed#", user_prompt)
+
+
+if __name__ == "__main__":
+    unittest.main()
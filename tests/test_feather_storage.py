@@ -0,0 +1,138 @@
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from pyarrow import feather
+
+from benchmarks.synthetic import CannedClient, FakeGitProvider, NullStorage
+from perfeed.config_loader import settings
+from perfeed.data_stores import FeatherStorage
+from perfeed.data_stores import storage_feather
+from perfeed.tools.pr_summarizer import PRSummarizer
+
+
+def save_rows(pr_summary, pr_metadata, worker: int, n_rows: int) -> None:
+    store = FeatherStorage(data_type="pr_summary")
+    for i in range(n_rows):
+        store.save(
+            pr_summary, pr_metadata.model_copy(update={"pr_number": worker * 100 + i})
+        )
+
+
+class TestFeatherStorage(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        summarizer = PRSummarizer(
+            FakeGitProvider(n_comments=6), CannedClient(n_threads=2), NullStorage()
+        )
+        cls.pr_summary, cls.pr_metadata = asyncio.run(summarizer.run("perfeed", 1))
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.tmp.name, "work"))
+        os.chdir(os.path.join(self.tmp.name, "work"))
+
+    def tearDown(self):
+        settings.set("feather_store.checkpoint_bytes", 1048576)
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def save(self, store: FeatherStorage, *pr_numbers: int) -> None:
+        for pr_number in pr_numbers:
+            store.save(
+                self.pr_summary, self.pr_metadata.model_copy(update={"pr_number": pr_number})
+            )
+
+    def file_rows(self, store: FeatherStorage) -> list[int]:
+        return feather.read_table(store.path).column("pr_number").to_pylist()
+
+    def test_rows_are_logged_then_checkpointed(self):
+        store = FeatherStorage(data_type="pr_summary")
+        self.save(store, 1, 2)
+
+        # loads see the rows of the log before they reach the file
+        self.assertEqual(store.load()["pr_number"].tolist(), [1, 2])
+        self.assertEqual(store.load_arrow(columns=["pr_number"]).num_rows, 2)
+        self.assertEqual(feather.read_table(store.path).num_rows, 0)
+
+        settings.set("feather_store.checkpoint_bytes", 1)
+        self.save(store, 3)
+        self.assertEqual(self.file_rows(store), [1, 2, 3])
+        self.assertEqual(store._read_wal()[1], [])
+        self.assertEqual(store.load()["pr_number"].tolist(), [1, 2, 3])
+
+    def test_log_is_replayed_on_open(self):
+        self.save(FeatherStorage(data_type="pr_summary"), 1, 2)
+
+        store = FeatherStorage(data_type="pr_summary")
+
+        self.assertEqual(self.file_rows(store), [1, 2])
+        self.assertEqual(store.load()["pr_number"].tolist(), [1, 2])
+
+    def test_torn_row_is_dropped(self):
+        store = FeatherStorage(data_type="pr_summary")
+        self.save(store, 1)
+        # a save killed in the middle of its append
+        with open(store.wal_path, "ab") as f:
+            f.write(b'0badc0de {"repo": "perf')
+
+        self.assertEqual(store.load()["pr_number"].tolist(), [1])
+        self.save(store, 2)
+        self.assertEqual(store.load()["pr_number"].tolist(), [1, 2])
+        self.assertEqual(self.file_rows(FeatherStorage(data_type="pr_summary")), [1, 2])
+
+    def test_crash_before_new_log_does_not_duplicate_rows(self):
+        store = FeatherStorage(data_type="pr_summary")
+        self.save(store, 1, 2)
+        with patch.object(FeatherStorage, "_new_wal", side_effect=OSError("killed")):
+            with self.assertRaises(OSError):
+                FeatherStorage(data_type="pr_summary")
+
+        # the file has the rows, and the log still has them too
+        self.assertEqual(self.file_rows(store), [1, 2])
+        self.assertEqual(len(store._read_wal()[1]), 2)
+        self.assertEqual(store.load()["pr_number"].tolist(), [1, 2])
+        store = FeatherStorage(data_type="pr_summary")
+        self.save(store, 3)
+        self.assertEqual(store.load()["pr_number"].tolist(), [1, 2, 3])
+
+    def test_overwrite(self):
+        self.save(FeatherStorage(data_type="pr_summary"), 1, 2)
+        store = FeatherStorage(data_type="pr_summary", overwrite=True, append=False)
+
+        self.save(store, 3)
+
+        self.assertEqual(store.load()["pr_number"].tolist(), [3])
+        with self.assertRaises(FileExistsError):
+            self.save(FeatherStorage(data_type="pr_summary", append=False), 4)
+
+    @unittest.skipIf(storage_feather.fcntl is None, "no fcntl")
+    def test_processes_do_not_lose_rows(self):
+        # small enough that the workers checkpoint while the others are saving
+        settings.set("feather_store.checkpoint_bytes", 20000)
+        context = multiprocessing.get_context("fork")
+        workers = [
+            context.Process(
+                target=save_rows, args=(self.pr_summary, self.pr_metadata, worker, 15)
+            )
+            for worker in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual([worker.exitcode for worker in workers], [0] * 4)
+        pr_numbers = FeatherStorage(data_type="pr_summary").load()["pr_number"].tolist()
+        self.assertEqual(
+            sorted(pr_numbers),
+            [worker * 100 + i for worker in range(4) for i in range(15)],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
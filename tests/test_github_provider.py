@@ -2,8 +2,13 @@ import asyncio
 import unittest
 from datetime import datetime
 from unittest.mock import patch
+from urllib.error import HTTPError
 
-from perfeed.git_providers.github import GithubProvider
+from perfeed.git_providers.github import (
+    GithubProvider,
+    decode_comments,
+    parse_timestamp,
+)
 from perfeed.models.git_provider import CommentType, PRComment, PullRequest
 
 
@@ -15,7 +20,9 @@ class TestGithubProvider(unittest.TestCase):
         Set up a mock GithubProvider instance before each test.
         """
         self.mock_api = MockGhApi.return_value
-        self.github_provider = GithubProvider(owner="test_owner", token="fake_token")
+        self.github_provider = GithubProvider(
+            owner="test_owner", token="fake_token", use_index=False
+        )
 
     def test_get_pr_comments_issue_comment(self):
         """
@@ -438,6 +445,63 @@ class TestGithubProvider(unittest.TestCase):
             page=1,
         )
 
+    def test_list_repos_of_a_user(self):
+        self.mock_api.repos.list_for_org.side_effect = HTTPError(
+            "https://api.github.com/orgs/test_owner/repos", 404, "Not Found", None, None
+        )
+        self.mock_api.repos.list_for_user.return_value = [{"name": "a"}, {"name": "b"}]
+
+        repos = asyncio.run(self.github_provider.list_repos())
+
+        self.assertEqual(repos, ["a", "b"])
+        self.mock_api.repos.list_for_user.assert_called_once_with(
+            "test_owner", per_page=100, page=1
+        )
+
+    def test_search_org_prs_skips_failed_repos(self):
+        async def search_prs(repo, *args):
+            if repo == "broken":
+                raise RuntimeError("403")
+            return [2, 1]
+
+        self.github_provider.search_prs = search_prs
+        start = datetime.strptime("2024-10-09T10:00:00+08:00", "%Y-%m-%dT%H:%M:%S%z")
+
+        prs = asyncio.run(
+            self.github_provider.search_org_prs(
+                start, start, None, repos=["a", "broken", "b"]
+            )
+        )
+
+        self.assertEqual(prs, [("a", 2), ("a", 1), ("b", 2), ("b", 1)])
+
+
+class TestDecodeComments(unittest.TestCase):
+    def test_decode_raw_payload(self):
+        payload = b"""[
+            {"id": 1, "user": {"login": "alice", "type": "User"}, "body": "a",
+             "created_at": "2024-10-21T10:00:00Z", "html_url": "u1", "position": 3},
+            {"id": 2, "user": {"login": "alice", "type": "User"}, "body": "b",
+             "created_at": "2024-10-21T11:00:00Z", "html_url": "u2", "position": null,
+             "in_reply_to_id": 1, "diff_hunk": "@@ -1 +1 @@"}
+        ]"""
+
+        comments = decode_comments(payload, CommentType.REVIEW_COMMENT)
+
+        self.assertEqual([comment.id for comment in comments], [1, 2])
+        self.assertEqual([comment.code_change for comment in comments], [False, True])
+        self.assertEqual(comments[1].in_reply_to_id, 1)
+        self.assertEqual(comments[1].diff_hunk, "@@ -1 +1 @@")
+        self.assertIs(comments[0].user, comments[1].user)
+        self.assertFalse(hasattr(comments[0], "__dict__"))
+
+    def test_parse_timestamp(self):
+        for value in ["2024-10-21T10:00:00Z", "2024-10-21T18:00:00+08:00"]:
+            self.assertEqual(
+                parse_timestamp(value),
+                datetime.strptime(value, "%Y-%m-%dT%H:%M:%S%z"),
+            )
+
 
 if __name__ == "__main__":
     unittest.main()
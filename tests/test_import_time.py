@@ -0,0 +1,43 @@
+import subprocess
+import sys
+import unittest
+
+HEAVY_MODULES = {"IPython", "sqlalchemy", "ollama", "openai", "tiktoken"}
+
+
+def import_times(module: str) -> dict[str, int]:
+    """Import a module in a fresh interpreter and return the cumulative import time in
+    microseconds of every module it pulled in, as reported by `-X importtime`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+class TestImportTime(unittest.TestCase):
+    def test_cli_imports_only_stdlib(self):
+        times = import_times("perfeed.cli")
+        perfeed_modules = {name for name in times if name.startswith("perfeed")}
+        self.assertEqual(perfeed_modules, {"perfeed", "perfeed.cli"})
+        self.assertFalse(HEAVY_MODULES & times.keys())
+        self.assertNotIn("pandas", times)
+        self.assertLess(times["perfeed.cli"], 500_000)
+
+    def test_weekly_summarizer_skips_unused_backends(self):
+        times = import_times("perfeed.tools.weekly_summarizer")
+        self.assertIn("perfeed.tools.weekly_summarizer", times)
+        self.assertFalse(HEAVY_MODULES & times.keys())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,220 @@
+import asyncio
+import os
+import random
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from benchmarks.synthetic import synthetic_llm_output
+from perfeed.config_loader import settings
+from perfeed.data_stores.job_queue import JobQueue, JobStatus
+from perfeed.llms.usage import BudgetExceededError, UsageLedger
+from perfeed.models.llm_usage import LLMUsage
+from perfeed.tools.pr_summarizer import parse_pr_summary
+from perfeed.tools.weekly_summarizer import WeeklySummarizer
+
+
+class TestJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "jobs.sqlite")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_enqueue_deduplicates(self):
+        queue = JobQueue(self.path)
+
+        self.assertTrue(queue.enqueue("perfeed", 1))
+        self.assertFalse(queue.enqueue("perfeed", 1))
+        self.assertTrue(queue.enqueue("perfeed", 2))
+        self.assertEqual(queue.counts(), {JobStatus.pending: 2})
+
+    def test_requeue_finished_job(self):
+        queue = JobQueue(self.path)
+        queue.enqueue("perfeed", 1)
+        queue.claim_job("perfeed", 1)
+        queue.fail("perfeed", 1, "error")
+
+        self.assertFalse(queue.enqueue("perfeed", 1))
+        self.assertEqual(queue.status("perfeed", 1), JobStatus.failed)
+
+        self.assertTrue(queue.enqueue("perfeed", 1, requeue=True))
+        self.assertEqual(queue.status("perfeed", 1), JobStatus.pending)
+        self.assertEqual(queue.jobs()[0]["attempts"], 0)
+        self.assertTrue(queue.is_stale("perfeed", 1))
+
+        # a job that is still pending or running is not requeued
+        self.assertFalse(queue.enqueue("perfeed", 1, requeue=True))
+        queue.claim_job("perfeed", 1)
+        self.assertFalse(queue.enqueue("perfeed", 1, requeue=True))
+        queue.complete("perfeed", 1)
+        self.assertFalse(queue.is_stale("perfeed", 1))
+
+    def test_claim_in_order(self):
+        queue = JobQueue(self.path)
+        queue.enqueue("perfeed", 2)
+        queue.enqueue("perfeed", 1)
+
+        self.assertEqual(queue.claim(), ("perfeed", 2))
+        self.assertEqual(queue.claim(), ("perfeed", 1))
+        self.assertIsNone(queue.claim())
+
+    def test_expired_lease_is_reclaimed(self):
+        queue = JobQueue(self.path, lease_seconds=-1, max_attempts=2)
+        queue.enqueue("perfeed", 1)
+        self.assertEqual(queue.claim(), ("perfeed", 1))
+        queue.close()
+
+        # the process holding the lease died
+        reopened = JobQueue(self.path, lease_seconds=-1, max_attempts=2)
+        self.assertEqual(reopened.claim(), ("perfeed", 1))
+        self.assertEqual(reopened.jobs()[0]["attempts"], 2)
+
+        # no attempts left once the second lease expires
+        self.assertIsNone(reopened.claim())
+        self.assertEqual(reopened.status("perfeed", 1), JobStatus.failed)
+
+    def test_active_lease_is_not_reclaimed(self):
+        queue = JobQueue(self.path, lease_seconds=60)
+        queue.enqueue("perfeed", 1)
+
+        self.assertTrue(queue.claim_job("perfeed", 1))
+        self.assertFalse(queue.claim_job("perfeed", 1))
+        self.assertIsNone(queue.claim())
+
+    def test_keep_leased_renews_lease(self):
+        queue = JobQueue(self.path, lease_seconds=0.15)
+        other = JobQueue(self.path, lease_seconds=0.15)
+        queue.enqueue("perfeed", 1)
+        queue.claim_job("perfeed", 1)
+
+        async def long_summary() -> bool:
+            async with queue.keep_leased("perfeed", 1):
+                await asyncio.sleep(0.4)
+                return other.claim_job("perfeed", 1)
+
+        self.assertFalse(asyncio.run(long_summary()))
+        self.assertEqual(queue.jobs()[0]["attempts"], 1)
+
+    def test_retry_failed_selectively(self):
+        queue = JobQueue(self.path)
+        for pr_number in [1, 2, 3]:
+            queue.enqueue("perfeed", pr_number)
+            queue.claim_job("perfeed", pr_number)
+            queue.fail("perfeed", pr_number, "error")
+
+        self.assertEqual(queue.retry_failed("perfeed", [1, 3]), 2)
+        self.assertEqual(queue.status("perfeed", 1), JobStatus.pending)
+        self.assertEqual(queue.status("perfeed", 2), JobStatus.failed)
+        self.assertEqual(queue.jobs(JobStatus.pending)[0]["attempts"], 0)
+
+
+class TestWeeklySummarizerResume(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.queue = JobQueue(os.path.join(self.tmp.name, "jobs.sqlite"))
+
+        self.git = MagicMock()
+        self.git.search_prs = AsyncMock(return_value=[1, 2, 3])
+        self.summarizer = MagicMock()
+        self.summarizer.run = AsyncMock()
+        self.summarizer.ledger = UsageLedger()
+        self.summarizer.budget = None
+        self.llm = MagicMock()
+        self.llm.chat_completion_with_usage.return_value = (
+            "weekly summary",
+            LLMUsage(provider="MagicMock", model="weekly", prompt_tokens=10),
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _summary(self):
+        summary = parse_pr_summary(synthetic_llm_output(random.Random(0), 1, 1))
+        return summary, MagicMock()
+
+    def test_resume_only_retries_failed(self):
+        def flaky(repo, pr_number, refresh=False):
+            if pr_number == 2:
+                raise RuntimeError("LLM failure")
+            return self._summary()
+
+        self.summarizer.run.side_effect = flaky
+        weekly_summarizer = WeeklySummarizer(
+            self.git, self.summarizer, self.llm, queue=self.queue
+        )
+        summary = asyncio.run(weekly_summarizer.run(["user"], "perfeed", "2024-10-21"))
+
+        self.assertEqual(summary, "weekly summary")
+        self.assertEqual(self.queue.status("perfeed", 2), JobStatus.failed)
+        self.assertEqual(self.queue.counts()[JobStatus.done], 2)
+
+        # failed PRs are skipped until they are explicitly retried
+        self.summarizer.run.reset_mock()
+        self.summarizer.run.side_effect = lambda repo, pr_number, refresh=False: (
+            self._summary()
+        )
+        asyncio.run(weekly_summarizer.run(["user"], "perfeed", "2024-10-21"))
+        self.assertEqual(self.summarizer.run.await_count, 2)
+        self.assertEqual(self.queue.status("perfeed", 2), JobStatus.failed)
+
+        asyncio.run(
+            weekly_summarizer.run(
+                ["user"], "perfeed", "2024-10-21", retry_failed=True
+            )
+        )
+        self.assertEqual(self.queue.counts(), {JobStatus.done: 3})
+
+    def test_waits_for_pr_leased_by_another_worker(self):
+        settings.set("job_queue.poll_interval", 0.01)
+        self.git.search_prs = AsyncMock(return_value=[1])
+        # another worker, e.g. the webhook service, is summarizing the PR
+        self.queue.enqueue("perfeed", 1)
+        self.queue.claim_job("perfeed", 1)
+        self.summarizer.run.side_effect = lambda repo, pr_number, refresh=False: (
+            self._summary()
+        )
+        weekly_summarizer = WeeklySummarizer(
+            self.git, self.summarizer, self.llm, queue=self.queue
+        )
+
+        async def main() -> None:
+            weekly = asyncio.create_task(
+                weekly_summarizer.run(["user"], "perfeed", "2024-10-21")
+            )
+            await asyncio.sleep(0.05)
+            self.assertFalse(weekly.done())
+            self.queue.complete("perfeed", 1)
+            await weekly
+
+        try:
+            asyncio.run(main())
+        finally:
+            settings.set("job_queue.poll_interval", 1)
+
+        # the summary of the other worker is loaded from the store
+        self.summarizer.run.assert_awaited_once_with("perfeed", 1)
+        user_prompt = self.llm.chat_completion_with_usage.call_args[0][1]
+        self.assertIn(self._summary()[0].title, user_prompt)
+
+    def test_budget_releases_unsummarized(self):
+        def over_budget(repo, pr_number, refresh=False):
+            if pr_number == 3:
+                raise BudgetExceededError("LLM budget exceeded")
+            return self._summary()
+
+        self.summarizer.run.side_effect = over_budget
+        weekly_summarizer = WeeklySummarizer(
+            self.git, self.summarizer, self.llm, queue=self.queue
+        )
+        asyncio.run(weekly_summarizer.run(["user"], "perfeed", "2024-10-21"))
+
+        # stopped PRs are picked up by the next run without a retry
+        self.assertEqual(self.queue.status("perfeed", 3), JobStatus.pending)
+        self.assertEqual(self.queue.jobs(JobStatus.pending)[0]["attempts"], 0)
+        self.assertEqual(self.summarizer.ledger.totals()["prompt_tokens"], 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
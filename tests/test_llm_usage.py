@@ -0,0 +1,109 @@
+import asyncio
+import unittest
+
+from benchmarks.synthetic import CannedClient, FakeGitProvider, NullStorage
+from perfeed.llms.usage import Budget, BudgetExceededError, UsageLedger, estimate_cost
+from perfeed.models.llm_usage import LLMUsage
+from perfeed.telemetry import Tracer
+from perfeed.tools.pr_summarizer import PRSummarizer
+
+
+class TestEstimateCost(unittest.TestCase):
+    def test_priced_model(self):
+        cost = estimate_cost("OpenAIClient", "gpt-4o-mini", 1_000_000, 1_000_000)
+        self.assertAlmostEqual(cost, 0.75)
+
+    def test_ollama_is_free(self):
+        self.assertEqual(estimate_cost("OllamaClient", "llama3.2", 1000, 1000), 0.0)
+
+    def test_unknown_model(self):
+        self.assertIsNone(estimate_cost("OpenAIClient", "unknown", 1000, 1000))
+
+
+class TestUsageLedger(unittest.TestCase):
+    def test_aggregate_per_run(self):
+        tracer = Tracer()
+        ledger = UsageLedger()
+        for model in ["gpt-4o", "gpt-4o-mini"]:
+            with tracer.span("weekly_summarizer.run"):
+                for pr_number in [1, 2]:
+                    ledger.record(
+                        LLMUsage(
+                            provider="OpenAIClient",
+                            model=model,
+                            prompt_tokens=100,
+                            completion_tokens=10,
+                            cost_usd=0.5,
+                        ),
+                        repo="perfeed",
+                        pr_number=pr_number,
+                    )
+
+        df = ledger.aggregate()
+        self.assertEqual(len(df), 2)
+        self.assertEqual(df["calls"].tolist(), [2, 2])
+        self.assertEqual(df["total_tokens"].tolist(), [220, 220])
+        self.assertEqual(ledger.totals()["cost_usd"], 2.0)
+        self.assertEqual(ledger.totals(df["run_id"][0])["calls"], 2)
+
+
+    def test_prune_finished_run(self):
+        tracer = Tracer()
+        ledger = UsageLedger()
+        usage = LLMUsage(provider="OpenAIClient", model="gpt-4o", prompt_tokens=100, cost_usd=0.5)
+        run_ids = []
+        for _ in range(2):
+            with tracer.span("webhook_service.job"):
+                ledger.record(usage, repo="perfeed")
+                run_ids.append(ledger.current_run_id())
+
+        self.assertEqual(ledger.prune(run_ids[0])["cost_usd"], 0.5)
+        self.assertEqual([r["run_id"] for r in ledger.records], run_ids[1:])
+        # the totals of all records still count the pruned run
+        self.assertEqual(ledger.totals()["calls"], 2)
+        self.assertEqual(ledger.totals()["cost_usd"], 1.0)
+        self.assertEqual(ledger.totals(run_ids[0])["calls"], 0)
+
+
+class TestBudget(unittest.TestCase):
+    def setUp(self):
+        self.git = FakeGitProvider(n_comments=3, n_files=2)
+
+    async def _run(self, summarizer, pr_numbers):
+        with Tracer().span("weekly_summarizer.run"):
+            return [await summarizer.run("perfeed", n) for n in pr_numbers]
+
+    def test_switches_to_fallback(self):
+        summarizer = PRSummarizer(
+            self.git,
+            CannedClient(model="large"),
+            NullStorage(),
+            budget=Budget(max_tokens=1, fallback=CannedClient(model="small")),
+        )
+        results = asyncio.run(self._run(summarizer, [1, 2]))
+
+        self.assertEqual([metadata.model for _, metadata in results], ["large", "small"])
+        self.assertGreater(results[0][1].prompt_tokens, 0)
+        self.assertEqual(
+            summarizer.ledger.aggregate(by=("model",))["calls"].tolist(), [1, 1]
+        )
+
+    def test_stops_without_fallback(self):
+        summarizer = PRSummarizer(
+            self.git, CannedClient(), NullStorage(), budget=Budget(max_tokens=1)
+        )
+        with self.assertRaises(BudgetExceededError):
+            asyncio.run(self._run(summarizer, [1, 2]))
+        self.assertEqual(summarizer.ledger.totals()["calls"], 1)
+
+    def test_budget_is_per_run(self):
+        summarizer = PRSummarizer(
+            self.git, CannedClient(), NullStorage(), budget=Budget(max_tokens=1)
+        )
+        asyncio.run(self._run(summarizer, [1]))
+        asyncio.run(self._run(summarizer, [2]))
+        self.assertEqual(summarizer.ledger.totals()["calls"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
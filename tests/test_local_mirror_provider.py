@@ -0,0 +1,141 @@
+import asyncio
+import os
+import subprocess
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from perfeed.git_providers.local_mirror import LocalMirrorProvider
+from perfeed.models.git_provider import PullRequest
+
+
+def git(cwd: str, *args: str, date: str = "2024-10-14T10:00:00+08:00") -> str:
+    env = {
+        **os.environ,
+        "GIT_AUTHOR_NAME": "author",
+        "GIT_AUTHOR_EMAIL": "author@example.com",
+        "GIT_COMMITTER_NAME": "author",
+        "GIT_COMMITTER_EMAIL": "author@example.com",
+        "GIT_AUTHOR_DATE": date,
+        "GIT_COMMITTER_DATE": date,
+    }
+    return subprocess.run(
+        ["git", *args], cwd=cwd, env=env, check=True, capture_output=True, text=True
+    ).stdout.strip()
+
+
+def commit(cwd: str, filename: str, content: str, date: str) -> str:
+    with open(os.path.join(cwd, filename), "w") as f:
+        f.write(content)
+    git(cwd, "add", filename)
+    git(cwd, "commit", "-m", f"update {filename}", date=date)
+    return git(cwd, "rev-parse", "HEAD")
+
+
+class TestLocalMirrorProvider(unittest.TestCase):
+
+    @patch("perfeed.git_providers.github.GhApi")
+    def setUp(self, MockGhApi):
+        self.tmp = tempfile.TemporaryDirectory()
+        work = os.path.join(self.tmp.name, "work")
+        os.makedirs(work)
+        git(work, "init", "-b", "main")
+
+        self.base_sha = commit(work, "README.md", "hello\n", "2024-10-10T10:00:00+08:00")
+        git(work, "checkout", "-b", "feature")
+        commit(work, "app.py", "print('hi')\n", "2024-10-11T10:00:00+08:00")
+        self.head_sha = commit(
+            work, "README.md", "hello world\n", "2024-10-12T10:00:00+08:00"
+        )
+        git(work, "checkout", "main")
+        commit(work, "LICENSE", "MIT\n", "2024-10-13T10:00:00+08:00")
+
+        mirror_dir = os.path.join(self.tmp.name, "mirrors")
+        git(self.tmp.name, "clone", "--mirror", work, os.path.join(mirror_dir, "repo.git"))
+
+        self.mock_api = MockGhApi.return_value
+        self.provider = LocalMirrorProvider(
+            owner="test_owner",
+            token="fake_token",
+            mirror_dir=mirror_dir,
+            fetch_before_read=False,
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _pull_request(self, base_sha, head_sha) -> PullRequest:
+        return PullRequest(
+            number=1,
+            title="Test PR",
+            state="closed",
+            author="author",
+            reviewers=[],
+            created_at="2024-10-12T10:00:00+08:00",
+            first_committed_at="2024-10-11T10:00:00+08:00",
+            description="",
+            html_url="http://example.com/pr/1",
+            diff_url="http://example.com/diff",
+            comments=[],
+            diff_lines="+2 -1",
+            base_sha=base_sha,
+            head_sha=head_sha,
+        )
+
+    def test_get_pr_diff_uses_merge_base(self):
+        diff = asyncio.run(
+            self.provider.get_pr_diff(
+                "repo", self._pull_request(self.base_sha, self.head_sha)
+            )
+        )
+
+        self.assertIn("diff --git a/README.md b/README.md", diff)
+        self.assertIn("+hello world", diff)
+        self.assertIn("diff --git a/app.py b/app.py", diff)
+        # changes on main after the branch point are not part of the PR
+        self.assertNotIn("LICENSE", diff)
+
+    @patch("perfeed.git_providers.base.requests.Session.get")
+    def test_get_pr_diff_falls_back_to_diff_url(self, mock_get):
+        mock_get.return_value.text = "remote diff"
+
+        diff = asyncio.run(
+            self.provider.get_pr_diff("repo", self._pull_request("0" * 40, "f" * 40))
+        )
+
+        self.assertEqual(diff, "remote diff")
+        mock_get.assert_called_once_with("http://example.com/diff")
+
+    def test_get_first_committed_at(self):
+        pr = {
+            "number": 1,
+            "base": {"sha": self.base_sha},
+            "head": {"sha": self.head_sha},
+        }
+
+        first_committed_at = asyncio.run(
+            self.provider._get_first_committed_at("repo", pr)
+        )
+
+        self.assertEqual(first_committed_at, "2024-10-11T10:00:00+08:00")
+        self.mock_api.pulls.list_commits.assert_not_called()
+
+    def test_get_first_committed_at_missing_repo(self):
+        self.mock_api.pulls.list_commits.return_value = [
+            {"commit": {"author": {"date": "2023-09-30T10:00:00+08:00"}}}
+        ]
+        pr = {
+            "number": 1,
+            "base": {"sha": self.base_sha},
+            "head": {"sha": self.head_sha},
+        }
+
+        first_committed_at = asyncio.run(
+            self.provider._get_first_committed_at("unknown_repo", pr)
+        )
+
+        self.assertEqual(first_committed_at, "2023-09-30T10:00:00+08:00")
+
+
+if __name__ == "__main__":
+    unittest.main()
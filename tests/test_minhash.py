@@ -0,0 +1,164 @@
+import asyncio
+import os
+import random
+import tempfile
+import unittest
+from unittest.mock import AsyncMock
+
+from benchmarks.fake_llm import SimulatedClient
+from benchmarks.synthetic import FakeGitProvider, synthetic_diff
+from perfeed.data_stores import FeatherStorage, SQLStorage
+from perfeed.tools.pr_summarizer import PRSummarizer
+from perfeed.utils.minhash import MinHasher, diff_shingles
+
+LOCKFILE_BUMP = """diff --git a/poetry.lock b/poetry.lock
+--- a/poetry.lock
++++ b/poetry.lock
+@@ -10,7 +10,7 @@
+ [[package]]
+ name = "requests"
+-version = "2.31.0"
++version = "2.32.0"
+ files = [
+-    {{file = "requests-2.31.0.tar.gz", hash = "sha256:{old}"}},
++    {{file = "requests-2.32.0.tar.gz", hash = "sha256:{new}"}},
+ ]
+"""
+
+
+class TestMinHasher(unittest.TestCase):
+    def setUp(self):
+        self.hasher = MinHasher()
+
+    def test_shingles_ignore_context_and_hashes(self):
+        a = diff_shingles(LOCKFILE_BUMP.format(old="a" * 64, new="b" * 64))
+        b = diff_shingles(LOCKFILE_BUMP.format(old="c" * 64, new="d" * 64))
+        self.assertEqual(a, b)
+        self.assertFalse(any("[[package]]" in shingle for shingle in a))
+
+    def test_similarity(self):
+        diff = synthetic_diff(random.Random(0), 5, 40)
+        edited = diff.replace("refactor", "rewrite", 2)
+        other = synthetic_diff(random.Random(1), 5, 40)
+
+        signature = self.hasher.signature(diff)
+        self.assertGreater(self.hasher.similarity(signature, self.hasher.signature(edited)), 0.8)
+        self.assertLess(self.hasher.similarity(signature, self.hasher.signature(other)), 0.2)
+
+    def test_nearest(self):
+        diffs = [synthetic_diff(random.Random(seed), 5, 40) for seed in range(3)]
+        fingerprints = [self.hasher.to_hex(self.hasher.signature(d)) for d in diffs]
+
+        position, similarity = self.hasher.nearest(
+            self.hasher.signature(diffs[1]), [None, *fingerprints]
+        )
+
+        self.assertEqual((position, similarity), (2, 1.0))
+        self.assertIsNone(self.hasher.nearest(self.hasher.signature(diffs[0]), [None]))
+
+    def test_empty_diffs_do_not_match(self):
+        empty = self.hasher.signature("")
+
+        self.assertTrue(self.hasher.is_empty(empty))
+        self.assertIsNone(self.hasher.nearest(empty, [self.hasher.to_hex(empty)]))
+
+
+class TestPRSummarizerDedup(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.tmp.name, "work"))
+        os.chdir(os.path.join(self.tmp.name, "work"))
+
+        self.git = FakeGitProvider(n_comments=0)
+        self.git.get_pr_diff = AsyncMock(
+            return_value=synthetic_diff(random.Random(0), 10, 40)
+        )
+        self.llm = SimulatedClient(latency=0, prefill_tps=1e9, generation_tps=1e9)
+        self.store = FeatherStorage(data_type="pr_summary", overwrite=False, append=True)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_reuses_near_duplicate(self):
+        summarizer = PRSummarizer(self.git, self.llm, self.store, dedup=True)
+
+        original, _ = asyncio.run(summarizer.run("perfeed", 1))
+        reused, metadata = asyncio.run(summarizer.run("other", 2))
+
+        self.assertEqual(self.llm.calls, 1)
+        self.assertEqual(summarizer.saved_calls, 1)
+        self.assertEqual(metadata.reused_from, "perfeed#1")
+        self.assertEqual(metadata.pr_number, 2)
+        self.assertEqual(reused.pr_files, original.pr_files)
+        self.assertEqual(reused.comments, [])
+
+        # the reused summary is stored for the new PR
+        _, loaded = asyncio.run(summarizer.run("other", 2))
+        self.assertEqual(loaded.created_at, metadata.created_at)
+        self.assertEqual(self.llm.calls, 1)
+
+    def test_reused_summary_has_the_title_of_its_pr(self):
+        summarizer = PRSummarizer(self.git, self.llm, self.store, dedup=True)
+        pr = asyncio.run(self.git.get_pr("other", 2))
+        pr.title = "Bump requests from 2.31.0 to 2.32.0"
+        pr.description = "Bumps requests from 2.31.0 to 2.32.0.\n\nRelease notes"
+        get_pr = self.git.get_pr
+
+        async def get_dependabot_pr(repo, number):
+            return pr if number == 2 else await get_pr(repo, number)
+
+        self.git.get_pr = get_dependabot_pr
+
+        original, _ = asyncio.run(summarizer.run("perfeed", 1))
+        reused, metadata = asyncio.run(summarizer.run("other", 2))
+
+        self.assertEqual(metadata.reused_from, "perfeed#1")
+        self.assertNotEqual(original.title, pr.title)
+        self.assertEqual(reused.title, pr.title)
+        self.assertEqual(reused.description, "Bumps requests from 2.31.0 to 2.32.0.")
+
+    def test_reuses_near_duplicate_from_sql_store(self):
+        # the SQL store keeps JSON-encoded cells, which the fingerprints are decoded from
+        store = SQLStorage(data_type="pr_summary")
+        store.save(*asyncio.run(PRSummarizer(self.git, self.llm, self.store).run("perfeed", 1)))
+        summarizer = PRSummarizer(self.git, self.llm, store, dedup=True)
+
+        _, metadata = asyncio.run(summarizer.run("other", 2))
+
+        self.assertEqual(self.llm.calls, 1)
+        self.assertEqual(summarizer.saved_calls, 1)
+        self.assertEqual(metadata.reused_from, "perfeed#1")
+        store.engine.dispose()
+
+    def test_refresh_does_not_reuse_own_summary(self):
+        summarizer = PRSummarizer(self.git, self.llm, self.store, dedup=True, memo=None)
+
+        asyncio.run(summarizer.run("perfeed", 1))
+        _, metadata = asyncio.run(summarizer.run("perfeed", 1, refresh=True))
+
+        self.assertEqual(summarizer.saved_calls, 0)
+        self.assertIsNone(metadata.reused_from)
+
+    def test_empty_diffs_are_not_reused(self):
+        self.git.get_pr_diff = AsyncMock(return_value="")
+        summarizer = PRSummarizer(self.git, self.llm, self.store, dedup=True)
+
+        asyncio.run(summarizer.run("perfeed", 1))
+        _, metadata = asyncio.run(summarizer.run("other", 2))
+
+        self.assertEqual(self.llm.calls, 2)
+        self.assertIsNone(metadata.diff_fingerprint)
+
+    def test_disabled(self):
+        summarizer = PRSummarizer(self.git, self.llm, self.store, dedup=False)
+
+        asyncio.run(summarizer.run("perfeed", 1))
+        asyncio.run(summarizer.run("other", 2))
+
+        self.assertEqual(self.llm.calls, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
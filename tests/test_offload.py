@@ -0,0 +1,48 @@
+import asyncio
+import unittest
+
+from perfeed.tools.pr_summarizer import parse_pr_summary
+from perfeed.utils.offload import BatchedProcessPool
+
+
+def square(x: int) -> int:
+    return x * x
+
+
+def fail(x: int) -> int:
+    raise ValueError(f"bad input {x}")
+
+
+class TestBatchedProcessPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = BatchedProcessPool(max_workers=1, batch_size=4)
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def test_results_in_order(self):
+        async def run_all():
+            return await asyncio.gather(*(self.pool.run(square, i) for i in range(10)))
+
+        self.assertEqual(asyncio.run(run_all()), [i * i for i in range(10)])
+
+    def test_exception_is_raised_in_caller(self):
+        async def run_all():
+            return await asyncio.gather(
+                self.pool.run(square, 2), self.pool.run(fail, 3), return_exceptions=True
+            )
+
+        ok, error = asyncio.run(run_all())
+        self.assertEqual(ok, 4)
+        self.assertIsInstance(error, ValueError)
+
+    def test_parse_pr_summary(self):
+        output = '```json\n{"type": ["Tests"], "title": "t", "description": "d", "pr_files": [], "comments": []}\n```'
+
+        summary = asyncio.run(self.pool.run(parse_pr_summary, output))
+
+        self.assertEqual(summary.title, "t")
+
+
+if __name__ == "__main__":
+    unittest.main()
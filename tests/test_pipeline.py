@@ -0,0 +1,113 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from benchmarks.synthetic import CannedClient, FakeGitProvider, NullStorage
+from perfeed.config_loader import settings
+from perfeed.tools.pr_summarizer import PRSummarizer
+from perfeed.utils.pipeline import Pipeline, Stage
+
+
+class Job:
+    def __init__(self, value: int):
+        self.value = value
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class SlowClient(CannedClient):
+    """Blocks like a real LLM client and records how many calls overlap."""
+
+    def __init__(self, delay: float, **kwargs):
+        super().__init__(**kwargs)
+        self.delay = delay
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def chat_completion_with_usage(self, system, user, **kwargs):
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.delay)
+        with self._lock:
+            self.running -= 1
+        return super().chat_completion_with_usage(system, user, **kwargs)
+
+
+class TestPipeline(unittest.TestCase):
+    def test_stages(self):
+        in_flight = 0
+        max_in_flight = 0
+
+        def done(future):
+            nonlocal in_flight
+            in_flight -= 1
+
+        async def double(job):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            job.future.add_done_callback(done)
+            job.value *= 2
+
+        async def skip_odd(job):
+            if job.value % 4:
+                job.future.set_result(-job.value)
+
+        async def fail_on_twelve(job):
+            if job.value == 12:
+                raise ValueError("twelve")
+
+        async def slow_finish(job):
+            await asyncio.sleep(0.001)
+            job.future.set_result(job.value)
+
+        pipeline = Pipeline(
+            [
+                Stage("double", double, 4),
+                Stage("skip_odd", skip_odd),
+                Stage("fail", fail_on_twelve),
+                Stage("finish", slow_finish, 2),
+            ],
+            queue_size=2,
+        )
+
+        async def main():
+            return await asyncio.gather(
+                *(pipeline.submit(Job(value)) for value in range(1, 41)),
+                return_exceptions=True,
+            )
+
+        results = asyncio.run(main())
+
+        self.assertEqual(results[:5], [-2, 4, -6, 8, -10])
+        self.assertIsInstance(results[5], ValueError)
+        self.assertEqual(results[39], 80)
+        # bounded by the queues and workers, not by the 40 submitted jobs
+        self.assertLess(max_in_flight, 20)
+        # the workers are restarted in a new event loop
+        self.assertEqual(asyncio.run(main())[3], 8)
+
+
+class TestPRSummarizerPipeline(unittest.TestCase):
+    def test_llm_calls_overlap(self):
+        llm = SlowClient(0.05, n_threads=2)
+        summarizer = PRSummarizer(FakeGitProvider(n_comments=6), llm, NullStorage())
+
+        async def main():
+            return await asyncio.gather(
+                *(summarizer.run("perfeed", pr_number) for pr_number in range(1, 13))
+            )
+
+        results = asyncio.run(main())
+
+        self.assertEqual([metadata.pr_number for _, metadata in results], list(range(1, 13)))
+        # loads run one at a time on the store's I/O thread, so PRs reach the LLM stage
+        # at staggered times and not every worker is necessarily busy at once
+        self.assertGreater(llm.max_running, 1)
+        self.assertLessEqual(llm.max_running, settings.pipeline.workers["llm"])
+
+
+if __name__ == "__main__":
+    unittest.main()
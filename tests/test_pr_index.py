@@ -0,0 +1,99 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime, timezone
+
+from perfeed.data_stores.pr_index import PRIndex
+
+
+def pull(number: int, author: str, state: str, created_at: str) -> dict:
+    return {
+        "number": number,
+        "user": {"login": author},
+        "state": state,
+        "created_at": created_at,
+        "updated_at": created_at,
+        "merged_at": created_at if state == "closed" else None,
+    }
+
+
+class TestPRIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.index = PRIndex(os.path.join(self.tmp.name, "pr_index.sqlite"))
+
+    def tearDown(self):
+        self.index.close()
+        self.tmp.cleanup()
+
+    def test_search(self):
+        self.index.update(
+            "owner",
+            "repo",
+            [
+                pull(1, "alice", "closed", "2024-10-10T10:00:00Z"),
+                # 2024-10-11T02:00:00Z
+                pull(2, "bob", "closed", "2024-10-11T10:00:00+08:00"),
+                pull(3, "alice", "open", "2024-10-12T10:00:00Z"),
+                pull(4, "alice", "closed", "2024-10-20T10:00:00Z"),
+            ],
+        )
+        self.index.update(
+            "owner", "other", [pull(5, "alice", "closed", "2024-10-12T10:00:00Z")]
+        )
+        # a PR updated since the last sync replaces its header
+        self.index.update(
+            "owner", "repo", [pull(3, "alice", "closed", "2024-10-12T10:00:00Z")]
+        )
+
+        start = datetime(2024, 10, 11, 2, tzinfo=timezone.utc)
+        end = datetime(2024, 10, 13, tzinfo=timezone.utc)
+        self.assertEqual(self.index.search("owner", "repo", start, end, None), [3, 2])
+        self.assertEqual(self.index.search("owner", "repo", start, end, {"alice"}), [3])
+        self.assertEqual(self.index.search("owner", "repo", start, end, set()), [])
+
+    def test_sync_state(self):
+        self.assertEqual(self.index.sync_state("owner", "repo"), (None, None))
+
+        self.index.set_watermark("owner", "repo", "2024-10-12T10:00:00+08:00")
+
+        watermark, synced_at = self.index.sync_state("owner", "repo")
+        self.assertEqual(watermark, "2024-10-12T02:00:00Z")
+        self.assertIsNotNone(synced_at)
+
+    def test_hosts_are_separate(self):
+        enterprise = PRIndex(
+            self.index.path, gh_host="https://github.example.com/api/v3"
+        )
+        self.addCleanup(enterprise.close)
+        enterprise.update(
+            "owner", "repo", [pull(1, "alice", "closed", "2024-10-10T10:00:00Z")]
+        )
+        enterprise.set_watermark("owner", "repo", "2024-10-10T10:00:00Z")
+
+        start = datetime(2024, 10, 1, tzinfo=timezone.utc)
+        end = datetime(2024, 10, 31, tzinfo=timezone.utc)
+        self.assertEqual(enterprise.search("owner", "repo", start, end, None), [1])
+        self.assertEqual(self.index.search("owner", "repo", start, end, None), [])
+        self.assertEqual(self.index.sync_state("owner", "repo"), (None, None))
+
+    def test_index_without_hosts_is_rebuilt(self):
+        self.index.close()
+        path = os.path.join(self.tmp.name, "old.sqlite")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE prs (owner TEXT, repo TEXT, number INTEGER)")
+        conn.execute("CREATE TABLE syncs (owner TEXT, repo TEXT, watermark TEXT)")
+        conn.execute("INSERT INTO syncs VALUES ('owner', 'repo', '2024-10-10')")
+        conn.commit()
+        conn.close()
+
+        self.index = PRIndex(path)
+        self.assertEqual(self.index.sync_state("owner", "repo"), (None, None))
+        self.index.update(
+            "owner", "repo", [pull(1, "alice", "closed", "2024-10-10T10:00:00Z")]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+import asyncio
+import json
+import random
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from benchmarks.synthetic import (
+    CannedClient,
+    FakeGitProvider,
+    NullStorage,
+    synthetic_comments,
+    synthetic_diff,
+    synthetic_llm_output,
+)
+from perfeed.config_loader import settings
+from perfeed.git_providers.github import comments_to_thread
+from perfeed.models.llm_usage import LLMUsage
+from perfeed.models.pr_summary import PRSummary, PRSummaryMetadata
+from perfeed.tools.pr_summarizer import _THREAD_ID, PRSummarizer, parse_pr_summary
+from perfeed.tools.weekly_summarizer import WeeklySummarizer
+from perfeed.utils.prompt_encoding import (
+    encode_schema,
+    encode_summaries,
+    encode_threads,
+    restore_thread_urls,
+    saved_tokens,
+)
+
+
+class TestPromptEncoding(unittest.TestCase):
+    def setUp(self):
+        self.threads = json.loads(
+            comments_to_thread(synthetic_comments(random.Random(0), 1, 6))
+        )
+
+    def test_threads(self):
+        self.assertEqual(encode_threads(self.threads), json.dumps(self.threads))
+
+        compact = encode_threads(self.threads, encoding="compact")
+
+        self.assertEqual(
+            _THREAD_ID.findall(compact),
+            [str(thread["parent_thread_id"]) for thread in self.threads],
+        )
+        self.assertNotIn("https://", compact)
+        for thread in self.threads:
+            for message in thread["content"]:
+                self.assertIn(f"{message['user']} 2024-10-21T00:0", compact)
+                self.assertIn(message["body"], compact)
+        self.assertGreater(
+            saved_tokens(encode_threads, self.threads, "", encoding="compact"), 0
+        )
+
+    def test_hunk_in_diff_is_referenced(self):
+        diff = synthetic_diff(random.Random(0), 2, 10)
+        hunk = diff.split("\n@@")[1].split("\ndiff --git")[0]
+        thread = {**self.threads[0], "diff_hunk": "@@" + hunk}
+
+        compact = encode_threads([thread], diff, encoding="compact")
+
+        last_line = hunk.split("\n")[-1]
+        self.assertIn("hunk: diff @@ -1,", compact)
+        self.assertIn(f"on: {last_line}", compact)
+        self.assertNotIn(hunk.split("\n")[1], compact.replace(last_line, ""))
+        # hunks that are not in the diff are kept
+        compact = encode_threads(self.threads[:1], diff, encoding="compact")
+        self.assertIn(self.threads[0]["diff_hunk"].split("\n")[1], compact)
+
+    def test_urls_are_restored(self):
+        output = json.loads(synthetic_llm_output(random.Random(0), 1, 0).strip("`json\n"))
+        output["comments"] = [
+            {
+                "parent_thread_id": thread["parent_thread_id"],
+                "child_thread_ids": [],
+                "users": [],
+                "html_url": "",
+                "summary": "",
+                "details": "",
+                "eval_aspect": [],
+                "lead_to_action": "no action",
+                "lead_to_action_desc": "",
+            }
+            for thread in self.threads
+        ]
+
+        pr_summary = restore_thread_urls(parse_pr_summary(json.dumps(output)), self.threads)
+
+        self.assertEqual(
+            [thread.html_url for thread in pr_summary.comments],
+            [thread["html_url"] for thread in self.threads],
+        )
+
+    def test_schema(self):
+        schema = PRSummary.to_json_schema()
+        self.assertEqual(json.loads(encode_schema(schema, "compact")), json.loads(schema))
+        self.assertLess(len(encode_schema(schema, "compact")), len(schema))
+        with self.assertRaises(ValueError):
+            encode_schema(schema, "yaml")
+
+    def test_summaries(self):
+        pr_summary = parse_pr_summary(synthetic_llm_output(random.Random(0), 3, 2))
+        metadata = PRSummaryMetadata(
+            repo="perfeed",
+            author="user1",
+            pr_number=7,
+            llm_provider="CannedClient",
+            model="canned",
+            pr_created_at="2024-10-21T00:00:00Z",
+            created_at="2024-10-21T00:00:00Z",
+        )
+        summaries = [(pr_summary, metadata)]
+
+        compact = encode_summaries(summaries, "compact")
+
+        self.assertEqual(
+            encode_summaries(summaries), str([pr_summary.model_dump_json()])
+        )
+        self.assertTrue(compact.startswith(f"PR #7 by user1 [Enhancement]: {pr_summary.title}"))
+        for file in pr_summary.pr_files:
+            self.assertIn(f"- {file.filename} | {file.label} | {file.changes_summary}", compact)
+        for thread in pr_summary.comments:
+            self.assertIn(thread.summary, compact)
+        self.assertGreater(saved_tokens(encode_summaries, summaries, encoding="compact"), 0)
+
+    def test_selectable_per_prompt(self):
+        git = FakeGitProvider(n_comments=6)
+        git.search_prs = AsyncMock(return_value=[1, 2])
+        llm = MagicMock()
+        llm.chat_completion_with_usage.return_value = (
+            "summary",
+            LLMUsage(provider="MagicMock", model="weekly"),
+        )
+        summarizer = PRSummarizer(git, CannedClient(n_threads=2), NullStorage())
+        weekly_summarizer = WeeklySummarizer(git, summarizer, llm)
+
+        for encoding in ["json", "compact"]:
+            with self.subTest(encoding=encoding):
+                settings.set("prompt_encoding.weekly_summary", encoding)
+                try:
+                    asyncio.run(weekly_summarizer.run(["user1"], "perfeed", "2024-10-21"))
+                finally:
+                    settings.set("prompt_encoding.weekly_summary", "compact")
+                user_prompt = llm.chat_completion_with_usage.call_args.args[1]
+                self.assertEqual(
+                    "given as a list of PRSummary" in user_prompt, encoding == "json"
+                )
+                self.assertEqual("PR #1 by " in user_prompt, encoding == "compact")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from perfeed.cli import build_parser
+from perfeed.config_loader import settings
+from perfeed.git_providers.github import GithubProvider
+from perfeed.llms.openai_client import OpenAIClient
+from perfeed.resources import Resources
+from perfeed.utils.cassette import Cassette
+
+
+class TestResources(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.tmp.name, "work"))
+        os.chdir(os.path.join(self.tmp.name, "work"))
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_instances_are_shared(self):
+        resources = Resources()
+        summarizer = resources.summarizer("Perfeed", provider="ollama", backend="sql")
+        other = resources.summarizer("Perfeed", provider="ollama", backend="sql")
+
+        self.assertIs(summarizer.git, other.git)
+        self.assertIs(summarizer.llm, other.llm)
+        self.assertIs(summarizer.store, other.store)
+        self.assertIsNot(resources.git("Perfeed"), resources.git("other"))
+        asyncio.run(resources.aclose())
+
+    def test_sql_engine_is_shared_and_closed_once(self):
+        async def run():
+            async with Resources() as resources:
+                store = resources.store("sql")
+                engine = store.engine
+                await store.aclose()
+                # the store doesn't dispose an engine it doesn't own
+                self.assertIs(resources.store("sql").engine, engine)
+                return resources
+
+        resources = asyncio.run(run())
+        self.assertIsNot(resources.store("sql").engine, None)
+        self.assertEqual(resources._engines.keys(), {"pr_summary"})
+
+    def test_cassette_runs_are_isolated(self):
+        cassette = Cassette(os.path.join(self.tmp.name, "run.jsonl.gz"), "record")
+
+        async def run():
+            async with Resources(cassette) as resources:
+                self.assertFalse(resources.git("Perfeed").use_index)
+                summarizer = resources.summarizer(
+                    "Perfeed", provider="ollama", backend="sql"
+                )
+                root = resources.root
+                self.assertTrue(summarizer.store.db_path.startswith(root))
+                self.assertTrue(summarizer.memo.path.startswith(root))
+                return root
+
+        root = asyncio.run(run())
+        self.assertFalse(os.path.exists(root))
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, "_data")))
+
+    def test_budget_from_settings_and_cli(self):
+        resources = Resources()
+        self.assertIsNone(resources.budget())
+        self.assertIsNone(resources.summarizer("Perfeed", provider="ollama").budget)
+
+        settings.set("budget.max_tokens", 1000)
+        settings.set("budget.fallback_provider", "ollama")
+        settings.set("budget.fallback_model", "llama3.2")
+        try:
+            budget = resources.summarizer("Perfeed", provider="ollama").budget
+            self.assertEqual((budget.max_tokens, budget.max_cost_usd), (1000, None))
+            self.assertIs(budget.fallback, resources.llm("ollama", "llama3.2"))
+        finally:
+            settings.set("budget.max_tokens", 0)
+            settings.set("budget.fallback_provider", "")
+            settings.set("budget.fallback_model", "")
+
+        args = build_parser().parse_args(
+            ["weekly", "Perfeed", "perfeed", "--users", "jzxcd", "--week", "2024-10-21",
+             "--max-usd", "2.5"]
+        )
+        budget = resources.budget(args.max_tokens, args.max_usd)
+        self.assertEqual((budget.max_tokens, budget.max_cost_usd), (None, 2.5))
+        self.assertIsNone(budget.fallback)
+        asyncio.run(resources.aclose())
+
+    @patch.object(OpenAIClient, "create_client")
+    def test_openai_clients_share_a_pool(self, mock_create_client):
+        client = MagicMock()
+        mock_create_client.return_value = client
+
+        async def run():
+            async with Resources() as resources:
+                small = resources.llm("openai", "gpt-4o-mini")
+                large = resources.llm("openai", "gpt-4o")
+                self.assertIsNot(small, large)
+                self.assertIs(small.client, large.client)
+
+        asyncio.run(run())
+        mock_create_client.assert_called_once()
+        client.close.assert_called_once()
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            Resources().llm("unknown")
+        with self.assertRaises(ValueError):
+            Resources().store("unknown")
+
+
+class TestProviderContextManager(unittest.TestCase):
+    @patch("perfeed.git_providers.base.requests.Session")
+    def test_closes_session(self, mock_session):
+        async def run():
+            async with GithubProvider("Perfeed", token="token") as git:
+                self.assertIs(git.session, git.session)
+            return git
+
+        git = asyncio.run(run())
+        mock_session.assert_called_once()
+        mock_session.return_value.close.assert_called_once()
+        self.assertIsNone(git._session)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+import asyncio
+import os
+import random
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from benchmarks.synthetic import (
+    CannedClient,
+    FakeGitProvider,
+    NullStorage,
+    synthetic_pr,
+)
+from perfeed.data_stores import FeatherStorage
+from perfeed.models.git_provider import CommentType, PRComment, PullRequest
+from perfeed.models.llm_usage import LLMUsage
+from perfeed.tools.pr_summarizer import PRSummarizer
+from perfeed.tools.weekly_summarizer import WeeklySummarizer
+from perfeed.utils.review_metrics import (
+    format_review_metrics,
+    review_metrics,
+    summarize_review_metrics,
+)
+
+
+def comment(user: str, created_at: str, user_type: str = "User") -> PRComment:
+    return PRComment(
+        id=hash((user, created_at)),
+        type=CommentType.REVIEW_COMMENT,
+        user=user,
+        user_type=user_type,
+        diff_hunk=None,
+        body="",
+        created_at=created_at,
+        code_change=False,
+    )
+
+
+def pull_request(
+    number: int, author: str, comments: list[PRComment], **kwargs
+) -> PullRequest:
+    fields = dict(
+        number=number,
+        title="",
+        state="closed",
+        author=author,
+        reviewers=["bob"],
+        created_at="2024-10-21T10:00:00Z",
+        first_committed_at="2024-10-21T08:00:00Z",
+        description="",
+        html_url="",
+        diff_url="",
+        comments=comments,
+        diff_lines="+150 -50",
+        merged_at="2024-10-22T08:00:00Z",
+    )
+    fields.update(kwargs)
+    return PullRequest(**fields)
+
+
+class TestReviewMetrics(unittest.TestCase):
+    def test_metrics(self):
+        prs = [
+            pull_request(
+                1,
+                "alice",
+                [
+                    comment("ci-bot", "2024-10-21T10:05:00Z", user_type="Bot"),
+                    comment("bob", "2024-10-21T13:00:00Z"),
+                    comment("carol", "2024-10-21T13:30:00Z"),
+                    comment("alice", "2024-10-21T15:00:00Z"),
+                    comment("bob", "2024-10-21T16:00:00Z"),
+                ],
+            ),
+            pull_request(2, "alice", [], diff_lines="+0 -0", merged_at=None),
+        ]
+
+        metrics = review_metrics(prs)
+
+        self.assertEqual(metrics["number"].tolist(), [1, 2])
+        self.assertEqual(metrics["time_to_first_review_h"].iloc[0], 3.0)
+        self.assertEqual(metrics["review_rounds"].tolist(), [2, 0])
+        self.assertEqual(metrics["reviewer_comments"].tolist(), [3, 0])
+        self.assertEqual(metrics["comments_per_100_lines"].iloc[0], 1.5)
+        self.assertEqual(metrics["cycle_time_h"].iloc[0], 24.0)
+        # no review, no changed lines and no merge
+        missing = ["time_to_first_review_h", "comments_per_100_lines", "cycle_time_h"]
+        self.assertTrue(metrics.loc[1, missing].isna().all())
+
+    def test_summary(self):
+        rng = random.Random(0)
+        prs = [synthetic_pr(rng, pr_number, 6) for pr_number in range(1, 41)]
+
+        summary = summarize_review_metrics(review_metrics(prs))
+        text = format_review_metrics(prs)
+
+        self.assertEqual(summary.loc["all", "prs"], 40)
+        self.assertEqual(summary["prs"].drop("all").sum(), 40)
+        self.assertEqual(summary.loc["all", "median_cycle_time_h"], 24.0)
+        self.assertIn("median_time_to_first_review_h", text)
+        self.assertEqual(format_review_metrics([]), "")
+
+    def test_weekly_prompt(self):
+        git = FakeGitProvider(n_comments=6)
+        git.search_prs = AsyncMock(return_value=[1, 2])
+        llm = MagicMock()
+        llm.chat_completion_with_usage.return_value = (
+            "summary",
+            LLMUsage(provider="MagicMock", model="weekly"),
+        )
+        summarizer = PRSummarizer(git, CannedClient(n_threads=2), NullStorage())
+
+        weekly_summarizer = WeeklySummarizer(git, summarizer, llm)
+        asyncio.run(weekly_summarizer.run(["user1"], "perfeed", "2024-10-21"))
+
+        prs = [asyncio.run(git.get_pr("perfeed", pr_number)) for pr_number in [1, 2]]
+        user_prompt = llm.chat_completion_with_usage.call_args.args[1]
+        self.assertIn(format_review_metrics(prs), user_prompt)
+
+    def test_weekly_reads_stored_metrics(self):
+        cwd = os.getcwd()
+        tmp = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(tmp.name, "work"))
+        os.chdir(os.path.join(tmp.name, "work"))
+        try:
+            git = FakeGitProvider(n_comments=6)
+            git.search_prs = AsyncMock(return_value=[1, 2])
+            prs = [asyncio.run(git.get_pr("perfeed", pr_number)) for pr_number in [1, 2]]
+            git.get_pr = AsyncMock(side_effect=git.get_pr)
+            llm = MagicMock()
+            llm.chat_completion_with_usage.return_value = (
+                "summary",
+                LLMUsage(provider="MagicMock", model="weekly"),
+            )
+            summarizer = PRSummarizer(
+                git, CannedClient(n_threads=2), FeatherStorage(data_type="pr_summary")
+            )
+            weekly_summarizer = WeeklySummarizer(git, summarizer, llm)
+
+            asyncio.run(weekly_summarizer.run(["user1"], "perfeed", "2024-10-21"))
+            # the PRs are only fetched to be summarized
+            self.assertEqual(git.get_pr.await_count, 2)
+
+            asyncio.run(weekly_summarizer.run(["user1"], "perfeed", "2024-10-21"))
+            self.assertEqual(git.get_pr.await_count, 2)
+            user_prompt = llm.chat_completion_with_usage.call_args.args[1]
+            self.assertIn(format_review_metrics(prs), user_prompt)
+        finally:
+            os.chdir(cwd)
+            tmp.cleanup()
+
+
+
+if __name__ == "__main__":
+    unittest.main()
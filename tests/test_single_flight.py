@@ -0,0 +1,97 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest.mock import AsyncMock
+
+from benchmarks.fake_llm import SimulatedClient
+from benchmarks.synthetic import FakeGitProvider, NullStorage
+from perfeed.config_loader import settings
+from perfeed.data_stores import FeatherStorage
+from perfeed.tools.pr_summarizer import PRSummarizer
+
+
+class TestSingleFlight(unittest.TestCase):
+    def setUp(self):
+        self.git = FakeGitProvider(n_comments=6, latency=0.01)
+        self.git.get_pr = AsyncMock(side_effect=self.git.get_pr)
+        self.llm = SimulatedClient(0.05, 1e9, 1e9, n_threads=2)
+
+    def test_concurrent_runs_share_one_summary(self):
+        summarizer = PRSummarizer(self.git, self.llm, NullStorage())
+
+        async def main():
+            return await asyncio.gather(
+                summarizer.run("perfeed", 1),
+                summarizer.run("perfeed", 1),
+                summarizer.run("perfeed", 2),
+                summarizer.run("perfeed", 1, refresh=True),
+            )
+
+        results = asyncio.run(main())
+
+        self.assertIs(results[0], results[1])
+        self.assertEqual(results[2][1].pr_number, 2)
+        # PR 1, PR 2 and the refresh of PR 1
+        self.assertEqual(self.git.get_pr.await_count, 3)
+        self.assertEqual(self.llm.calls, 3)
+        self.assertEqual(summarizer._in_flight, {})
+
+    def test_failure_is_shared(self):
+        self.git.get_pr.side_effect = RuntimeError("GitHub is down")
+        summarizer = PRSummarizer(self.git, self.llm, NullStorage())
+
+        async def main():
+            return await asyncio.gather(
+                summarizer.run("perfeed", 1),
+                summarizer.run("perfeed", 1),
+                return_exceptions=True,
+            )
+
+        results = asyncio.run(main())
+
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+        self.assertEqual(self.git.get_pr.await_count, 1)
+
+
+class TestCrossProcessLock(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.tmp.name, "work"))
+        os.chdir(os.path.join(self.tmp.name, "work"))
+        settings.set("single_flight.cross_process_lock", True)
+
+    def tearDown(self):
+        settings.set("single_flight.cross_process_lock", False)
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_second_worker_loads_the_first_summary(self):
+        # two workers with their own store handles, as in two processes
+        llm = SimulatedClient(0.1, 1e9, 1e9, n_threads=2)
+        workers = [
+            PRSummarizer(
+                FakeGitProvider(n_comments=6),
+                llm,
+                FeatherStorage(data_type="pr_summary"),
+                dedup=False,
+                memo=None,
+            )
+            for _ in range(2)
+        ]
+
+        async def main():
+            return await asyncio.gather(
+                *(worker.run("perfeed", 1) for worker in workers)
+            )
+
+        first, second = asyncio.run(main())
+
+        self.assertEqual(first, second)
+        self.assertEqual(llm.calls, 1)
+        self.assertEqual(len(workers[0].store.load()), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
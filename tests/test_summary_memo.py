@@ -0,0 +1,184 @@
+import asyncio
+import dataclasses
+import json
+import os
+import random
+import tempfile
+import threading
+import unittest
+from unittest.mock import AsyncMock
+
+from benchmarks.synthetic import FakeGitProvider, synthetic_comments, synthetic_diff
+from perfeed.data_stores import FeatherStorage
+from perfeed.data_stores.summary_cache import SummaryUnitCache
+from perfeed.llms.base_client import BaseClient
+from perfeed.models.llm_usage import LLMUsage
+from perfeed.tools.pr_summarizer import _DIFF_FILE, _THREAD_ID, PRSummarizer
+
+
+class EchoClient(BaseClient):
+    """Describes exactly the files and threads of the prompt, and records the prompts."""
+
+    model = "echo"
+
+    def __init__(self):
+        self.prompts = []
+
+    def chat_completion(self, system: str, user: str, **kwargs) -> str:
+        return self.chat_completion_with_usage(system, user)[0]
+
+    def chat_completion_with_usage(self, system, user, **kwargs):
+        self.prompts.append(user)
+        n = len(self.prompts)
+        summary = {
+            "type": ["Enhancement"],
+            "title": f"title {n}",
+            "description": f"description {n}",
+            "pr_files": [
+                {
+                    "filename": filename,
+                    "language": "Python",
+                    "changes_summary": f"summary {n}",
+                    "changes_title": "",
+                    "label": "enhancement",
+                }
+                for filename in _DIFF_FILE.findall(user)
+            ],
+            "comments": [
+                {
+                    "parent_thread_id": int(thread_id),
+                    "child_thread_ids": [],
+                    "users": [],
+                    "html_url": "",
+                    "summary": f"summary {n}",
+                    "details": "",
+                    "eval_aspect": [],
+                    "lead_to_action": "no action",
+                    "lead_to_action_desc": "",
+                }
+                for thread_id in _THREAD_ID.findall(user)
+            ],
+        }
+        return json.dumps(summary), LLMUsage(provider="EchoClient", model=self.model)
+
+
+class TestSummaryMemo(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.tmp.name, "work"))
+        os.chdir(os.path.join(self.tmp.name, "work"))
+
+        self.diff = synthetic_diff(random.Random(0), 3, 10)
+        self.comments = synthetic_comments(random.Random(0), 1, 6)
+        self.git = FakeGitProvider(n_comments=6)
+        self.git.get_pr_diff = AsyncMock(side_effect=lambda repo, pr: self.diff)
+        get_pr = self.git.get_pr
+
+        async def get_pr_with_comments(repo, pr_number):
+            pr = await get_pr(repo, pr_number)
+            pr.comments = list(self.comments)
+            return pr
+
+        self.git.get_pr = get_pr_with_comments
+        self.llm = EchoClient()
+        self.summarizer = PRSummarizer(
+            self.git,
+            self.llm,
+            FeatherStorage(data_type="pr_summary"),
+            dedup=False,
+            diff_filter=None,
+        )
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_only_changed_units_are_summarized(self):
+        first, _ = asyncio.run(self.summarizer.run("perfeed", 1))
+        self.assertEqual(len(first.pr_files), 3)
+        self.assertEqual(len(first.comments), 2)
+
+        # a new commit to the second file and a reply to the second thread
+        files = self.diff.split("diff --git ")
+        files[2] = files[2].replace("\n+", "\n+ changed", 1)
+        self.diff = "diff --git ".join(files)
+        reply = self.comments[-1]
+        self.comments.append(
+            dataclasses.replace(reply, id=reply.id + 1, body="done")
+        )
+
+        second, metadata = asyncio.run(self.summarizer.run("perfeed", 1, refresh=True))
+
+        partial = self.llm.prompts[1]
+        self.assertEqual(_DIFF_FILE.findall(partial), ["perfeed/module_1.py"])
+        self.assertEqual(len(_THREAD_ID.findall(partial.split("PR comments:")[1])), 1)
+        self.assertIn('"title": "title 1"', partial)
+        self.assertEqual(
+            [file.changes_summary for file in second.pr_files],
+            ["summary 1", "summary 2", "summary 1"],
+        )
+        self.assertEqual(
+            [thread.summary for thread in second.comments], ["summary 1", "summary 2"]
+        )
+        self.assertEqual(second.title, "title 2")
+        self.assertEqual(metadata.llm_provider, "EchoClient")
+
+        # nothing changed since
+        third, metadata = asyncio.run(self.summarizer.run("perfeed", 1, refresh=True))
+        self.assertEqual(len(self.llm.prompts), 2)
+        self.assertEqual(third, second)
+        self.assertEqual(metadata.cost_usd, 0.0)
+
+        # without refresh, the stored summary is returned
+        asyncio.run(self.summarizer.run("perfeed", 1))
+        self.assertEqual(len(self.llm.prompts), 2)
+
+    def test_first_summary_has_the_whole_diff(self):
+        asyncio.run(self.summarizer.run("perfeed", 1))
+
+        # another PR with the same files and threads is summarized for the first time
+        second, _ = asyncio.run(self.summarizer.run("perfeed", 2))
+
+        prompt = self.llm.prompts[1]
+        self.assertEqual(len(_DIFF_FILE.findall(prompt)), 3)
+        self.assertEqual(len(_THREAD_ID.findall(prompt.split("PR comments:")[1])), 2)
+        self.assertNotIn('"title": "title 1"', prompt)
+        # the memoized units are merged in
+        self.assertEqual(
+            [file.changes_summary for file in second.pr_files], ["summary 1"] * 3
+        )
+        self.assertEqual(second.title, "title 2")
+
+    def test_memo_runs_on_store_io_thread(self):
+        memo = self.summarizer.memo
+        threads = []
+        for name in ("get_many", "put_many"):
+            method = getattr(memo, name)
+
+            def record(*args, method=method, **kwargs):
+                threads.append(threading.current_thread().name)
+                return method(*args, **kwargs)
+
+            setattr(memo, name, record)
+
+        asyncio.run(self.summarizer.run("perfeed", 1))
+
+        self.assertEqual(len(threads), 4)
+        self.assertTrue(all(name.startswith("pr_summary-io") for name in threads))
+
+    def test_cache_is_per_model(self):
+        cache = SummaryUnitCache("units.sqlite")
+        cache.put_many("file", {"a": "1", "b": "2"}, "EchoClient", "echo")
+        cache.put_many("file", {"a": "3"}, "OllamaClient", "llama3.1")
+
+        self.assertEqual(cache.get_many("file", ["a", "b", "c"]), {"a": "3", "b": "2"})
+        self.assertEqual(
+            cache.get_many("file", ["a"], candidates=[("EchoClient", "echo")]), {"a": "1"}
+        )
+        self.assertEqual(cache.get_many("thread", ["a"]), {})
+        cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
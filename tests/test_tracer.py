@@ -0,0 +1,85 @@
+import asyncio
+import unittest
+
+from perfeed.telemetry import Tracer
+
+
+class TestTracer(unittest.TestCase):
+    def setUp(self):
+        self.tracer = Tracer()
+
+    def test_spans_nest_across_tasks_and_threads(self):
+        async def child(i: int) -> None:
+            with self.tracer.span("child", index=i):
+                await asyncio.to_thread(self._grandchild)
+
+        async def parent() -> None:
+            with self.tracer.span("parent"):
+                await asyncio.gather(child(0), child(1))
+
+        asyncio.run(parent())
+
+        spans = {span.name: span for span in self.tracer.spans}
+        parent_span = spans["parent"]
+        children = [span for span in self.tracer.spans if span.name == "child"]
+        grandchildren = [span for span in self.tracer.spans if span.name == "grandchild"]
+
+        self.assertIsNone(parent_span.parent_id)
+        self.assertEqual({span.parent_id for span in children}, {parent_span.span_id})
+        self.assertEqual(
+            {span.parent_id for span in grandchildren},
+            {span.span_id for span in children},
+        )
+        self.assertEqual(
+            {span.trace_id for span in self.tracer.spans}, {parent_span.trace_id}
+        )
+
+    def _grandchild(self) -> None:
+        with self.tracer.span("grandchild") as span:
+            span.add("bytes", 10)
+            span.add("bytes", 5)
+
+    def test_summary_aggregates_attributes(self):
+        for cache_hit in [True, False, True]:
+            with self.tracer.span("pr_summarizer.run", cache_hit=cache_hit, prompt_tokens=100):
+                pass
+        with self.assertRaises(ValueError):
+            with self.tracer.span("pr_summarizer.run"):
+                raise ValueError("boom")
+
+        row = self.tracer.summary()[0]
+        self.assertEqual(row["stage"], "pr_summarizer.run")
+        self.assertEqual(row["count"], 4)
+        self.assertEqual(row["errors"], 1)
+        self.assertEqual(row["cache_hit"], 2)
+        self.assertEqual(row["prompt_tokens"], 300)
+        self.assertIn("pr_summarizer.run", self.tracer.summary_table())
+
+    def test_exports(self):
+        with self.tracer.span("storage.save", backend="feather", bytes=42):
+            pass
+
+        otlp_span = self.tracer.to_otlp()["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+        self.assertEqual(otlp_span["name"], "storage.save")
+        self.assertIn(
+            {"key": "bytes", "value": {"intValue": "42"}}, otlp_span["attributes"]
+        )
+        self.assertEqual(len(otlp_span["traceId"]), 32)
+        self.assertEqual(len(otlp_span["spanId"]), 16)
+
+        prometheus = self.tracer.to_prometheus()
+        self.assertIn('perfeed_stage_calls_total{stage="storage.save"} 1', prometheus)
+        self.assertIn(
+            'perfeed_stage_attribute_total{stage="storage.save",attribute="bytes"} 42.0',
+            prometheus,
+        )
+
+    def test_disabled(self):
+        tracer = Tracer(enabled=False)
+        with tracer.span("stage"):
+            pass
+        self.assertEqual(len(tracer.spans), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,206 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import AsyncMock
+
+from benchmarks.synthetic import CannedClient, FakeGitProvider, NullStorage
+from perfeed.data_stores.job_queue import JobQueue, JobStatus
+from perfeed.llms.usage import Budget, UsageLedger
+from perfeed.tools.pr_summarizer import PRSummarizer
+from perfeed.tools.webhook_service import WebhookService, create_app
+
+
+def pull_request_event(number: int, owner: str = "Perfeed", merged: bool = True) -> dict:
+    return {
+        "action": "closed",
+        "number": number,
+        "pull_request": {"number": number, "merged": merged},
+        "repository": {
+            "name": "perfeed",
+            "full_name": f"{owner}/perfeed",
+            "owner": {"login": owner},
+        },
+    }
+
+
+class TestWebhookService(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.queue = JobQueue(os.path.join(self.tmp.name, "jobs.sqlite"))
+        self.summarizer = AsyncMock()
+        self.summarizer.ledger = UsageLedger()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _service(self, **kwargs) -> WebhookService:
+        return WebhookService(
+            self.summarizer, self.queue, owner="Perfeed", secret="", **kwargs
+        )
+
+    def test_handle_event_filters(self):
+        service = self._service(merged_only=True)
+
+        self.assertTrue(service.handle_event("pull_request", pull_request_event(1)))
+        self.assertFalse(service.handle_event("pull_request", pull_request_event(1)))
+        self.assertFalse(service.handle_event("push", pull_request_event(2)))
+        self.assertFalse(
+            service.handle_event("pull_request", pull_request_event(3, merged=False))
+        )
+        self.assertFalse(
+            service.handle_event("pull_request", pull_request_event(4, owner="other"))
+        )
+
+    def test_closed_again_is_requeued_and_refreshed(self):
+        service = self._service()
+
+        async def close_twice() -> None:
+            service.start()
+            self.assertTrue(service.handle_event("pull_request", pull_request_event(1)))
+            await service.join()
+            self.summarizer.run.assert_awaited_with("perfeed", 1, refresh=False)
+
+            # reopened and closed again
+            self.assertTrue(service.handle_event("pull_request", pull_request_event(1)))
+            await service.join()
+            self.summarizer.run.assert_awaited_with("perfeed", 1, refresh=True)
+            await service.stop()
+
+        asyncio.run(close_twice())
+
+        self.assertEqual(self.summarizer.run.await_count, 2)
+        self.assertEqual(self.queue.status("perfeed", 1), JobStatus.done)
+        self.assertFalse(self.queue.is_stale("perfeed", 1))
+
+    def test_replay_and_drain(self):
+        path = os.path.join(self.tmp.name, "events.jsonl")
+        with open(path, "w") as f:
+            for number in [1, 2, 2, 3]:
+                f.write(json.dumps(pull_request_event(number)) + "\n")
+            f.write(
+                json.dumps({"event": "pull_request", "payload": pull_request_event(4)})
+                + "\n"
+            )
+
+        def run(repo, pr_number, refresh=False):
+            if pr_number == 3:
+                raise RuntimeError("LLM failure")
+
+        self.summarizer.run.side_effect = run
+        service = self._service(num_workers=2)
+
+        async def replay_and_drain() -> int:
+            queued = await service.replay(path)
+            service.start()
+            await service.join()
+            await service.stop()
+            return queued
+
+        queued = asyncio.run(replay_and_drain())
+
+        self.assertEqual(queued, 4)
+        self.assertEqual(self.summarizer.run.await_count, 4)
+        self.assertEqual(
+            self.queue.counts(), {JobStatus.done: 3, JobStatus.failed: 1}
+        )
+
+    def test_drain_is_one_run_under_the_budget(self):
+        summarizer = PRSummarizer(
+            FakeGitProvider(n_comments=3, n_files=2),
+            CannedClient(),
+            NullStorage(),
+            budget=Budget(max_tokens=1),
+        )
+        service = WebhookService(
+            summarizer, self.queue, owner="Perfeed", num_workers=1, secret=""
+        )
+        for number in [1, 2]:
+            self.queue.enqueue("perfeed", number)
+
+        usage = asyncio.run(service.drain())
+
+        # the first job spends the budget of the run, which stops the second one and
+        # leaves it pending for the next run
+        self.assertEqual(usage["calls"], 1)
+        self.assertTrue(service.budget_exceeded)
+        self.assertEqual(self.queue.status("perfeed", 1), JobStatus.done)
+        self.assertEqual(self.queue.status("perfeed", 2), JobStatus.pending)
+        self.assertEqual(self.queue.jobs(JobStatus.pending)[0]["attempts"], 0)
+        self.assertEqual(summarizer.ledger.records, [])
+
+    def test_queue_calls_run_off_the_event_loop(self):
+        threads = []
+        for name in ("claim", "is_stale", "complete"):
+            method = getattr(self.queue, name)
+
+            def record(*args, method=method):
+                threads.append(threading.current_thread())
+                return method(*args)
+
+            setattr(self.queue, name, record)
+        self.queue.enqueue("perfeed", 1)
+
+        asyncio.run(self._service().drain())
+
+        self.assertEqual(self.queue.status("perfeed", 1), JobStatus.done)
+        self.assertGreaterEqual(len(threads), 3)
+        self.assertNotIn(threading.main_thread(), threads)
+
+    def test_verify_signature(self):
+        service = WebhookService(
+            self.summarizer, self.queue, owner="Perfeed", secret="It's a Secret to Everybody"
+        )
+        body = b"Hello, World!"
+
+        self.assertTrue(
+            service.verify_signature(
+                body,
+                "sha256=757107ea0eb2509fc211221cce984b8a37570b6d7586c22c46f4379c8b043e17",
+            )
+        )
+        self.assertFalse(service.verify_signature(body, "sha256=0"))
+        self.assertFalse(service.verify_signature(body, None))
+
+
+class TestWebhookApp(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.queue = JobQueue(os.path.join(self.tmp.name, "jobs.sqlite"))
+        self.summarizer = AsyncMock()
+        self.summarizer.ledger = UsageLedger()
+        self.service = WebhookService(
+            self.summarizer, self.queue, owner="Perfeed", secret=""
+        )
+        self.closed = AsyncMock()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_deliveries(self):
+        from fastapi.testclient import TestClient
+
+        with TestClient(create_app(self.service, on_shutdown=self.closed)) as client:
+            self.assertEqual(len(self.service._workers), self.service.num_workers)
+            response = client.post(
+                "/webhook",
+                json=pull_request_event(1),
+                headers={"X-GitHub-Event": "pull_request"},
+            )
+            self.assertEqual(response.json(), {"queued": True})
+
+            # form-encoded and malformed payloads
+            for body in [b"payload=%7B%7D", b"{", b"[]"]:
+                response = client.post(
+                    "/webhook", content=body, headers={"X-GitHub-Event": "pull_request"}
+                )
+                self.assertEqual(response.status_code, 400)
+
+        self.assertEqual(self.service._workers, [])
+        self.closed.assert_awaited_once()
+
+
+if __name__ == "__main__":
+    unittest.main()